@@ -0,0 +1,194 @@
+"""Compact activity records built straight from the API's JSON.
+
+A Strava activity summary carries dozens of fields the scripts never read
+(maps and polylines, athlete blobs, gear, device flags). Decoding through
+activity_hook turns every activity-shaped object into an Activity holding
+only the fields used here, so the rest is dropped as soon as it is parsed.
+Activity supports the dict reads the scripts already do (activity['id'],
+activity.get('average_heartrate'), 'id' in activity, ...), and ActivityBatch
+holds many activities as typed columns for bulk analysis.
+"""
+import json
+import sys
+from array import array
+from operator import attrgetter, methodcaller
+
+# API fields kept, in the order they are serialized
+FIELDS = (
+    'id', 'name', 'type', 'start_date', 'start_date_local', 'timezone',
+    'distance', 'moving_time', 'total_elevation_gain', 'average_heartrate',
+)
+
+_FIELD_SET = frozenset(FIELDS)
+
+# Low-cardinality strings shared across records
+_INTERNED = ('type', 'timezone')
+
+class Activity:
+    """One activity: the kept API fields plus the athlete's name.
+
+    Missing fields are None and read as absent, like a key missing from
+    the API's dict.
+    """
+    __slots__ = FIELDS + ('athlete_firstname', 'athlete_lastname')
+
+    def __init__(self, **fields):
+        for field in self.__slots__:
+            setattr(self, field, fields.get(field))
+
+    @classmethod
+    def from_json(cls, data):
+        """Record from an activity dict in the API's shape"""
+        activity = cls.__new__(cls)
+        for field in FIELDS:
+            setattr(activity, field, data.get(field))
+        for field in _INTERNED:
+            value = data.get(field)
+            if value is not None:
+                setattr(activity, field, sys.intern(value))
+        athlete = data.get('athlete') or {}
+        activity.athlete_firstname = athlete.get('firstname')
+        activity.athlete_lastname = athlete.get('lastname')
+        return activity
+
+    @property
+    def athlete(self):
+        athlete = {}
+        if self.athlete_firstname is not None:
+            athlete['firstname'] = self.athlete_firstname
+        if self.athlete_lastname is not None:
+            athlete['lastname'] = self.athlete_lastname
+        return athlete or None
+
+    def to_json(self):
+        """The record as an API-shaped dict, without the missing fields"""
+        data = {field: getattr(self, field) for field in FIELDS if getattr(self, field) is not None}
+        athlete = self.athlete
+        if athlete:
+            data['athlete'] = athlete
+        return data
+
+    def _value(self, key):
+        if key == 'athlete':
+            return self.athlete
+        return getattr(self, key) if key in _FIELD_SET else None
+
+    def __getitem__(self, key):
+        value = self._value(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        value = self._value(key)
+        return default if value is None else value
+
+    def __contains__(self, key):
+        return self._value(key) is not None
+
+    def __eq__(self, other):
+        if not isinstance(other, Activity):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    def __repr__(self):
+        return f"Activity({self.to_json()!r})"
+
+def activity_hook(obj):
+    """json object_hook: activity-shaped objects become Activity records"""
+    if 'distance' in obj and 'moving_time' in obj:
+        return Activity.from_json(obj)
+    return obj
+
+def loads(data):
+    """Decode an API response body (str or bytes), activities as records"""
+    return json.loads(data, object_hook=activity_hook)
+
+def _default(value):
+    if isinstance(value, Activity):
+        return value.to_json()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(value):
+    """Compact JSON of activities, records or plain dicts"""
+    return json.dumps(value, separators=(',', ':'), default=_default)
+
+class ActivityBatch:
+    """Many activities as parallel columns, for bulk analysis.
+
+    Numbers go in typed arrays (8 bytes a value, and usable as NumPy buffers
+    without a copy); strings in lists. A missing id is 0 and a missing
+    number otherwise NaN. Columns are filled a column at a time, straight
+    from records' slots or dicts' keys; fields, if given, limits the batch
+    to those columns. batch[i] rebuilds the i-th record (without the
+    fields left out).
+    """
+    INTEGER_COLUMNS = ('id',)
+    FLOAT_COLUMNS = ('distance', 'moving_time', 'total_elevation_gain', 'average_heartrate')
+    STRING_COLUMNS = ('name', 'type', 'start_date', 'start_date_local', 'timezone',
+                      'athlete_firstname', 'athlete_lastname')
+
+    def __init__(self, activities=(), fields=None):
+        self.columns = {}
+        for name in self.INTEGER_COLUMNS:
+            self.columns[name] = array('q')
+        for name in self.FLOAT_COLUMNS:
+            self.columns[name] = array('d')
+        for name in self.STRING_COLUMNS:
+            self.columns[name] = []
+        if fields is not None:
+            # id is always kept: it is what len() counts
+            self.columns = {name: column for name, column in self.columns.items() if name == 'id' or name in fields}
+        self.extend(activities)
+
+    def append(self, activity):
+        self.extend([activity])
+
+    def extend(self, activities):
+        """Add activities - Activity records or API-shaped dicts"""
+        if not isinstance(activities, list):
+            activities = list(activities)
+        if all(isinstance(activity, Activity) for activity in activities):
+            def field(name):
+                # Read the slots in C rather than through get()
+                return map(attrgetter(name), activities)
+        else:
+            if any(isinstance(activity, Activity) for activity in activities):
+                activities = [a.to_json() if isinstance(a, Activity) else a for a in activities]
+            def field(name):
+                if name.startswith('athlete_'):
+                    key = name[len('athlete_'):]
+                    return ((a.get('athlete') or {}).get(key) for a in activities)
+                return map(methodcaller('get', name), activities)
+        for name, column in self.columns.items():
+            if name in self.STRING_COLUMNS:
+                column.extend(field(name))
+                continue
+            size = len(column)
+            try:
+                # Converted in C when nothing is missing, the usual case
+                column.extend(field(name))
+            except TypeError:
+                del column[size:]
+                if name in self.INTEGER_COLUMNS:
+                    column.extend(round(value or 0) for value in field(name))
+                else:
+                    column.extend(float('nan') if value is None else value for value in field(name))
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def __getitem__(self, i):
+        activity = Activity()
+        for name, column in self.columns.items():
+            value = column[i]
+            if name in self.INTEGER_COLUMNS:
+                value = value or None
+            elif name in self.FLOAT_COLUMNS and value != value:
+                value = None
+            setattr(activity, name, value)
+        return activity
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
@@ -0,0 +1,153 @@
+import os
+import sqlite3
+import activity_record
+from strava_api import STATE_DIR
+
+ACTIVITY_STORE_FILE = os.path.join(STATE_DIR, 'activities.db')
+
+# Activities written per executemany batch when streaming a full history in
+WRITE_BATCH_SIZE = 500
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class ActivityStore:
+    """Local SQLite copy of the athlete's activities, keyed by activity ID"""
+
+    def __init__(self, path=ACTIVITY_STORE_FILE):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS activities ('
+            'id INTEGER PRIMARY KEY, start_date TEXT NOT NULL, data TEXT NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS activities_start_date ON activities (start_date)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM activities').fetchone()[0]
+
+    def latest_start_date(self):
+        """Newest cached start_date (ISO-8601 UTC), or None if the store is empty"""
+        return self.conn.execute('SELECT MAX(start_date) FROM activities').fetchone()[0]
+
+    def upsert(self, activities):
+        """Insert new activities and overwrite edited ones.
+
+        Returns the changes as (old, new) pairs, old being None for inserts;
+        activities identical to their cached copy are left out.
+        """
+        with self.conn:
+            changes = self._upsert(activities)
+            if changes:
+                self._bump_revision()
+            return changes
+
+    def replace_all(self, activities):
+        """Replace the whole store, dropping activities deleted on Strava.
+
+        activities may be any iterable; it is written in batches as it streams
+        in, so memory stays flat however long the history is. Changes are not
+        tracked - callers rebuild anything derived from the store. Returns the
+        number of activities written.
+        """
+        count = 0
+        with self.conn:
+            self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS fetched (id INTEGER PRIMARY KEY)')
+            self.conn.execute('DELETE FROM fetched')
+            for batch in _batches(activities, WRITE_BATCH_SIZE):
+                self.conn.executemany('INSERT OR IGNORE INTO fetched (id) VALUES (?)', [(a['id'],) for a in batch])
+                self.conn.executemany(
+                    'INSERT OR REPLACE INTO activities (id, start_date, data) VALUES (?, ?, ?)',
+                    [(a['id'], a['start_date'], activity_record.dumps(a)) for a in batch]
+                )
+                count += len(batch)
+            self.conn.execute('DELETE FROM activities WHERE id NOT IN (SELECT id FROM fetched)')
+            self._bump_revision()
+        return count
+
+    def _upsert(self, activities):
+        changes = []
+        rows = []
+        for activity in activities:
+            data = activity_record.dumps(activity)
+            row = self.conn.execute('SELECT data FROM activities WHERE id = ?', (activity['id'],)).fetchone()
+            if row and row[0] == data:
+                continue
+            changes.append((activity_record.loads(row[0]) if row else None, activity))
+            rows.append((activity['id'], activity['start_date'], data))
+        self.conn.executemany('INSERT OR REPLACE INTO activities (id, start_date, data) VALUES (?, ?, ?)', rows)
+        return changes
+
+    def _bump_revision(self):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+            ('revision', str(self.revision() + 1))
+        )
+
+    def revision(self):
+        """Counter bumped whenever the stored activities change"""
+        return int(self.get_meta('revision') or 0)
+
+    def get_meta(self, key):
+        row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def activities_between(self, start, end):
+        """Cached activities with start <= start_date < end, oldest first"""
+        cursor = self.conn.execute(
+            'SELECT data FROM activities WHERE start_date >= ? AND start_date < ? ORDER BY start_date',
+            (start, end)
+        )
+        return [activity_record.loads(data) for (data,) in cursor]
+
+    def iter_activities(self):
+        """Stream all cached activities, oldest first"""
+        cursor = self.conn.execute('SELECT data FROM activities ORDER BY start_date')
+        for (data,) in cursor:
+            yield activity_record.loads(data)
+
+    def activities(self):
+        """All cached activities, oldest first"""
+        return list(self.iter_activities())
+
+    def activities_by_id(self, activity_ids):
+        """{id: activity} for the cached activities among activity_ids"""
+        activities = {}
+        for batch in _batches(activity_ids, WRITE_BATCH_SIZE):
+            placeholders = ','.join('?' * len(batch))
+            cursor = self.conn.execute(f'SELECT id, data FROM activities WHERE id IN ({placeholders})', batch)
+            activities.update((activity_id, activity_record.loads(data)) for activity_id, data in cursor)
+        return activities
+
+    def iter_columns(self, fields, activity_type=None, newest_first=False):
+        """Stream tuples of the given fields of the cached activities, oldest first.
+
+        The fields are read out of the stored JSON by SQLite, so no activity
+        is decoded; a missing field is None.
+        """
+        columns = ', '.join(f"json_extract(data, '$.{field}')" for field in fields)
+        where = "WHERE json_extract(data, '$.type') = ?" if activity_type else ''
+        order = 'DESC' if newest_first else ''
+        params = (activity_type,) if activity_type else ()
+        return self.conn.execute(f'SELECT {columns} FROM activities {where} ORDER BY start_date {order}', params)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
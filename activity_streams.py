@@ -0,0 +1,168 @@
+"""Per-activity distance / time / heart-rate streams, fetched once and kept compressed.
+
+Streams never change after an activity is uploaded, so each one is fetched
+a single time and stored zlib-compressed in SQLite; activities without
+streams (manual entries) are stored as empty so they aren't asked for
+again either. Fetches run concurrently through the shared rate limiter,
+newest activities first, a bounded number per run.
+"""
+import json
+import os
+import sqlite3
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
+import requests
+import metrics
+from strava_api import API_URL, STATE_DIR, RateLimitExceeded, strava_request
+
+STREAM_CACHE_FILE = os.path.join(STATE_DIR, 'streams.db')
+STREAM_KEYS = ('distance', 'time', 'heartrate')
+
+# Streams fetched per run at most; the rest are picked up by later runs,
+# so a long history is backfilled without eating the day's API budget
+STREAMS_PER_RUN = int(os.getenv('STRAVA_STREAMS_PER_RUN', '100'))
+STREAM_FETCH_WORKERS = int(os.getenv('STRAVA_STREAM_FETCH_WORKERS', '8'))
+
+# Streams written per transaction while fetching
+COMMIT_EVERY = 50
+
+def compress_streams(streams):
+    return zlib.compress(json.dumps(streams, separators=(',', ':')).encode(), 6)
+
+def decompress_streams(data):
+    return json.loads(zlib.decompress(data))
+
+class StreamCache:
+    """Compressed streams and their computed best efforts, keyed by activity ID"""
+
+    def __init__(self, path=STREAM_CACHE_FILE):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS streams ('
+            'id INTEGER PRIMARY KEY, data BLOB NOT NULL, efforts TEXT)'
+        )
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM streams').fetchone()[0]
+
+    def missing(self, activity_ids):
+        """The given IDs with no cached streams, in the order given"""
+        cached = {row[0] for row in self.conn.execute('SELECT id FROM streams')}
+        return [activity_id for activity_id in activity_ids if activity_id not in cached]
+
+    def put(self, activity_id, streams):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO streams (id, data, efforts) VALUES (?, ?, NULL)',
+            (activity_id, compress_streams(streams))
+        )
+
+    def commit(self):
+        self.conn.commit()
+
+    def get(self, activity_id):
+        row = self.conn.execute('SELECT data FROM streams WHERE id = ?', (activity_id,)).fetchone()
+        return decompress_streams(row[0]) if row else None
+
+    def iter_streams(self, activity_ids):
+        """(id, streams) for the given IDs that have cached streams"""
+        for activity_id in activity_ids:
+            streams = self.get(activity_id)
+            if streams is not None:
+                yield activity_id, streams
+
+    def iter_efforts(self, activity_ids=None):
+        """Stream (activity ID, saved best efforts or None) for every cached activity,
+        or only those in the set activity_ids"""
+        for activity_id, efforts in self.conn.execute('SELECT id, efforts FROM streams'):
+            if activity_ids is None or activity_id in activity_ids:
+                yield activity_id, json.loads(efforts) if efforts is not None else None
+
+    def set_efforts(self, efforts):
+        """Save computed best efforts, given as (activity ID, efforts) pairs; returns how many.
+
+        Written a batch at a time, so efforts may be a generator computing them.
+        """
+        count = 0
+        efforts = iter(efforts)
+        while True:
+            batch = [(json.dumps(e, separators=(',', ':')), activity_id) for activity_id, e in islice(efforts, COMMIT_EVERY)]
+            if not batch:
+                return count
+            with self.conn:
+                self.conn.executemany('UPDATE streams SET efforts = ? WHERE id = ?', batch)
+            count += len(batch)
+
+    def stored_bytes(self):
+        return self.conn.execute('SELECT COALESCE(SUM(LENGTH(data)), 0) FROM streams').fetchone()[0]
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def fetch_streams(access_token, activity_id, limiter=None):
+    """An activity's streams as {key: [values]}, {} if it has none, None on errors"""
+    url = f'{API_URL}/activities/{activity_id}/streams'
+    headers = {'Authorization': f'Bearer {access_token}'}
+    params = {'keys': ','.join(STREAM_KEYS), 'key_by_type': 'true'}
+    try:
+        response = strava_request('GET', url, limiter=limiter, headers=headers, params=params)
+    except requests.RequestException as e:
+        print(f"Error fetching streams for {activity_id}: {e}")
+        return None
+    if response.status_code == 404:
+        return {}
+    if response.status_code != 200:
+        print(f"Error fetching streams for {activity_id}: {response.status_code}")
+        return None
+    data = response.json()
+    # key_by_type gives {type: {'data': [...], ...}}; a list means no streams
+    if not isinstance(data, dict):
+        return {}
+    return {key: data[key]['data'] for key in STREAM_KEYS if key in data}
+
+def fetch_missing_streams(access_token, cache, activity_ids, max_fetch=STREAMS_PER_RUN,
+                          workers=STREAM_FETCH_WORKERS, limiter=None):
+    """Fetch and cache streams for the given activities that have none cached.
+
+    activity_ids should be newest first; at most max_fetch are fetched. Stops
+    early, keeping what was fetched, once the rate budget runs out. Returns
+    (fetched, still missing).
+    """
+    missing = cache.missing(activity_ids)
+    batch = missing[:max_fetch]
+    fetched = 0
+    stopped = False
+
+    def fetch(activity_id):
+        if stopped:
+            return activity_id, None
+        try:
+            return activity_id, fetch_streams(access_token, activity_id, limiter)
+        except RateLimitExceeded:
+            return activity_id, RateLimitExceeded
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for future in as_completed([pool.submit(fetch, activity_id) for activity_id in batch]):
+            activity_id, streams = future.result()
+            if streams is RateLimitExceeded:
+                if not stopped:
+                    print("⚠ Rate budget exhausted; remaining streams will be fetched next run")
+                stopped = True
+                continue
+            if streams is None:
+                continue
+            cache.put(activity_id, streams)
+            fetched += 1
+            if fetched % COMMIT_EVERY == 0:
+                cache.commit()
+    cache.commit()
+    metrics.count('streams_fetched', fetched)
+    return fetched, len(missing) - fetched
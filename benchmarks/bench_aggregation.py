@@ -0,0 +1,48 @@
+"""Benchmark the row-by-row and columnar aggregation engines on synthetic histories.
+
+Each history is aggregated both as API-shaped dicts and as the Activity
+records the store and export readers produce.
+
+Usage: python benchmarks/bench_aggregation.py [--sizes 10000,100000,1000000]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import activity_record
+from synthetic import synthetic_activities
+from run_aggregates import RunAggregates
+from run_columnar import aggregate_columns, runs_to_columns
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    args = parser.parse_args()
+
+    print(f"{'activities':>10} {'input':<8} {'python':>9} {'columns':>9} {'group-by':>9} {'columnar':>9} {'speedup':>8}")
+    for n in (int(size) for size in args.sizes.split(',')):
+        activities = synthetic_activities(n)
+        inputs = (('dicts', activities), ('records', activity_record.loads(activity_record.dumps(activities))))
+        for label, items in inputs:
+            expected, python_time = timed(RunAggregates.from_activities, items)
+            (columns, runs), load_time = timed(runs_to_columns, items)
+            result, groupby_time = timed(aggregate_columns, columns, runs)
+            assert result.to_state() == expected.to_state(), "engines disagree"
+            columnar_time = load_time + groupby_time
+            print(f"{n:>10,} {label:<8} {python_time:>8.2f}s {load_time:>8.2f}s {groupby_time:>8.2f}s "
+                  f"{columnar_time:>8.2f}s {python_time / columnar_time:>7.1f}x")
+            del expected, columns, runs, result
+        del activities, inputs, items
+        gc.collect()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Stream fetching and best-effort computation.
+
+Fetches synthetic run streams from the fake API with one and several
+workers into a fresh compressed cache, then times the two-pointer best
+efforts against rescanning each window from its end, and the process pool
+against computing in-process.
+
+Usage: python benchmarks/bench_best_efforts.py [--runs 300] [--workers 1,8] [--latency 0.02]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fake_strava import FakeStrava
+from synthetic import synthetic_activities
+
+def rescan_best_effort(distance, time, target):
+    """Each window's start found by scanning back from its end"""
+    best = None
+    for j in range(1, len(distance)):
+        reach = distance[j] - target
+        if reach < distance[0]:
+            continue
+        i = j - 1
+        while distance[i] > reach:
+            i -= 1
+        d0, d1, t0 = distance[i], distance[i + 1], time[i]
+        seconds = time[j] - (t0 + (time[i + 1] - t0) * (reach - d0) / (d1 - d0))
+        if best is None or seconds < best[0]:
+            best = (seconds, i, j)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=300)
+    parser.add_argument('--workers', default='1,8', help='stream fetch workers to compare')
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds per request')
+    args = parser.parse_args()
+
+    runs = [a for a in synthetic_activities(args.runs * 2) if a['type'] == 'Run'][:args.runs]
+    server = FakeStrava(latency=args.latency, athlete_activities=runs).start()
+    os.environ['STRAVA_API_URL'] = server.url
+
+    from activity_streams import StreamCache, fetch_missing_streams
+    from best_efforts import BEST_EFFORT_DISTANCES, BEST_EFFORT_WORKERS, best_effort, compute_efforts
+
+    ids = [run['id'] for run in runs]
+    print(f"{len(runs)} runs")
+    with tempfile.TemporaryDirectory() as state_dir:
+        for workers in (int(w) for w in args.workers.split(',')):
+            before = server.stats()
+            with StreamCache(os.path.join(state_dir, f'streams_{workers}.db')) as cache:
+                start = time.perf_counter()
+                fetched, _ = fetch_missing_streams('bench-token', cache, ids, max_fetch=len(ids), workers=workers)
+                elapsed = time.perf_counter() - start
+                refetched, _ = fetch_missing_streams('bench-token', cache, ids, max_fetch=len(ids), workers=workers)
+                stored = cache.stored_bytes()
+                items = list(cache.iter_streams(ids))
+            downloaded = server.stats()['bytes_sent'] - before['bytes_sent']
+            requests = server.stats()['requests'] - before['requests']
+            print(f"fetch, {workers:>2} workers: {fetched} streams in {elapsed:.2f}s, {requests} requests "
+                  f"({refetched} on the second pass), {downloaded / 2 ** 20:.1f}MB downloaded, "
+                  f"{stored / 2 ** 20:.1f}MB cached")
+    server.stop()
+
+    samples = sum(len(streams['distance']) for _, streams in items)
+    start = time.perf_counter()
+    two_pointer = [[best_effort(s['distance'], s['time'], t) for t in BEST_EFFORT_DISTANCES.values()] for _, s in items]
+    two_pointer_time = time.perf_counter() - start
+    start = time.perf_counter()
+    rescan = [[rescan_best_effort(s['distance'], s['time'], t) for t in BEST_EFFORT_DISTANCES.values()] for _, s in items]
+    rescan_time = time.perf_counter() - start
+    assert all(a == b or abs(a[0] - b[0]) < 1e-6 for x, y in zip(two_pointer, rescan) for a, b in zip(x, y) if a or b)
+    print(f"best efforts over {samples:,} samples: rescan {rescan_time:.2f}s, "
+          f"two-pointer {two_pointer_time:.2f}s ({rescan_time / two_pointer_time:.1f}x)")
+
+    start = time.perf_counter()
+    serial = list(compute_efforts(items, workers=1))
+    serial_time = time.perf_counter() - start
+    start = time.perf_counter()
+    pooled = list(compute_efforts(items, workers=BEST_EFFORT_WORKERS))
+    pooled_time = time.perf_counter() - start
+    assert serial == pooled
+    print(f"compute_efforts: in-process {serial_time:.2f}s, {BEST_EFFORT_WORKERS} processes {pooled_time:.2f}s "
+          f"({serial_time / pooled_time:.1f}x)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Benchmark serial vs concurrent club feed fetching against a local stub server.
+
+Usage: python benchmarks/bench_club_fetch.py [--clubs 24] [--latency 0.2] [--workers 8]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fake_strava import FakeStrava
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clubs', type=int, default=24)
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds per request')
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    club_activities = [
+        {'athlete': {'firstname': f'Runner{i}', 'lastname': 'X.'}, 'name': 'Morning Run',
+         'distance': 5000.0 + i, 'moving_time': 1500 + i, 'type': 'Run'}
+        for i in range(200)
+    ]
+    server = FakeStrava(latency=args.latency, club_activities=club_activities).start()
+    os.environ['STRAVA_API_URL'] = server.url
+
+    import kudos_bot
+
+    club_ids = [str(i) for i in range(args.clubs)]
+    results = {}
+    for label, workers in (('serial', 1), ('concurrent', args.workers)):
+        start = time.perf_counter()
+        feeds = kudos_bot.fetch_club_feeds('stub-token', club_ids, max_workers=workers)
+        results[label] = time.perf_counter() - start
+        assert all(feed.fetched == 200 for feed in feeds)
+        print(f"{label:<11} workers={workers:<3} {results[label]:.2f}s")
+
+    print(f"Speedup: {results['serial'] / results['concurrent']:.1f}x "
+          f"({args.clubs} clubs, {args.latency * 1000:.0f} ms latency)")
+    server.stop()
+
+if __name__ == '__main__':
+    main()
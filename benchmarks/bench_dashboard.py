@@ -0,0 +1,63 @@
+"""Dashboard size and render time with and without per-run downsampling.
+
+Builds running_data.json-shaped data for histories of increasing length
+and renders the dashboard with the capped per-run charts (LTTB scatter,
+pre-binned histogram and calendar) and with every run embedded, reporting
+the HTML size, the scatter and heatmap points handed to Plotly and the
+render time.
+
+Usage: python benchmarks/bench_dashboard.py [--runs 1000,10000,50000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from generate_dashboard import (MAX_HEATMAP_COLUMNS, MAX_SCATTER_POINTS, build_heatmap, build_run_chart_data,
+                                render_dashboard)
+from training_load import training_load
+
+def synthetic_data(runs, seed=0):
+    """Report data with only per-run columns and the daily training load"""
+    rng = random.Random(seed)
+    end = date(2024, 12, 31)
+    span = max(365, runs // 2)
+    points = sorted((end - timedelta(days=rng.randrange(span)), rng.randrange(86400), rng.uniform(1, 30), rng.uniform(3.8, 7))
+                    for _ in range(runs))
+    days = {}
+    for day, _, km, pace in points:
+        totals = days.setdefault(day.isoformat(), [0, 0, 0])
+        totals[0] += 1
+        totals[1] += round(km * 10000)
+        totals[2] += round(km * pace * 60)
+    return {
+        'runs': {
+            'date': [f"{day} {s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for day, s, _, _ in points],
+            'distance_km': [round(km, 2) for _, _, km, _ in points],
+            'pace_min_per_km': [round(pace, 2) for _, _, _, pace in points],
+        },
+        'training': training_load(days, end),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', default='1000,10000,50000')
+    args = parser.parse_args()
+
+    print(f"{'runs':>7} {'mode':<8} {'points':>8} {'html':>9} {'render':>8}")
+    for runs in (int(n) for n in args.runs.split(',')):
+        data = synthetic_data(runs)
+        for mode, max_points, max_columns in (('capped', MAX_SCATTER_POINTS, MAX_HEATMAP_COLUMNS), ('full', runs, runs)):
+            start = time.perf_counter()
+            html = render_dashboard(data, max_points, max_columns)
+            elapsed = time.perf_counter() - start
+            points = (len(build_run_chart_data(data['runs'], max_points)['date'])
+                      + sum(len(row) for row in build_heatmap(data['training'], max_columns)['z']))
+            print(f"{runs:>7} {mode:<8} {points:>8,} {len(html.encode()) / 1024:>7.0f}KB {elapsed * 1000:>6.0f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Microbenchmark the sliced start_date parser and cached month keys against strptime.
+
+Usage: python benchmarks/bench_dates.py [--activities 200000]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from synthetic import synthetic_activities
+import run_aggregates
+from run_aggregates import RunAggregates, bucket_date, month_label, parse_start_date, run_month
+
+def strptime_month(run):
+    """run_month with strptime"""
+    dt = datetime.strptime(bucket_date(run), "%Y-%m-%dT%H:%M:%SZ")
+    return (dt.year, dt.month)
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--activities', type=int, default=200000)
+    args = parser.parse_args()
+
+    activities = synthetic_activities(args.activities)
+    dates = [a['start_date'] for a in activities]
+
+    rows = []
+    slow, slow_time = timed(lambda: [datetime.strptime(d, "%Y-%m-%dT%H:%M:%SZ") for d in dates])
+    fast, fast_time = timed(lambda: [parse_start_date(d) for d in dates])
+    assert slow == fast
+    rows.append(('parse start_date', slow_time, fast_time))
+
+    slow, slow_time = timed(lambda: [strptime_month(a) for a in activities])
+    fast, fast_time = timed(lambda: [run_month(a) for a in activities])
+    assert slow == fast
+    rows.append(('month key', slow_time, fast_time))
+
+    aggregates = RunAggregates.from_activities(activities)
+    keys = sorted(aggregates.monthly_count())
+    tables = 6
+    slow, slow_time = timed(lambda: [[f"{y}-{m:02d}" for y, m in keys] for _ in range(tables)])
+    fast, fast_time = timed(lambda: [[month_label(key) for key in keys] for _ in range(tables)])
+    assert slow == fast
+    rows.append((f'export labels x{tables}', slow_time, fast_time))
+
+    fast_aggregates, fast_time = timed(RunAggregates.from_activities, activities)
+    run_aggregates.run_month = strptime_month
+    try:
+        slow_aggregates, slow_time = timed(RunAggregates.from_activities, activities)
+    finally:
+        run_aggregates.run_month = run_month
+    assert slow_aggregates.months == fast_aggregates.months
+    rows.append(('full aggregation', slow_time, fast_time))
+
+    print(f"{args.activities:,} activities, {len(keys)} months")
+    print(f"{'step':<20} {'strptime':>10} {'fast path':>10} {'speedup':>8}")
+    for label, slow_time, fast_time in rows:
+        print(f"{label:<20} {slow_time * 1000:>8.1f}ms {fast_time * 1000:>8.1f}ms {slow_time / fast_time:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""End-to-end timings of the scripts against a local Strava simulator.
+
+Runs kudos_bot.py, running_analysis.py, generate_dashboard.py and the
+single-process running_pipeline.py as separate processes, as the workflows
+do, against a FakeStrava seeded with
+synthetic clubs and history. Each scenario reports wall time, API requests
+(per endpoint), injected 429s, peak RSS and the script's own phase timings,
+and the whole run is written to a JSON file so results can be compared
+across commits.
+
+Usage: python benchmarks/bench_end_to_end.py [--history 5000] [--club-activities 200]
+           [--latency 0.02] [--throttle-rate 0] [--output bench_results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from fake_strava import FakeStrava
+from synthetic import synthetic_activities, synthetic_club_feeds
+from kudos_bot import CLUB_IDS
+
+# Runs a script as __main__ and reports its peak RSS on exit. The child's own
+# VmHWM is used because ru_maxrss survives exec and would include the
+# benchmark process the child was forked from.
+LAUNCHER = """
+import atexit, os, resource, runpy, sys
+def report_peak_rss():
+    peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak_kib /= 1024
+    try:
+        with open('/proc/self/status') as f:
+            peak_kib = next(int(line.split()[1]) for line in f if line.startswith('VmHWM:'))
+    except (OSError, StopIteration):
+        pass
+    with open(os.environ['BENCH_RSS_FILE'], 'w') as f:
+        f.write(str(peak_kib))
+atexit.register(report_peak_rss)
+script = sys.argv[1]
+sys.argv = sys.argv[1:]
+sys.path.insert(0, os.path.dirname(script))
+runpy.run_path(script, run_name='__main__')
+"""
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def run_script(server, workdir, env, name, script, *args):
+    """Run one script to completion; wall time, its requests and peak RSS"""
+    before = server.stats()
+    metrics_dir = os.path.join(workdir, 'metrics')
+    rss_file = os.path.join(workdir, 'peak_rss')
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, '-c', LAUNCHER, os.path.join(ROOT, script), *args],
+        cwd=workdir, env=dict(env, BENCH_RSS_FILE=rss_file), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    wall = time.perf_counter() - started
+    after = server.stats()
+
+    peak_rss = None
+    if os.path.exists(rss_file):
+        with open(rss_file) as f:
+            peak_rss = round(int(f.read()) / 1024, 1)
+        os.remove(rss_file)
+    job = os.path.splitext(os.path.basename(script))[0]
+    phases = {}
+    metrics_file = os.path.join(metrics_dir, f'{job}.json')
+    if os.path.exists(metrics_file):
+        with open(metrics_file) as f:
+            timers = json.load(f)['timers']
+        phases = {key[len('phase_seconds{phase="'):-2]: timer['sum']
+                  for key, timer in timers.items() if key.startswith('phase_seconds{')}
+        os.remove(metrics_file)
+
+    result = {
+        'scenario': name,
+        'exit_code': process.returncode,
+        'wall_seconds': round(wall, 4),
+        'requests': after['requests'] - before['requests'],
+        'throttled': after['throttled'] - before['throttled'],
+        'endpoints': {endpoint: count - before['endpoints'].get(endpoint, 0)
+                      for endpoint, count in after['endpoints'].items()
+                      if count - before['endpoints'].get(endpoint, 0)},
+        'peak_rss_mb': peak_rss,
+        'phases': phases,
+    }
+    if process.returncode:
+        result['stderr'] = process.stderr.decode(errors='replace')[-2000:]
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--history', type=int, default=5000, help='activities in the athlete history')
+    parser.add_argument('--new-activities', type=int, default=20, help='activities added before the incremental sync')
+    parser.add_argument('--club-activities', type=int, default=200, help='activities per club feed')
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds per request')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of API requests answered with 429 (a throttled kudos post stops the '
+                             'kudos run; a throttled fetch waits out the 15-minute window, as against Strava)')
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args()
+
+    history = synthetic_activities(args.history + args.new_activities, seed=1)
+    server = FakeStrava(
+        latency=args.latency,
+        club_activities=synthetic_club_feeds(CLUB_IDS, args.club_activities),
+        # Newest activities are held back for the incremental sync
+        athlete_activities=sorted(history, key=lambda a: a['start_date'])[:args.history],
+        throttle_rate=args.throttle_rate,
+    ).start()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(
+            os.environ,
+            STRAVA_API_URL=server.url,
+            STRAVA_OAUTH_URL=f'{server.url}/oauth/token',
+            STRAVA_CLIENT_ID='bench',
+            STRAVA_CLIENT_SECRET='bench',
+            STRAVA_REFRESH_TOKEN='bench',
+            STRAVA_STATE_DIR=os.path.join(workdir, 'state'),
+            STRAVA_TOKEN_CACHE_FILE=os.path.join(workdir, 'tokens.json'),
+            STRAVA_METRICS_DIR=os.path.join(workdir, 'metrics'),
+            STRAVA_METRICS_PROMETHEUS='0',
+        )
+        scenarios = [
+            ('kudos_bot cold', 'kudos_bot.py'),
+            ('kudos_bot warm', 'kudos_bot.py'),
+            ('running_analysis full', 'running_analysis.py', '--full'),
+            ('running_analysis incremental', 'running_analysis.py'),
+            ('generate_dashboard', 'generate_dashboard.py'),
+            ('running_pipeline incremental', 'running_pipeline.py', '--quiet'),
+        ]
+        for name, script, *script_args in scenarios:
+            if name == 'running_analysis incremental':
+                server.set_athlete_activities(history)
+            result = run_script(server, workdir, env, name, script, *script_args)
+            results.append(result)
+            status = '✓' if result['exit_code'] == 0 else '✗'
+            print(f"{status} {name:<29} {result['wall_seconds']:>7.2f}s {result['requests']:>6} requests "
+                  f"{result['throttled']:>4} throttled {result['peak_rss_mb'] or 0:>7.1f} MB peak RSS")
+    server.stop()
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': vars(args),
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    if any(result['exit_code'] for result in results):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
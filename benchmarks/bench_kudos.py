@@ -0,0 +1,46 @@
+"""Benchmark sequential vs concurrent kudos posting against a fake Strava with latency.
+
+Usage: python benchmarks/bench_kudos.py [--activities 200] [--latency 0.05] [--in-flight 8]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fake_strava import FakeStrava
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--activities', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per request')
+    parser.add_argument('--in-flight', type=int, default=8)
+    args = parser.parse_args()
+
+    server = FakeStrava(latency=args.latency).start()
+    os.environ['STRAVA_API_URL'] = server.url
+    # Keep the limiter out of the way: this measures request overlap, not pacing
+    os.environ.setdefault('STRAVA_RATE_BURST', str(10 * args.activities))
+    os.environ.setdefault('STRAVA_RATE_LIMIT_15MIN', str(10 * args.activities))
+    os.environ.setdefault('STRAVA_RATE_LIMIT_DAILY', str(10 * args.activities))
+
+    import kudos_bot
+
+    results = {}
+    for round_number, (label, in_flight) in enumerate((('sequential', 1), ('concurrent', args.in_flight))):
+        # Fresh IDs each round so every post is a 201
+        activities = [{'id': round_number * 1_000_000 + i} for i in range(args.activities)]
+        start = time.perf_counter()
+        statuses = [status for _, status in kudos_bot.dispatch_kudos('fake-token', activities, in_flight)]
+        results[label] = time.perf_counter() - start
+        assert statuses.count(201) == args.activities, statuses
+        print(f"{label:<11} in-flight={in_flight:<3} {results[label]:.2f}s "
+              f"({args.activities / results[label]:.0f} posts/s)")
+
+    print(f"Speedup: {results['sequential'] / results['concurrent']:.1f}x "
+          f"({args.activities} posts, {args.latency * 1000:.0f} ms latency)")
+    server.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Kudos targeting rules: compiled predicate speed and kudos requests saved.
+
+Times the compiled rule set against re-reading the rule config for every
+activity, then runs one kudos pass over synthetic club feeds with and
+without the rules and counts the kudos posts each sends.
+
+Usage: python benchmarks/bench_kudos_rules.py [--clubs 10] [--per-club 200] [--activities 200000]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fake_strava import FakeStrava
+from synthetic import synthetic_club_activity, synthetic_club_feeds
+
+RULES = {
+    'types': ['Run'],
+    'min_distance_km': 3,
+    'min_moving_time_min': 15,
+    'deny_athletes': [f'Runner{i} X.' for i in range(0, 500, 10)],
+    'default_club_quota': 60,
+}
+
+def interpreted_allows(config, activity):
+    """The same rules, looked up in the config for every activity"""
+    if config.get('types') and activity.get('type') not in config['types']:
+        return False
+    if config.get('min_distance_km') and (activity.get('distance') or 0) < config['min_distance_km'] * 1000:
+        return False
+    if config.get('min_moving_time_min') and (activity.get('moving_time') or 0) < config['min_moving_time_min'] * 60:
+        return False
+    athlete = activity.get('athlete') or {}
+    name = f"{athlete.get('firstname', '')} {athlete.get('lastname', '')}"
+    if any(' '.join(name.split()).casefold() == ' '.join(d.split()).casefold() for d in config.get('deny_athletes', [])):
+        return False
+    return True
+
+def kudos_pass(kudos_bot, club_ids, rules, state_dir):
+    from kudos_state import DedupIndex, KudosLedger
+    with DedupIndex(os.path.join(state_dir, 'seen.db')) as seen, \
+            KudosLedger(os.path.join(state_dir, 'ledger.db')) as ledger:
+        if rules is not None:
+            rules.begin_run()
+        feeds = kudos_bot.fetch_club_feeds('bench-token', club_ids, {}, seen, rules=rules, ledger=ledger)
+        activities = [activity for feed in feeds for activity in feed.activities]
+        with contextlib.redirect_stdout(io.StringIO()):
+            return kudos_bot.give_kudos_to_activities('bench-token', activities, ledger)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clubs', type=int, default=10)
+    parser.add_argument('--per-club', type=int, default=200)
+    parser.add_argument('--activities', type=int, default=200000, help='activities for the predicate timing')
+    parser.add_argument('--latency', type=float, default=0.01, help='seconds per request')
+    args = parser.parse_args()
+
+    import activity_record
+    from kudos_rules import KudosRules
+
+    rng = random.Random(0)
+    activities = activity_record.loads(activity_record.dumps(
+        [synthetic_club_activity(i, rng) for i in range(args.activities)]))
+    rules = KudosRules.from_config(RULES)
+    start = time.perf_counter()
+    compiled = [rules.reject_reason(a) is None for a in activities]
+    compiled_time = time.perf_counter() - start
+    start = time.perf_counter()
+    interpreted = [interpreted_allows(RULES, a) for a in activities]
+    interpreted_time = time.perf_counter() - start
+    assert compiled == interpreted
+    print(f"{len(activities):,} activities: interpreted {interpreted_time:.2f}s, compiled {compiled_time:.2f}s "
+          f"({interpreted_time / compiled_time:.1f}x), {sum(compiled):,} pass")
+
+    club_ids = [str(100 + i) for i in range(args.clubs)]
+    server = FakeStrava(latency=args.latency, club_activities=synthetic_club_feeds(club_ids, args.per_club)).start()
+    os.environ['STRAVA_API_URL'] = server.url
+    import kudos_bot
+
+    for label, pass_rules in (('no rules', None), ('rules', KudosRules.from_config(RULES))):
+        server.kudos.clear()
+        before = server.stats()['endpoints'].get('/activities/{id}/kudos', 0)
+        with tempfile.TemporaryDirectory() as state_dir:
+            start = time.perf_counter()
+            summary = kudos_pass(kudos_bot, club_ids, pass_rules, state_dir)
+            elapsed = time.perf_counter() - start
+        posts = server.stats()['endpoints'].get('/activities/{id}/kudos', 0) - before
+        filtered = f", {pass_rules.summary()}" if pass_rules else ''
+        print(f"{label:<9} {elapsed:>6.2f}s {posts:>6} kudos posts ({summary['given']} given){filtered}")
+    server.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Throughput of bucketing runs by local start month vs the old UTC month.
+
+Times both engines on the same history three ways: by UTC start_date (the
+old buckets), by start_date_local, and by converting start_date through the
+timezone field (for activities without start_date_local).
+
+Usage: python benchmarks/bench_local_months.py [--activities 200000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from synthetic import synthetic_activities
+import run_aggregates
+import run_columnar
+from run_aggregates import RunAggregates, bucket_date
+
+def utc_start_date(run):
+    return run['start_date']
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def aggregate(engine, activities, local):
+    """Aggregate with the given bucket-date function patched in"""
+    saved = run_aggregates.bucket_date, run_columnar.bucket_date
+    run_aggregates.bucket_date = run_columnar.bucket_date = local
+    try:
+        if engine == 'columnar':
+            return timed(run_columnar.aggregate_activities, activities)
+        return timed(RunAggregates.from_activities, activities)
+    finally:
+        run_aggregates.bucket_date, run_columnar.bucket_date = saved
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--activities', type=int, default=200000)
+    args = parser.parse_args()
+
+    activities = synthetic_activities(args.activities)
+    timezone_only = [{k: v for k, v in a.items() if k != 'start_date_local'} for a in activities]
+    engines = ['python'] + (['columnar'] if run_columnar.np is not None else [])
+
+    moved = sum(1 for a in activities if a['type'] == 'Run' and a['start_date'][:7] != a['start_date_local'][:7])
+    print(f"{args.activities:,} activities, {moved} runs in a different local month")
+    print(f"{'engine':<9} {'UTC month':>10} {'local':>10} {'timezone':>10}")
+    for engine in engines:
+        utc, utc_time = aggregate(engine, activities, utc_start_date)
+        local, local_time = aggregate(engine, activities, bucket_date)
+        zoned, zoned_time = aggregate(engine, timezone_only, bucket_date)
+        assert zoned.months == local.months
+        print(f"{engine:<9} {utc_time * 1000:>8.1f}ms {local_time * 1000:>8.1f}ms {zoned_time * 1000:>8.1f}ms")
+
+if __name__ == '__main__':
+    main()
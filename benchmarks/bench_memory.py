@@ -0,0 +1,80 @@
+"""Peak memory of loading a whole export vs the streaming pipeline, at growing history sizes.
+
+The last column streams with the per-run series the dashboard scatter
+needs (what --export does), collected as RunColumns.
+
+Usage: python benchmarks/bench_memory.py [--sizes 10000,50000,200000]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from synthetic import synthetic_activities
+from run_aggregates import RunAggregates
+from running_analysis import RunColumns, tap_run_points
+from strava_export import iter_export_activities
+
+def write_export(path, n):
+    """Write a JSON-array export of n activities, a chunk at a time"""
+    with open(path, 'w') as f:
+        f.write('[')
+        for start in range(0, n, 10000):
+            for i, activity in enumerate(synthetic_activities(min(10000, n - start), seed=start)):
+                if start or i:
+                    f.write(',')
+                json.dump(activity, f)
+        f.write(']')
+
+def load_all(path):
+    """The old shape: whole history in memory, then a filtered runs list"""
+    with open(path) as f:
+        activities = json.load(f)
+    runs = [a for a in activities if a.get('type') == 'Run']
+    return RunAggregates.from_activities(runs)
+
+def stream(path):
+    return RunAggregates.from_activities(iter_export_activities(path))
+
+def stream_with_runs(path):
+    runs = RunColumns()
+    aggregates = RunAggregates.from_activities(tap_run_points(iter_export_activities(path), runs))
+    runs.series()
+    return aggregates
+
+def measure(func, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(path)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, peak / 2 ** 20, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,50000,200000')
+    args = parser.parse_args()
+
+    print(f"{'activities':>10} {'load-all peak':>14} {'streaming peak':>15} {'+ runs peak':>12} "
+          f"{'load-all':>9} {'streaming':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in (int(size) for size in args.sizes.split(',')):
+            path = os.path.join(tmp, f'activities_{n}.json')
+            write_export(path, n)
+            expected, load_peak, load_time = measure(load_all, path)
+            result, stream_peak, stream_time = measure(stream, path)
+            assert result.to_state() == expected.to_state()
+            result, runs_peak, _ = measure(stream_with_runs, path)
+            assert result.to_state() == expected.to_state()
+            print(f"{n:>10,} {load_peak:>11.1f} MB {stream_peak:>12.1f} MB {runs_peak:>9.1f} MB "
+                  f"{load_time:>8.2f}s {stream_time:>9.2f}s")
+            os.remove(path)
+
+if __name__ == '__main__':
+    main()
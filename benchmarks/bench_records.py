@@ -0,0 +1,85 @@
+"""Memory per activity: raw API dicts vs Activity records vs an ActivityBatch.
+
+Decodes a page-shaped JSON body of full activity summaries (polyline, athlete
+blob, gear and device fields included, as Strava sends them) each way and
+measures what stays allocated.
+
+Usage: python benchmarks/bench_records.py [--activities 20000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from synthetic import synthetic_activities
+import activity_record
+from activity_record import ActivityBatch
+
+POLYLINE_CHARS = '?@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\\]^_`abcdefghijklmnopqrstuvwxyz{|}~'
+
+def strava_summary(activity, rng):
+    """Pad a synthetic activity out to a full API activity summary"""
+    return dict(
+        activity,
+        resource_state=2,
+        athlete={'id': 123456, 'resource_state': 1},
+        sport_type=activity['type'],
+        workout_type=None,
+        elapsed_time=activity['moving_time'] + rng.randrange(600),
+        utc_offset=0.0,
+        location_city=None, location_state=None, location_country='Iceland',
+        achievement_count=rng.randrange(5), kudos_count=rng.randrange(30),
+        comment_count=rng.randrange(3), athlete_count=1, photo_count=0,
+        map={'id': f"a{activity['id']}", 'resource_state': 2,
+             'summary_polyline': ''.join(rng.choice(POLYLINE_CHARS) for _ in range(rng.randrange(300, 1500)))},
+        trainer=False, commute=False, manual=False, private=False, visibility='everyone',
+        flagged=False, gear_id='g1234567', start_latlng=[64.14, -21.94], end_latlng=[64.15, -21.93],
+        average_speed=round(activity['distance'] / activity['moving_time'], 3),
+        max_speed=round(rng.uniform(4, 7), 3), average_cadence=round(rng.uniform(80, 90), 1),
+        has_heartrate='average_heartrate' in activity, max_heartrate=190.0,
+        heartrate_opt_out=False, display_hide_heartrate_option=True,
+        elev_high=round(rng.uniform(20, 200), 1), elev_low=round(rng.uniform(0, 20), 1),
+        upload_id=activity['id'] * 7, upload_id_str=str(activity['id'] * 7),
+        external_id=f"garmin_ping_{activity['id']}", from_accepted_tag=False,
+        pr_count=rng.randrange(3), total_photo_count=0, has_kudoed=False,
+        suffer_score=rng.randrange(200),
+    )
+
+def measure(func, body):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(body)
+    elapsed = time.perf_counter() - start
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, current, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--activities', type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    body = json.dumps([strava_summary(a, rng) for a in synthetic_activities(args.activities)])
+    n = args.activities
+
+    dicts, dict_bytes, dict_time = measure(json.loads, body)
+    records, record_bytes, record_time = measure(activity_record.loads, body)
+    batch, batch_bytes, batch_time = measure(lambda b: ActivityBatch(activity_record.loads(b)), body)
+    assert [r.to_json() for r in records] == [activity_record.Activity.from_json(d).to_json() for d in dicts]
+    assert list(batch)[:100] == records[:100]
+
+    print(f"{n:,} activities, {len(body) / n:.0f} bytes of JSON each")
+    print(f"{'form':<16} {'bytes/activity':>15} {'vs dicts':>9} {'decode':>8}")
+    for label, size, elapsed in (('API dicts', dict_bytes, dict_time),
+                                 ('Activity', record_bytes, record_time),
+                                 ('ActivityBatch', batch_bytes, batch_time)):
+        print(f"{label:<16} {size / n:>15.0f} {dict_bytes / size:>8.1f}x {elapsed:>7.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Repeated club feed polls with and without the response cache.
+
+Polls a set of mostly quiet clubs the way the daemon does (watermarks and
+dedup included, kudos left out), with new activities appearing in a few
+clubs between polls. Compares plain GETs, the cache against a server that
+ignores validators (body digests only) and one that answers 304s.
+
+Usage: python benchmarks/bench_response_cache.py [--clubs 20] [--polls 30] [--busy 0.1]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fake_strava import FakeStrava
+from synthetic import synthetic_club_activity, synthetic_club_feeds
+
+def poll(kudos_bot, club_ids, polls, busy, server, cache, state_dir, seed):
+    from kudos_state import DedupIndex, advance_watermark
+    rng = random.Random(seed)
+    feeds = server.club_activities
+    next_id = 10 ** 7
+    watermarks = {}
+    fetch_time = 0.0
+    with DedupIndex(os.path.join(state_dir, f'seen_{seed}_{id(cache)}.db')) as seen:
+        for _ in range(polls):
+            # A few clubs get new activities between polls
+            for club_id in club_ids:
+                if rng.random() < busy:
+                    feeds[club_id] = [synthetic_club_activity(next_id, rng)] + feeds[club_id][:-1]
+                    next_id += 1
+            start = time.perf_counter()
+            for feed in kudos_bot.fetch_club_feeds('bench-token', club_ids, watermarks, seen, cache=cache):
+                if feed.fetched:
+                    watermarks[feed.club_id] = advance_watermark(watermarks.get(feed.club_id), feed.head_keys)
+            fetch_time += time.perf_counter() - start
+            seen.commit()
+    return fetch_time
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clubs', type=int, default=20)
+    parser.add_argument('--polls', type=int, default=30)
+    parser.add_argument('--busy', type=float, default=0.1, help='chance a club has a new activity between polls')
+    parser.add_argument('--latency', type=float, default=0.01, help='seconds per request')
+    args = parser.parse_args()
+
+    club_ids = [str(100 + i) for i in range(args.clubs)]
+    server = FakeStrava(latency=args.latency).start()
+    os.environ['STRAVA_API_URL'] = server.url
+
+    import kudos_bot
+    from response_cache import ResponseCache
+
+    print(f"{args.clubs} clubs x {args.polls} polls, {args.busy:.0%} of clubs busy per poll")
+    print(f"{'mode':<22} {'fetch time':>10} {'downloaded':>11}  cache")
+    with tempfile.TemporaryDirectory() as state_dir:
+        for label, use_cache, etags in (('no cache', False, False),
+                                        ('cache, digests only', True, False),
+                                        ('cache, ETag / 304', True, True)):
+            server.club_activities = synthetic_club_feeds(club_ids, 200)
+            server.etags = etags
+            before = server.stats()['bytes_sent']
+            cache = ResponseCache(os.path.join(state_dir, f'{label}.db')) if use_cache else None
+            fetch_time = poll(kudos_bot, club_ids, args.polls, args.busy, server, cache, state_dir, seed=1)
+            downloaded = server.stats()['bytes_sent'] - before
+            summary = cache.summary() if cache else ''
+            if cache:
+                cache.close()
+            print(f"{label:<22} {fetch_time:>9.2f}s {downloaded / 2 ** 20:>9.1f}MB  {summary}")
+    server.stop()
+
+if __name__ == '__main__':
+    main()
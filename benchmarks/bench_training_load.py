@@ -0,0 +1,67 @@
+"""Linear-time training-load metrics vs recomputing each day's windows from scratch.
+
+Usage: python benchmarks/bench_training_load.py [--years 2,5,10] [--runs-per-week 5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from training_load import ACUTE_DAYS, CHRONIC_DAYS, ROLLING_WINDOWS, daily_series, training_load
+
+def synthetic_days(years, runs_per_week, today, seed=0):
+    """RunAggregates.days-shaped totals for a history ending today"""
+    rng = random.Random(seed)
+    days = {}
+    for offset in range(years * 365):
+        if rng.random() < runs_per_week / 7:
+            distance_dm = rng.randrange(30000, 250000)
+            days[(today - timedelta(days=offset)).isoformat()] = [1, distance_dm, distance_dm * 33 // 100]
+    return days
+
+def naive_training_load(days, today):
+    """Every day's windows and loads recomputed from the whole history up to that day"""
+    first, counts, distances = daily_series(days, today)
+    n = len(distances)
+    rolling = {window: [] for window in ROLLING_WINDOWS}
+    atl, ctl = [], []
+    for i in range(n):
+        for window in ROLLING_WINDOWS:
+            rolling[window].append(sum(distances[j] for j in range(n) if i - window < j <= i))
+        # Closed form of the exponential average, summed over all earlier days
+        atl.append(sum(distances[j] / 10000 / ACUTE_DAYS * (1 - 1 / ACUTE_DAYS) ** (i - j) for j in range(i + 1)))
+        ctl.append(sum(distances[j] / 10000 / CHRONIC_DAYS * (1 - 1 / CHRONIC_DAYS) ** (i - j) for j in range(i + 1)))
+    return rolling, atl, ctl
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--years', default='2,5,10')
+    parser.add_argument('--runs-per-week', type=float, default=5)
+    args = parser.parse_args()
+
+    today = date(2024, 12, 31)
+    print(f"{'years':>5} {'days':>6} {'naive':>9} {'linear':>9} {'speedup':>8}")
+    for years in (int(y) for y in args.years.split(',')):
+        days = synthetic_days(years, args.runs_per_week, today)
+
+        start = time.perf_counter()
+        training = training_load(days, today)
+        linear_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rolling, atl, ctl = naive_training_load(days, today)
+        naive_time = time.perf_counter() - start
+
+        for window in ROLLING_WINDOWS:
+            assert training[f'distance_{window}d_km'] == [round(v / 10000, 2) for v in rolling[window]]
+        assert all(abs(a - b) < 0.01 for a, b in zip(training['atl'], atl))
+        assert all(abs(a - b) < 0.01 for a, b in zip(training['ctl'], ctl))
+        n = len(training['distance_km'])
+        print(f"{years:>5} {n:>6} {naive_time:>8.2f}s {linear_time * 1000:>7.1f}ms {naive_time / linear_time:>7.0f}x")
+
+if __name__ == '__main__':
+    main()
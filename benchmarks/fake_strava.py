@@ -0,0 +1,196 @@
+"""A local stand-in for the Strava endpoints the scripts call.
+
+Serves the OAuth token exchange, club feeds, the athlete's activity
+history and its activities' streams, and accepts kudos posts, with configurable latency, rate-limit
+headers and injected 429s, so benchmarks can exercise the real request
+paths without touching Strava.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from calendar import timegm
+from collections import Counter
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from synthetic import synthetic_streams
+
+OAUTH_TOKEN = '/oauth/token'
+ATHLETE_ACTIVITIES = '/athlete/activities'
+CLUB_ACTIVITIES = re.compile(r'^/clubs/(\w+)/activities$')
+KUDOS = re.compile(r'^/activities/(\d+)/kudos$')
+STREAMS = re.compile(r'^/activities/(\d+)/streams$')
+
+def _epoch(start_date):
+    return timegm(datetime.strptime(start_date, "%Y-%m-%dT%H:%M:%SZ").timetuple())
+
+class FakeStrava(ThreadingHTTPServer):
+    """Fake API server.
+
+    club_activities is either one feed served for every club or a dict of
+    club id -> feed. athlete_activities is the history served, newest first,
+    from /athlete/activities; each one's streams are synthesized from its
+    distance and moving time, the same for every request. throttle_rate is the fraction of API requests
+    answered with an injected 429; rate_limits are the (15-minute, daily)
+    limits reported in the X-RateLimit headers. With etags, club feed pages
+    carry an ETag and a matching If-None-Match gets a bodiless 304.
+    """
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, club_activities=None, athlete_activities=None,
+                 throttle_rate=0.0, rate_limits=(100000, 1000000), etags=False, seed=0):
+        super().__init__(('127.0.0.1', 0), FakeStravaHandler)
+        self.latency = latency
+        self.club_activities = club_activities or []
+        self.set_athlete_activities(athlete_activities or [])
+        self.throttle_rate = throttle_rate
+        self.rate_limits = rate_limits
+        self.etags = etags
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.bytes_sent = 0
+        self.endpoints = Counter()
+        self.kudos = set()
+
+    def set_athlete_activities(self, activities):
+        self.athlete_activities = sorted(activities, key=lambda a: a['start_date'], reverse=True)
+        self.athlete_epochs = [_epoch(a['start_date']) for a in self.athlete_activities]
+        self.athlete_by_id = {a['id']: a for a in self.athlete_activities}
+
+    def club_feed(self, club_id):
+        if isinstance(self.club_activities, dict):
+            return self.club_activities.get(club_id, [])
+        return self.club_activities
+
+    def stats(self):
+        with self.lock:
+            return {'requests': self.requests, 'throttled': self.throttled, 'bytes_sent': self.bytes_sent,
+                    'endpoints': dict(self.endpoints)}
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_port}'
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+class FakeStravaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _send_json(self, status, data, conditional=False):
+        body = json.dumps(data).encode()
+        etag = None
+        if conditional and self.server.etags:
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+            if self.headers.get('If-None-Match') == etag:
+                status, body = 304, b''
+        with self.server.lock:
+            self.server.bytes_sent += len(body)
+        self.send_response(status)
+        if etag:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        short_limit, daily_limit = self.server.rate_limits
+        self.send_header('X-RateLimit-Limit', f'{short_limit},{daily_limit}')
+        self.send_header('X-RateLimit-Usage', f'{self.usage},{self.usage}')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _begin(self, endpoint):
+        """Count and delay the request; True if it should be throttled"""
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.endpoints[endpoint] += 1
+            self.usage = server.requests
+            throttle = endpoint != OAUTH_TOKEN and server.random.random() < server.throttle_rate
+            if throttle:
+                server.throttled += 1
+        time.sleep(server.latency)
+        return throttle
+
+    def _route(self):
+        url = urlsplit(self.path)
+        self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        path = url.path
+        for pattern, endpoint in ((CLUB_ACTIVITIES, '/clubs/{id}/activities'), (KUDOS, '/activities/{id}/kudos'),
+                                  (STREAMS, '/activities/{id}/streams')):
+            match = pattern.match(path)
+            if match:
+                return endpoint, match.group(1)
+        return path, None
+
+    def _page(self, items):
+        page = int(self.query.get('page', 1))
+        per_page = int(self.query.get('per_page', 30))
+        return items[(page - 1) * per_page:page * per_page]
+
+    def _athlete_activities(self):
+        activities = self.server.athlete_activities
+        after = self.query.get('after')
+        if after is not None:
+            # Like Strava: only later activities, oldest first
+            epochs = self.server.athlete_epochs
+            activities = [a for a, epoch in zip(activities, epochs) if epoch > int(after)][::-1]
+        return self._page(activities)
+
+    def _streams(self, activity_id):
+        activity = self.server.athlete_by_id.get(activity_id)
+        if activity is None:
+            return None
+        rng = random.Random(zlib.crc32(str(activity_id).encode()))
+        return synthetic_streams(activity['distance'], activity['moving_time'], rng,
+                                 heartrate='average_heartrate' in activity)
+
+    def do_GET(self):
+        endpoint, match = self._route()
+        if self._begin(endpoint):
+            self._send_json(429, {'message': 'Rate Limit Exceeded'})
+        elif endpoint == '/clubs/{id}/activities':
+            self._send_json(200, self._page(self.server.club_feed(match)), conditional=True)
+        elif endpoint == ATHLETE_ACTIVITIES:
+            self._send_json(200, self._athlete_activities())
+        elif endpoint == '/activities/{id}/streams':
+            streams = self._streams(int(match))
+            if streams is None:
+                self._send_json(404, {'message': 'Record Not Found'})
+            else:
+                self._send_json(200, streams)
+        else:
+            self._send_json(404, {'message': 'Record Not Found'})
+
+    def do_POST(self):
+        endpoint, match = self._route()
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if self._begin(endpoint):
+            self._send_json(429, {'message': 'Rate Limit Exceeded'})
+        elif endpoint == OAUTH_TOKEN:
+            self._send_json(200, {
+                'access_token': f'fake-access-{self.server.requests}',
+                'refresh_token': 'fake-refresh',
+                'expires_at': int(time.time()) + 6 * 3600,
+            })
+        elif endpoint == '/activities/{id}/kudos':
+            activity_id = int(match)
+            with self.server.lock:
+                already = activity_id in self.server.kudos
+                self.server.kudos.add(activity_id)
+            self._send_json(409 if already else 201, {})
+        else:
+            self._send_json(404, {'message': 'Record Not Found'})
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,77 @@
+"""Synthetic Strava activities shaped like /athlete/activities summaries."""
+import random
+from datetime import datetime, timedelta, timezone
+
+EPOCH = datetime(2015, 1, 1, tzinfo=timezone.utc)
+TYPES = ['Run', 'Run', 'Run', 'Ride', 'Walk']
+# Zones without DST, so start_date_local is a fixed offset from start_date
+TIMEZONES = [(-5, '(GMT-05:00) America/Bogota'), (0, '(GMT+00:00) Atlantic/Reykjavik'), (1, '(GMT+01:00) Africa/Lagos')]
+
+def synthetic_activity(i, rng):
+    start = EPOCH + timedelta(seconds=rng.randrange(10 * 365 * 86400))
+    distance = round(rng.uniform(800, 30000), 1)
+    offset, zone = rng.choice(TIMEZONES)
+    activity = {
+        'id': 1_000_000 + i,
+        'name': f'Activity {i}',
+        'type': rng.choice(TYPES),
+        'start_date': start.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'start_date_local': (start + timedelta(hours=offset)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'timezone': zone,
+        'distance': distance,
+        'moving_time': int(distance / 1000 * rng.uniform(240, 420)),
+        'total_elevation_gain': round(rng.uniform(0, 400), 1),
+    }
+    if rng.random() < 0.7:
+        activity['average_heartrate'] = round(rng.uniform(120, 180), 1)
+    return activity
+
+def synthetic_activities(n, seed=0):
+    """n activities in random order (reproducible for a given seed)"""
+    rng = random.Random(seed)
+    return [synthetic_activity(i, rng) for i in range(n)]
+
+def synthetic_club_activity(i, rng):
+    """A club feed entry: athlete initials and stats, plus an id for kudos"""
+    distance = round(rng.uniform(800, 30000), 1)
+    return {
+        'id': 5_000_000 + i,
+        'athlete': {'firstname': f'Runner{rng.randrange(500)}', 'lastname': 'X.'},
+        'name': rng.choice(['Morning Run', 'Lunch Run', 'Evening Run', 'Afternoon Ride']),
+        'type': rng.choice(TYPES),
+        'distance': distance,
+        'moving_time': int(distance / 1000 * rng.uniform(240, 420)),
+        'total_elevation_gain': round(rng.uniform(0, 400), 1),
+    }
+
+def synthetic_club_feeds(club_ids, per_club, seed=0):
+    """club id -> feed of per_club activities, newest first; ids are unique across clubs"""
+    rng = random.Random(seed)
+    return {
+        club_id: [synthetic_club_activity(c * per_club + i, rng) for i in range(per_club)]
+        for c, club_id in enumerate(club_ids)
+    }
+
+def synthetic_streams(distance, moving_time, rng, heartrate=True):
+    """key_by_type distance / time / heartrate streams for a run of the given length.
+
+    Samples come every 1-5 s (like smart recording) with the pace drifting
+    around the run's average, so best efforts vary within a run.
+    """
+    distance = round(distance, 1)
+    speed = distance / moving_time
+    distances, times, hrs = [0.0], [0], [rng.randrange(90, 110)]
+    pace = 1.0
+    while distances[-1] < distance:
+        step = rng.randrange(1, 6)
+        pace = min(1.4, max(0.7, pace + rng.uniform(-0.05, 0.05)))
+        times.append(times[-1] + step)
+        distances.append(round(min(distance, distances[-1] + speed * pace * step), 1))
+        hrs.append(min(195, max(90, hrs[-1] + rng.randrange(-3, 4))))
+    streams = {
+        'distance': {'data': distances, 'series_type': 'distance', 'original_size': len(distances), 'resolution': 'high'},
+        'time': {'data': times, 'series_type': 'distance', 'original_size': len(times), 'resolution': 'high'},
+    }
+    if heartrate:
+        streams['heartrate'] = {'data': hrs, 'series_type': 'distance', 'original_size': len(hrs), 'resolution': 'high'}
+    return streams
@@ -0,0 +1,141 @@
+"""Best efforts over standard distances from activity streams.
+
+Each distance is a single two-pointer pass over a run's distance stream:
+the window end advances one sample at a time and the start follows it
+while the window still covers the distance, so every sample is visited
+at most twice. The start is interpolated between samples, giving the
+time for exactly the distance rather than for the first whole window
+covering it. Activities are spread over a process pool when there are
+enough of them to be worth it.
+"""
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from run_aggregates import local_start_date
+
+# Distances (m) best efforts are computed for, by label
+BEST_EFFORT_DISTANCES = {'1k': 1000, '5k': 5000, '10k': 10000}
+
+# Efforts listed per distance in the personal-record tables
+PR_TABLE_SIZE = int(os.getenv('RUNNING_PR_TABLE_SIZE', '5'))
+
+# Worker processes for computing efforts; 1 computes in-process
+BEST_EFFORT_WORKERS = int(os.getenv('RUNNING_BEST_EFFORT_WORKERS', str(os.cpu_count() or 1)))
+# Fewer activities than this are computed in-process, where a pool's
+# startup would cost more than it saves
+POOL_MIN_ACTIVITIES = 32
+# Activities whose streams are decompressed and handed to the workers at
+# once, so recomputing a whole history never holds all of its streams
+EFFORT_BATCH_SIZE = 64
+
+def best_effort(distance, time, target):
+    """Fastest time (s) over target metres, with the window's sample indices.
+
+    Returns (seconds, start, end) or None if the stream is shorter than target.
+    """
+    n = len(distance)
+    if n < 2 or distance[-1] - distance[0] < target:
+        return None
+    best = None
+    i = 0
+    for j in range(1, n):
+        reach = distance[j] - target
+        if reach < distance[0]:
+            continue
+        # Advance the start while the window from the next sample still covers target
+        while distance[i + 1] <= reach:
+            i += 1
+        # Interpolate where exactly target metres before sample j was passed
+        d0 = distance[i]
+        d1 = distance[i + 1]
+        t0 = time[i]
+        start_time = t0 + (time[i + 1] - t0) * (reach - d0) / (d1 - d0) if d1 > d0 else t0
+        seconds = time[j] - start_time
+        if best is None or seconds < best[0]:
+            best = (seconds, i, j)
+    return best
+
+def activity_efforts(streams, distances=BEST_EFFORT_DISTANCES):
+    """{label: [seconds, average heart rate or None]} for one activity, None where too short"""
+    distance = streams.get('distance')
+    time = streams.get('time')
+    heartrate = streams.get('heartrate')
+    efforts = {}
+    for label, target in distances.items():
+        effort = best_effort(distance, time, target) if distance and time else None
+        if effort is None:
+            efforts[label] = None
+            continue
+        seconds, start, end = effort
+        avg_hr = None
+        if heartrate and len(heartrate) == len(distance):
+            window = heartrate[start:end + 1]
+            avg_hr = round(sum(window) / len(window), 1)
+        efforts[label] = [round(seconds, 1), avg_hr]
+    return efforts
+
+def _activity_efforts(item):
+    activity_id, streams = item
+    return activity_id, activity_efforts(streams)
+
+def compute_efforts(items, workers=BEST_EFFORT_WORKERS, batch_size=EFFORT_BATCH_SIZE):
+    """Yield (activity ID, efforts) for (activity ID, streams) pairs.
+
+    items is read batch_size pairs at a time, so only one batch of streams
+    is in memory however many there are.
+    """
+    items = iter(items)
+    batch = list(islice(items, batch_size))
+    if workers <= 1 or len(batch) < POOL_MIN_ACTIVITIES:
+        while batch:
+            yield from map(_activity_efforts, batch)
+            batch = list(islice(items, batch_size))
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while batch:
+            chunksize = max(1, len(batch) // (workers * 4))
+            yield from pool.map(_activity_efforts, batch, chunksize=chunksize)
+            batch = list(islice(items, batch_size))
+
+def personal_records(efforts, load_runs, size=PR_TABLE_SIZE):
+    """The fastest efforts per distance, in the running_data.json 'best_efforts' shape.
+
+    efforts are (activity ID, efforts) pairs, streamed: only the fastest
+    size per distance are kept, and load_runs(ids) is then asked for
+    {id: activity} of just those activities. Ties go to the lower ID.
+    """
+    # Per distance, a heap of the fastest so far as (-seconds, -id, avg_hr),
+    # so the slowest of them is on top
+    tables = {label: [] for label in BEST_EFFORT_DISTANCES}
+    for activity_id, run_efforts in efforts:
+        for label, table in tables.items():
+            effort = run_efforts.get(label)
+            if not effort:
+                continue
+            entry = (-effort[0], -activity_id, effort[1])
+            if len(table) < size:
+                heapq.heappush(table, entry)
+            elif entry > table[0]:
+                heapq.heapreplace(table, entry)
+    runs = load_runs({-entry[1] for table in tables.values() for entry in table})
+    records = {}
+    for label, target in BEST_EFFORT_DISTANCES.items():
+        ranked = [(-seconds, runs[-negative_id], avg_hr) for seconds, negative_id, avg_hr
+                  in sorted(tables[label], reverse=True) if -negative_id in runs]
+        if ranked:
+            records[label] = [{
+                'id': run['id'],
+                'name': run.get('name'),
+                'date': local_start_date(run)[:10],
+                'seconds': seconds,
+                'pace_min_per_km': round(seconds / 60 / (target / 1000), 2),
+                'avg_hr_bpm': avg_hr,
+            } for seconds, run, avg_hr in ranked]
+    return records
+
+def format_duration(seconds):
+    """h:mm:ss or m:ss"""
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
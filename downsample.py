@@ -0,0 +1,84 @@
+"""Server-side reduction of per-run data to a bounded number of chart points.
+
+Time series go through LTTB (largest-triangle-three-buckets), which keeps
+the points that shape the line - peaks and dips included - rather than
+every n-th one. Distributions and calendars are pre-binned into a grid
+whose size is capped however long the history is.
+"""
+from datetime import timedelta
+
+def lttb(x, y, threshold):
+    """Indices of at most threshold points of the (x, y) series, chosen by LTTB.
+
+    x must be increasing. The first and last points are always kept.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket, the third corner of the triangle
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(x[avg_start:avg_end]) / (avg_end - avg_start)
+        avg_y = sum(y[avg_start:avg_end]) / (avg_end - avg_start)
+        ax = x[a]
+        ay = y[a]
+        best_area = -1.0
+        best = start = int(i * every) + 1
+        for j in range(start, int((i + 1) * every) + 1):
+            area = abs((ax - avg_x) * (y[j] - ay) - (ax - x[j]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+def histogram(values, bin_width, max_bins):
+    """Counts of values per bin, bins widened (doubled) until there are at most max_bins.
+
+    Returns {'x': bin centers, 'width': bin width, 'counts': [...]}.
+    """
+    if not values:
+        return {'x': [], 'width': bin_width, 'counts': []}
+    low = min(values)
+    high = max(values)
+    # Bins are aligned to multiples of the width, so count them that way
+    while int(high // bin_width) - int(low // bin_width) + 1 > max_bins:
+        bin_width *= 2
+    first = int(low // bin_width)
+    counts = [0] * (int(high // bin_width) - first + 1)
+    for value in values:
+        counts[int(value // bin_width) - first] += 1
+    centers = [round((first + i + 0.5) * bin_width, 3) for i in range(len(counts))]
+    return {'x': centers, 'width': bin_width, 'counts': counts}
+
+def calendar_grid(first, values, max_columns):
+    """A weekday x week grid of daily values starting at date first.
+
+    Columns are Monday-starting weeks; when there are more than max_columns,
+    consecutive weeks share a column and its cells hold the mean of their
+    days. Returns {'x': column start dates, 'z': 7 rows (Monday first),
+    'weeks_per_column': n}; cells with no days in range are None.
+    """
+    offset = first.weekday()
+    weeks = (len(values) + offset + 6) // 7
+    group = max(1, -(-weeks // max_columns))
+    columns = -(-weeks // group)
+    sums = [[0.0] * columns for _ in range(7)]
+    days = [[0] * columns for _ in range(7)]
+    for i, value in enumerate(values):
+        slot = i + offset
+        column = slot // 7 // group
+        sums[slot % 7][column] += value
+        days[slot % 7][column] += 1
+    monday = first - timedelta(days=offset)
+    return {
+        'x': [(monday + timedelta(weeks=column * group)).isoformat() for column in range(columns)],
+        'z': [[round(s / d, 2) if d else None for s, d in zip(sums[row], days[row])] for row in range(7)],
+        'weeks_per_column': group,
+    }
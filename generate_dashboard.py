@@ -1,291 +1,224 @@
+import html
 import json
 import os
-from datetime import datetime
+from datetime import date, datetime
+from string import Template
+import metrics
+from best_efforts import format_duration
+from downsample import calendar_grid, histogram, lttb
+
+DATA_FILE = 'running_data.json'
+OUTPUT_FILE = 'dashboard.html'
+TEMPLATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dashboard_template.html')
+
+# Full-resolution per-run data, written next to the dashboard and loaded
+# by it only when the pace scatter is zoomed in
+RUNS_DATA_FILE = 'dashboard_runs.js'
+
+# Caps on what the per-run charts embed, however long the history
+MAX_SCATTER_POINTS = int(os.getenv('DASHBOARD_MAX_POINTS', '1500'))
+HISTOGRAM_BIN_KM = 0.5
+MAX_HISTOGRAM_BINS = 80
+MAX_HEATMAP_COLUMNS = 106
+
+_template = None
+
+def load_template():
+    """Read and compile the static HTML template once per process"""
+    global _template
+    if _template is None:
+        with open(TEMPLATE_FILE, 'r', encoding='utf-8') as f:
+            _template = Template(f.read())
+    return _template
+
+def build_treemap(months, distance, count):
+    """Year -> month treemap arrays, newest year first, shared by both treemaps"""
+    years = {}
+    for i, month in enumerate(months):
+        years.setdefault(month[:4], []).append(i)
+
+    labels = ['Allt']
+    parents = ['']
+    distance_values = [0]
+    count_values = [0]
+    colors = []
+    for year in sorted(years, reverse=True):
+        indices = years[year]
+        labels.append(year)
+        parents.append('Allt')
+        distance_values.append(round(sum(distance[i] for i in indices), 2))
+        count_values.append(sum(count[i] for i in indices))
+        colors.append('#FC4C02')
+        for i in indices:
+            labels.append(months[i])
+            parents.append(year)
+            distance_values.append(distance[i])
+            count_values.append(count[i])
+            colors.append('#FFA726')
+    return {
+        'labels': labels,
+        'parents': parents,
+        'distance': distance_values,
+        'count': count_values,
+        'colors': colors,
+    }
+
+def build_chart_data(monthly_data):
+    """Precompute the sorted months and parallel value arrays the charts plot"""
+    months = sorted(monthly_data.get('count', {}).keys())
+    count = [monthly_data['count'][m] for m in months]
+    distance = [monthly_data.get('distance_km', {}).get(m, 0) for m in months]
+    pace = [monthly_data.get('pace_min_per_km', {}).get(m) for m in months]
+    hr = [monthly_data.get('avg_hr_bpm', {}).get(m) for m in months]
+    return {
+        'months': months,
+        'distance': distance,
+        'count': count,
+        'pace': pace,
+        'hr': hr,
+        'has_hr': any(v is not None for v in hr),
+        'treemap': build_treemap(months, distance, count),
+    }
+
+def build_training_chart_data(training):
+    """Daily rolling series (plotted from start at one-day steps) and weekly volume bars"""
+    if not training:
+        return None
+    weeks = list(training['weekly_km'])
+    return {
+        'start': training['start'],
+        'distance_7d': training['distance_7d_km'],
+        'distance_28d': training['distance_28d_km'],
+        'distance_42d': training['distance_42d_km'],
+        'atl': training['atl'],
+        'ctl': training['ctl'],
+        'tsb': training['tsb'],
+        'weeks': weeks,
+        'weekly': [training['weekly_km'][week] for week in weeks],
+    }
+
+def _epoch_seconds(value):
+    """'YYYY-MM-DD HH:MM:SS' as seconds, for LTTB's x axis"""
+    day = date(int(value[:4]), int(value[5:7]), int(value[8:10])).toordinal()
+    return day * 86400 + int(value[11:13]) * 3600 + int(value[14:16]) * 60 + int(value[17:19])
+
+def build_run_chart_data(runs, max_points=MAX_SCATTER_POINTS):
+    """Pace scatter (LTTB-downsampled to max_points) and distance histogram of every run"""
+    if not runs or not runs['date']:
+        return None
+    dates = runs['date']
+    pace = runs['pace_min_per_km']
+    distance = runs['distance_km']
+    indices = lttb([_epoch_seconds(d) for d in dates], pace, max_points)
+    return {
+        'date': [dates[i] for i in indices],
+        'pace': [pace[i] for i in indices],
+        'distance': [distance[i] for i in indices],
+        'total': len(dates),
+        'full_src': RUNS_DATA_FILE if len(indices) < len(dates) else None,
+        'histogram': histogram(distance, HISTOGRAM_BIN_KM, MAX_HISTOGRAM_BINS),
+    }
+
+def build_heatmap(training, max_columns=MAX_HEATMAP_COLUMNS):
+    """Weekday x week grid of daily distance for the calendar heatmap"""
+    if not training:
+        return None
+    return calendar_grid(date.fromisoformat(training['start']), training['distance_km'], max_columns)
+
+def training_summary(training):
+    """Template values for the training-load cards, dashes when there is no training data"""
+    if not training:
+        return {key: '–' for key in ('load_7d_km', 'load_28d_km', 'atl', 'ctl', 'tsb', 'streak_current', 'streak_longest')}
+    current = training['current']
+    return {
+        'load_7d_km': f"{current['distance_7d_km']:,.1f}",
+        'load_28d_km': f"{current['distance_28d_km']:,.1f}",
+        'atl': f"{current['atl']:.1f}",
+        'ctl': f"{current['ctl']:.1f}",
+        'tsb': f"{current['tsb']:+.1f}",
+        'streak_current': f"{training['streaks']['current_days']}",
+        'streak_longest': f"{training['streaks']['longest_days']}",
+    }
+
+def best_efforts_table(best_efforts):
+    """HTML rows of the personal-record table, fastest first within each distance"""
+    if not best_efforts:
+        return '<p>Engir bestu tímar enn - þeir reiknast úr hlaupagögnum (streams).</p>'
+    rows = []
+    for label, efforts in best_efforts.items():
+        for rank, effort in enumerate(efforts, 1):
+            hr = f"{effort['avg_hr_bpm']:.0f}" if effort.get('avg_hr_bpm') else '–'
+            name = html.escape(effort.get('name') or 'Hlaup')
+            rows.append(
+                f"<tr><td>{html.escape(label) if rank == 1 else ''}</td><td>{rank}</td>"
+                f"<td>{format_duration(effort['seconds'])}</td><td>{effort['pace_min_per_km']:.2f}</td>"
+                f"<td>{hr}</td><td>{effort['date']}</td>"
+                f"<td><a href=\"https://www.strava.com/activities/{int(effort['id'])}\">{name}</a></td></tr>"
+            )
+    return ('<table class="records"><thead><tr><th>Vegalengd</th><th>#</th><th>Tími</th><th>Hraði (mín/km)</th>'
+            '<th>Púls</th><th>Dagsetning</th><th>Hlaup</th></tr></thead><tbody>'
+            + ''.join(rows) + '</tbody></table>')
+
+def runs_data_script(runs):
+    """The full-resolution runs as the script full_src points the scatter at"""
+    full = {'date': runs['date'], 'pace': runs['pace_min_per_km'], 'distance': runs['distance_km']}
+    # A script rather than JSON, so it also loads from file:// where fetch() can't
+    return f"window.dashboardRuns = {json.dumps(full, separators=(',', ':'))};\n"
+
+def render_dashboard(data, max_points=MAX_SCATTER_POINTS, max_heatmap_columns=MAX_HEATMAP_COLUMNS, files=None):
+    """Render the dashboard HTML for running_data.json-shaped data.
+
+    files, if given, is a dict that gets the contents of the files the
+    HTML loads alongside it, by file name.
+    """
+    overall = data.get('overall', {})
+    chart_data = build_chart_data(data.get('monthly', {}))
+    chart_data['training'] = build_training_chart_data(data.get('training'))
+    chart_data['runs'] = build_run_chart_data(data.get('runs'), max_points)
+    chart_data['heatmap'] = build_heatmap(data.get('training'), max_heatmap_columns)
+    if files is not None and chart_data['runs'] and chart_data['runs']['full_src']:
+        files[chart_data['runs']['full_src']] = runs_data_script(data['runs'])
+    return load_template().substitute(
+        **training_summary(data.get('training')),
+        best_efforts_table=best_efforts_table(data.get('best_efforts')),
+        total_runs=f"{overall.get('total_runs', 0):,.0f}",
+        total_distance_km=f"{overall.get('total_distance_km', 0):,.1f}",
+        total_time_hours=f"{overall.get('total_time_hours', 0):,.1f}",
+        avg_distance_per_run=f"{overall.get('avg_distance_per_run', 0):.1f}",
+        avg_pace_min_per_km=f"{overall.get('avg_pace_min_per_km', 0):.2f}",
+        total_elevation_m=f"{overall.get('total_elevation_m', 0):,.0f}",
+        updated=datetime.now().strftime("%Y-%m-%d %H:%M"),
+        # Compact JSON; '</' is escaped so the payload can't close the script tag
+        chart_data=json.dumps(chart_data, separators=(',', ':')).replace('</', '<\\/'),
+    )
+
+def write_dashboard(html, path=OUTPUT_FILE, files=None):
+    """Write the dashboard, and the files render_dashboard said it loads next to it"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(html)
+    metrics.gauge('dashboard_bytes', len(html.encode('utf-8')))
+    for name, content in (files or {}).items():
+        with open(os.path.join(os.path.dirname(path), name), 'w', encoding='utf-8') as f:
+            f.write(content)
 
 def generate_dashboard():
+    metrics.start('generate_dashboard')
     # Read the JSON data file
     try:
-        with open('running_data.json', 'r') as f:
+        with metrics.phase('load_data'), open(DATA_FILE, 'r') as f:
             data = json.load(f)
     except FileNotFoundError:
         print("Error: running_data.json not found. Run running_analysis.py first.")
         return
-    
-    monthly_data = data.get('monthly', {})
-    overall = data.get('overall', {})
-    
-    # Prepare data for charts
-    months_list = sorted(monthly_data.get('count', {}).keys())
-    
-    # Generate HTML dashboard
-    html = f'''<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="utf-8">
-    <title>Hlaupa Mælaborð - Running Dashboard</title>
-    <script src="https://cdn.plot.ly/plotly-2.27.0.min.js"></script>
-    <style>
-        body {{
-            font-family: Arial, sans-serif;
-            margin: 20px;
-            background-color: #f5f5f5;
-        }}
-        h1 {{
-            color: #FC4C02;
-            text-align: center;
-        }}
-        .summary {{
-            background-color: white;
-            padding: 20px;
-            border-radius: 8px;
-            margin-bottom: 20px;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }}
-        .summary-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-            gap: 15px;
-        }}
-        .summary-item {{
-            padding: 15px;
-            background-color: #f9f9f9;
-            border-radius: 5px;
-            border-left: 4px solid #FC4C02;
-        }}
-        .summary-item h3 {{
-            margin: 0 0 5px 0;
-            font-size: 14px;
-            color: #666;
-        }}
-        .summary-item p {{
-            margin: 0;
-            font-size: 24px;
-            font-weight: bold;
-            color: #333;
-        }}
-        .chart {{
-            background-color: white;
-            padding: 20px;
-            border-radius: 8px;
-            margin-bottom: 20px;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }}
-        .updated {{
-            text-align: center;
-            color: #666;
-            font-size: 12px;
-            margin-top: 20px;
-        }}
-    </style>
-</head>
-<body>
-    <h1>🏃 Hlaupa Mælaborð</h1>
-    
-    <div class="summary">
-        <h2>Heildaryfirlit</h2>
-        <div class="summary-grid">
-            <div class="summary-item">
-                <h3>Heildar hlaup</h3>
-                <p>{overall.get('total_runs', 0):,.0f}</p>
-            </div>
-            <div class="summary-item">
-                <h3>Heildar kílómetrar</h3>
-                <p>{overall.get('total_distance_km', 0):,.1f} km</p>
-            </div>
-            <div class="summary-item">
-                <h3>Heildar tími</h3>
-                <p>{overall.get('total_time_hours', 0):,.1f} klst</p>
-            </div>
-            <div class="summary-item">
-                <h3>Meðal km á hlaup</h3>
-                <p>{overall.get('avg_distance_per_run', 0):.1f} km</p>
-            </div>
-            <div class="summary-item">
-                <h3>Meðal hraði</h3>
-                <p>{overall.get('avg_pace_min_per_km', 0):.2f} mín/km</p>
-            </div>
-            <div class="summary-item">
-                <h3>Heildar hækkun</h3>
-                <p>{overall.get('total_elevation_m', 0):,.0f} m</p>
-            </div>
-        </div>
-    </div>
-    
-    <div class="chart" id="distance-chart"></div>
-    <div class="chart" id="count-chart"></div>
-    <div class="chart" id="pace-chart"></div>
-    <div class="chart" id="hr-chart"></div>
-    <div class="chart" id="treemap-distance"></div>
-    <div class="chart" id="treemap-count"></div>
-    
-    <div class="updated">Uppfært: {datetime.now().strftime("%Y-%m-%d %H:%M")}</div>
-    
-    <script>
-        const monthlyData = {json.dumps(monthly_data)};
-        
-        // Parse dates and prepare data
-        const months = Object.keys(monthlyData.count || {{}}).sort();
-        const distances = months.map(m => monthlyData.distance_km[m] || 0);
-        const counts = months.map(m => monthlyData.count[m] || 0);
-        const paces = months.map(m => monthlyData.pace_min_per_km[m] || null);
-        const hrs = months.map(m => monthlyData.avg_hr_bpm[m] || null);
-        
-        // Distance over time
-        Plotly.newPlot('distance-chart', [{{
-            x: months,
-            y: distances,
-            type: 'scatter',
-            mode: 'lines+markers',
-            name: 'Mánaðarleg vegalengd',
-            line: {{color: '#FC4C02', width: 3}},
-            marker: {{size: 6}}
-        }}], {{
-            title: 'Mánaðarleg hlaupavegalengd (km)',
-            xaxis: {{title: 'Mánuður'}},
-            yaxis: {{title: 'Kílómetrar'}},
-            hovermode: 'closest'
-        }}, {{responsive: true}});
-        
-        // Run count over time
-        Plotly.newPlot('count-chart', [{{
-            x: months,
-            y: counts,
-            type: 'bar',
-            name: 'Fjöldi hlaupa',
-            marker: {{color: '#FC4C02'}}
-        }}], {{
-            title: 'Fjöldi hlaupa á mánuði',
-            xaxis: {{title: 'Mánuður'}},
-            yaxis: {{title: 'Fjöldi hlaupa'}},
-            hovermode: 'closest'
-        }}, {{responsive: true}});
-        
-        // Average pace over time
-        Plotly.newPlot('pace-chart', [{{
-            x: months,
-            y: paces,
-            type: 'scatter',
-            mode: 'lines+markers',
-            name: 'Meðal hraði',
-            line: {{color: '#1E88E5', width: 2}},
-            marker: {{size: 5}}
-        }}], {{
-            title: 'Meðal hlaupahraði (mín/km)',
-            xaxis: {{title: 'Mánuður'}},
-            yaxis: {{title: 'Mínútur á kílómetra', autorange: 'reversed'}},
-            hovermode: 'closest'
-        }}, {{responsive: true}});
-        
-        // Heart rate over time (if available)
-        if (hrs.some(hr => hr !== null)) {{
-            Plotly.newPlot('hr-chart', [{{
-                x: months,
-                y: hrs,
-                type: 'scatter',
-                mode: 'lines+markers',
-                name: 'Meðal hjartsláttur',
-                line: {{color: '#D32F2F', width: 2}},
-                marker: {{size: 5}}
-            }}], {{
-                title: 'Meðal hjartsláttur (slög/mín)',
-                xaxis: {{title: 'Mánuður'}},
-                yaxis: {{title: 'Hjartsláttur (bpm)'}},
-                hovermode: 'closest'
-            }}, {{responsive: true}});
-        }} else {{
-            document.getElementById('hr-chart').innerHTML = '<p style="text-align:center;color:#999;">Hjartsláttagögn ekki tiltæk</p>';
-        }}
-        
-        // Treemap for distance by year and month
-        const treemapDistanceData = [];
-        const yearMonthMap = {{}};
-        
-        months.forEach(monthKey => {{
-            const [year, month] = monthKey.split('-');
-            if (!yearMonthMap[year]) {{
-                yearMonthMap[year] = [];
-            }}
-            yearMonthMap[year].push({{
-                month: monthKey,
-                distance: monthlyData.distance_km[monthKey] || 0,
-                count: monthlyData.count[monthKey] || 0
-            }});
-        }});
-        
-        const labels = ['Allt'];
-        const parents = [''];
-        const values = [0];
-        const colors = [];
-        
-        Object.keys(yearMonthMap).sort().reverse().forEach(year => {{
-            labels.push(year);
-            parents.push('Allt');
-            let yearTotal = 0;
-            yearMonthMap[year].forEach(m => yearTotal += m.distance);
-            values.push(yearTotal);
-            colors.push('#FC4C02');
-            
-            yearMonthMap[year].forEach(m => {{
-                labels.push(m.month);
-                parents.push(year);
-                values.push(m.distance);
-                colors.push('#FFA726');
-            }});
-        }});
-        
-        Plotly.newPlot('treemap-distance', [{{
-            type: 'treemap',
-            labels: labels,
-            parents: parents,
-            values: values,
-            textinfo: 'label+value+percent parent',
-            marker: {{colors: colors}},
-            hovertemplate: '<b>%{{label}}</b><br>%{{value:.1f}} km<br>%{{percentParent}}<extra></extra>'
-        }}], {{
-            title: 'Vegalengd eftir ári og mánuði (km)',
-            margin: {{t: 50, l: 0, r: 0, b: 0}}
-        }}, {{responsive: true}});
-        
-        // Treemap for run count
-        const labelsCount = ['Allt'];
-        const parentsCount = [''];
-        const valuesCount = [0];
-        
-        Object.keys(yearMonthMap).sort().reverse().forEach(year => {{
-            labelsCount.push(year);
-            parentsCount.push('Allt');
-            let yearTotal = 0;
-            yearMonthMap[year].forEach(m => yearTotal += m.count);
-            valuesCount.push(yearTotal);
-            
-            yearMonthMap[year].forEach(m => {{
-                labelsCount.push(m.month);
-                parentsCount.push(year);
-                valuesCount.push(m.count);
-            }});
-        }});
-        
-        Plotly.newPlot('treemap-count', [{{
-            type: 'treemap',
-            labels: labelsCount,
-            parents: parentsCount,
-            values: valuesCount,
-            textinfo: 'label+value+percent parent',
-            marker: {{colors: ['#1E88E5', '#42A5F5', '#90CAF9']}},
-            hovertemplate: '<b>%{{label}}</b><br>%{{value}} hlaup<br>%{{percentParent}}<extra></extra>'
-        }}], {{
-            title: 'Fjöldi hlaupa eftir ári og mánuði',
-            margin: {{t: 50, l: 0, r: 0, b: 0}}
-        }}, {{responsive: true}});
-    </script>
-</body>
-</html>
-'''
-    
+
+    files = {}
+    with metrics.phase('render'):
+        html = render_dashboard(data, files=files)
+
     # Write HTML file
-    with open('dashboard.html', 'w', encoding='utf-8') as f:
-        f.write(html)
-    
+    with metrics.phase('write'):
+        write_dashboard(html, files=files)
+
     print("✓ Dashboard generated: dashboard.html")
     print("  Open this file in your browser to view the dashboard.")
 
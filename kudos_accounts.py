@@ -0,0 +1,177 @@
+"""Multi-account kudos runner driven by a JSON config file.
+
+Each club feed is fetched once, with the token of the first account that
+watches it, and fanned out to every account watching that club. Kudos are
+then posted for all accounts concurrently, each with its own ledger, dedup
+index and rate budget (Strava budgets are per application, so accounts
+sharing a client ID share a budget).
+
+Config format (see accounts.example.json); any credential may be given
+literally or as the name of an environment variable via a `_env` suffix:
+
+    {"accounts": [{"name": "alice", "client_id_env": "ALICE_CLIENT_ID",
+                   "client_secret_env": "ALICE_CLIENT_SECRET",
+                   "refresh_token_env": "ALICE_REFRESH_TOKEN",
+                   "clubs": ["728834", "1153900"]}]}
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import metrics
+import strava_api
+from strava_api import STATE_DIR
+from kudos_bot import FETCH_WORKERS, dedup_key, fetch_club_feed, give_kudos_to_activities, print_summary
+from response_cache import ResponseCache
+from kudos_state import DedupIndex, KudosLedger, load_watermarks, save_watermarks, advance_watermark
+
+ACCOUNTS_STATE_DIR = os.path.join(STATE_DIR, 'accounts')
+
+class Account:
+    """One athlete: credentials, watched clubs and per-account kudos state"""
+
+    def __init__(self, name, client_id, client_secret, refresh_token, club_ids):
+        self.name = name
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_token = refresh_token
+        self.club_ids = list(club_ids)
+        self.limiter = strava_api.get_rate_limiter(client_id)
+        self.access_token = None
+
+    @property
+    def state_dir(self):
+        return os.path.join(ACCOUNTS_STATE_DIR, self.name)
+
+    def authenticate(self):
+        self.access_token = strava_api.get_access_token(self.client_id, self.client_secret, self.refresh_token)
+        return self.access_token
+
+def _config_value(entry, field):
+    if field in entry:
+        return entry[field]
+    env_name = entry.get(f'{field}_env')
+    value = os.getenv(env_name) if env_name else None
+    if not value:
+        raise ValueError(f"Account {entry.get('name')!r}: set {field!r} or {field + '_env'!r}")
+    return value
+
+def load_accounts(path):
+    """Parse the accounts config file into Account objects"""
+    with open(path, 'r') as f:
+        config = json.load(f)
+    accounts = []
+    for entry in config['accounts']:
+        accounts.append(Account(
+            name=entry['name'],
+            client_id=str(_config_value(entry, 'client_id')),
+            client_secret=_config_value(entry, 'client_secret'),
+            refresh_token=_config_value(entry, 'refresh_token'),
+            club_ids=[str(club_id) for club_id in entry['clubs']],
+        ))
+    if len({account.name for account in accounts}) != len(accounts):
+        raise ValueError("Account names must be unique")
+    return accounts
+
+def _run_account(account, feeds, dry_run=False):
+    """Dedup the account's fanned-out activities and give kudos, in the account's own thread"""
+    prefix = f"[{account.name}] "
+    os.makedirs(account.state_dir, exist_ok=True)
+    with DedupIndex(os.path.join(account.state_dir, 'seen_activities.db')) as seen, \
+            KudosLedger(os.path.join(account.state_dir, 'kudos_ledger.db')) as ledger:
+        activities = [
+            activity
+            for club_id in account.club_ids if club_id in feeds
+            for activity in feeds[club_id].activities
+            if seen.add(dedup_key(activity))
+        ]
+        summary = give_kudos_to_activities(account.access_token, activities, ledger, account.limiter, prefix, dry_run)
+        if summary['stop_status'] is None and not dry_run:
+            # Incomplete feeds are fetched again next run; let their activities through then
+            seen.discard(
+                dedup_key(activity)
+                for club_id in account.club_ids if club_id in feeds and not feeds[club_id].complete
+                for activity in feeds[club_id].activities
+            )
+            seen.discard(dedup_key(activity) for activity in summary['retry'])
+            seen.commit()
+    return summary, len(activities)
+
+def _try_authenticate(account):
+    try:
+        account.authenticate()
+        print(f"✓ [{account.name}] Access token obtained")
+        return True
+    except Exception as e:
+        print(f"✗ [{account.name}] Error getting access token: {e}")
+        return False
+
+def run_accounts(accounts, max_workers=FETCH_WORKERS, rules=None, dry_run=False):
+    """One kudos run for every account; rules (KudosRules) apply to all of them"""
+    metrics.start('kudos_accounts')
+    print(f"Starting Strava Kudos Bot for {len(accounts)} accounts at {datetime.now()}" + (" (dry run)" if dry_run else ""))
+
+    # Tokens first; accounts that can't authenticate sit this run out
+    with metrics.phase('token'), ThreadPoolExecutor(max_workers=max(1, len(accounts))) as pool:
+        results = list(pool.map(_try_authenticate, accounts))
+    unauthenticated = [account for account, ok in zip(accounts, results) if not ok]
+    accounts = [account for account, ok in zip(accounts, results) if ok]
+    if not accounts:
+        return
+
+    # Every watched club is fetched once, by the first account watching it
+    fetchers = {}
+    for account in accounts:
+        for club_id in account.club_ids:
+            fetchers.setdefault(club_id, account)
+    print(f"Monitoring {len(fetchers)} unique clubs...\n")
+
+    watermarks = load_watermarks()
+    if rules is not None:
+        rules.begin_run()
+
+    def fetch(club_id):
+        account = fetchers[club_id]
+        return fetch_club_feed(account.access_token, club_id, watermarks.get(club_id), limiter=account.limiter,
+                               cache=cache, rules=rules)
+
+    workers = max(1, min(max_workers, len(fetchers)))
+    with metrics.phase('fetch_clubs'), ResponseCache() as cache, ThreadPoolExecutor(max_workers=workers) as pool:
+        feeds = {feed.club_id: feed for feed in pool.map(fetch, list(fetchers))}
+    for feed in feeds.values():
+        if feed.complete:
+            print(f"✓ Club {feed.club_id}: Found {feed.fetched} new activities")
+        else:
+            print(f"⚠ Club {feed.club_id}: Feed incomplete after {feed.fetched} activities, watermark kept")
+    print(f"Club feeds: {cache.summary()}")
+    if rules is not None:
+        print(f"Kudos rules: {rules.summary()}")
+
+    # Fan out and post kudos for all accounts concurrently
+    with metrics.phase('kudos'), ThreadPoolExecutor(max_workers=len(accounts)) as pool:
+        outcomes = list(pool.map(lambda account: _run_account(account, feeds, dry_run), accounts))
+
+    for account, (summary, total) in zip(accounts, outcomes):
+        print_summary(summary, total, title=f"Summary: {account.name}")
+    if dry_run:
+        return
+
+    # A club's watermark only advances once every account watching it
+    # finished and none of its activities is waiting for a retried post
+    unfinished = unauthenticated + [
+        account for account, (summary, _) in zip(accounts, outcomes) if summary['stop_status'] is not None
+    ]
+    stopped_clubs = {club_id for account in unfinished for club_id in account.club_ids}
+    for account, (summary, _) in zip(accounts, outcomes):
+        retry_ids = {activity['id'] for activity in summary['retry']}
+        stopped_clubs.update(
+            club_id for club_id in account.club_ids
+            if club_id in feeds and any(activity.get('id') in retry_ids for activity in feeds[club_id].activities)
+        )
+    for club_id, feed in feeds.items():
+        if feed.fetched and feed.complete and club_id not in stopped_clubs:
+            watermarks[club_id] = advance_watermark(watermarks.get(club_id), feed.head_keys)
+    save_watermarks(watermarks)
+
+def run_accounts_file(path, rules=None, dry_run=False):
+    run_accounts(load_accounts(path), rules=rules, dry_run=dry_run)
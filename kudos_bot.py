@@ -1,6 +1,19 @@
 import os
-import requests
+import argparse
+import signal
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
+import requests
+import activity_record
+import metrics
+import strava_api
+from strava_api import API_URL, PRIORITY_KUDOS, RateLimitExceeded, strava_request
+from response_cache import ResponseCache
+from kudos_rules import KUDOS_RULES_FILE, load_rules
+from kudos_state import WATERMARK_SIZE, DedupIndex, KudosLedger, load_watermarks, save_watermarks, advance_watermark
 
 # Strava API credentials
 CLIENT_ID = os.getenv('STRAVA_CLIENT_ID')
@@ -14,109 +27,422 @@ CLUB_IDS = [
     '1252837',  # Hlaupahópur Deloitte
 ]
 
+# Number of club feeds fetched in parallel
+FETCH_WORKERS = int(os.getenv('STRAVA_FETCH_WORKERS', '8'))
+
+# Number of kudos POSTs kept in flight at once
+KUDOS_WORKERS = int(os.getenv('STRAVA_KUDOS_WORKERS', '8'))
+
+# Kudos responses: given, already given, and the ones that stop the run
+# (expired/revoked token, rate limited)
+KUDOS_GIVEN = (200, 201)
+KUDOS_ALREADY_GIVEN = 409
+KUDOS_STOP = (401, 429)
+
+def kudos_retryable(status):
+    """True if a failed post is worth retrying next run: a connection error, 5xx or a stop status"""
+    return status is None or status >= 500 or status in KUDOS_STOP
+
+# Poll interval bounds for --daemon, in seconds: the interval halves after
+# a poll that found new activities and grows by half after a quiet one
+POLL_MIN_INTERVAL = int(os.getenv('STRAVA_POLL_MIN_INTERVAL', '120'))
+POLL_MAX_INTERVAL = int(os.getenv('STRAVA_POLL_MAX_INTERVAL', '1800'))
+
+# Club feed paging: page size and a cap on pages per club per run
+CLUB_PAGE_SIZE = 200
+MAX_CLUB_PAGES = int(os.getenv('STRAVA_MAX_CLUB_PAGES', '10'))
+
 def get_access_token():
-    url = 'https://www.strava.com/oauth/token'
-    payload = {
-        'client_id': CLIENT_ID,
-        'client_secret': CLIENT_SECRET,
-        'refresh_token': REFRESH_TOKEN,
-        'grant_type': 'refresh_token'
-    }
-    response = requests.post(url, data=payload)
-    return response.json()['access_token']
+    return strava_api.get_access_token(CLIENT_ID, CLIENT_SECRET, REFRESH_TOKEN)
 
-def give_kudos(access_token, activity_id):
-    url = f'https://www.strava.com/api/v3/activities/{activity_id}/kudos'
+def forget_access_token():
+    strava_api.forget_access_token(CLIENT_ID, REFRESH_TOKEN)
+
+def post_kudos(access_token, activity_id, limiter=None):
+    """POST kudos and return the HTTP status; 429 if out of rate budget, None on connection errors"""
+    url = f'{API_URL}/activities/{activity_id}/kudos'
     headers = {'Authorization': f'Bearer {access_token}'}
-    response = requests.post(url, headers=headers)
+    try:
+        # 5xx responses are retried, but a 429 should stop the batch, not stall it
+        response = strava_request('POST', url, priority=PRIORITY_KUDOS, limiter=limiter, retry_429=False,
+                                  headers=headers)
+    except RateLimitExceeded:
+        return 429
+    except requests.RequestException as e:
+        print(f"Error giving kudos to {activity_id}: {e}")
+        return None
+    return response.status_code
+
+def give_kudos(access_token, activity_id):
     # Returns True if kudos given successfully or already given (409)
-    return response.status_code in [200, 201]
+    status = post_kudos(access_token, activity_id)
+    return status in KUDOS_GIVEN or status == KUDOS_ALREADY_GIVEN
+
+def dispatch_kudos(access_token, activities, max_in_flight=KUDOS_WORKERS, limiter=None):
+    """Post kudos with up to max_in_flight requests outstanding.
+
+    Yields (activity, status) as posts complete. After the first 401 or 429
+    no new posts are started; activities never sent are not yielded.
+    """
+    activities = iter(activities)
+    in_flight = {}
+    stopped = False
+    with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as pool:
+        while True:
+            while not stopped and len(in_flight) < max_in_flight:
+                activity = next(activities, None)
+                if activity is None:
+                    break
+                in_flight[pool.submit(post_kudos, access_token, activity['id'], limiter)] = activity
+            if not in_flight:
+                return
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                status = future.result()
+                if status in KUDOS_STOP:
+                    stopped = True
+                yield in_flight.pop(future), status
+
+def activity_key(activity):
+    """Composite key for a club activity, since club feeds may not include an 'id'"""
+    athlete = activity.get('athlete', {})
+    return (
+        athlete.get('firstname', ''),
+        athlete.get('lastname', ''),
+        activity.get('name', ''),
+        activity.get('distance', 0),
+        activity.get('moving_time', 0)
+    )
 
-def get_club_activities(access_token, club_id, page=1):
-    url = f'https://www.strava.com/api/v3/clubs/{club_id}/activities'
+def dedup_key(activity):
+    """The activity id when the feed provides one, else the composite key"""
+    if 'id' in activity:
+        return ('id', activity['id'])
+    return activity_key(activity)
+
+class ClubFeedError(Exception):
+    """Raised when a page of a club feed could not be fetched"""
+
+def get_club_activities(access_token, club_id, page=1, per_page=CLUB_PAGE_SIZE, limiter=None, cache=None):
+    """One page of a club's feed; conditional and served from the ResponseCache `cache` if given.
+
+    Raises ClubFeedError if the page can't be fetched, so a failed page is
+    never mistaken for the end of the feed.
+    """
+    url = f'{API_URL}/clubs/{club_id}/activities'
     headers = {'Authorization': f'Bearer {access_token}'}
-    params = {'page': page, 'per_page': 200}
+    params = {'page': page, 'per_page': per_page}
     try:
-        response = requests.get(url, headers=headers, params=params)
-        if response.status_code == 200:
-            return response.json()
+        if cache is not None:
+            status, activities = cache.get(url, activity_record.loads, params=params, headers=headers, limiter=limiter)
+        else:
+            response = strava_request('GET', url, limiter=limiter, headers=headers, params=params)
+            status = response.status_code
+            activities = activity_record.loads(response.content) if status == 200 else None
     except Exception as e:
-        print(f"Error fetching club {club_id}: {e}")
-    return []
+        raise ClubFeedError(f"Error fetching club {club_id} page {page}: {e}") from e
+    if status != 200:
+        raise ClubFeedError(f"Error fetching club {club_id} page {page}: HTTP {status}")
+    return activities
+
+def iter_club_activities(access_token, club_id, watermark=None, per_page=CLUB_PAGE_SIZE, max_pages=MAX_CLUB_PAGES,
+                         limiter=None, cache=None):
+    """Yield club activities newest first, page by page, stopping at the watermark.
+
+    Without a watermark (a new club, or lost state) only the newest page is
+    read; the club's watermark is then seeded from it.
+    """
+    stop_keys = set(watermark or [])
+    for page in range(1, (max_pages if stop_keys else 1) + 1):
+        activities = get_club_activities(access_token, club_id, page=page, per_page=per_page, limiter=limiter, cache=cache)
+        for activity in activities:
+            if activity_key(activity) in stop_keys:
+                return
+            yield activity
+        if len(activities) < per_page:
+            return
+    if stop_keys:
+        print(f"⚠ Club {club_id}: stopped after {max_pages} pages without reaching the last-seen activities; "
+              f"older new activities are skipped (raise STRAVA_MAX_CLUB_PAGES)")
+
+# One club's fetch result: the new activities that survived deduplication,
+# the keys of the club's newest activities (its next watermark), the
+# number of activities fetched before deduplication and whether every page
+# up to the watermark was fetched - an incomplete feed keeps its watermark
+ClubFeed = namedtuple('ClubFeed', ['club_id', 'activities', 'head_keys', 'fetched', 'complete'])
+
+def fetch_club_feed(access_token, club_id, watermark=None, seen=None, limiter=None, cache=None, rules=None,
+                    ledger=None):
+    """Fetch a club's new activities, dropping those the KudosRules `rules` reject and
+    those already in the DedupIndex `seen`, if given.
+
+    A club quota in the rules is only taken by activities that would be
+    posted: not duplicates, and not already in the KudosLedger `ledger`.
+    """
+    started = time.perf_counter()
+    activities = []
+    head_keys = []
+    fetched = 0
+    complete = True
+    try:
+        for activity in iter_club_activities(access_token, club_id, watermark, limiter=limiter, cache=cache):
+            fetched += 1
+            if len(head_keys) < WATERMARK_SIZE:
+                head_keys.append(activity_key(activity))
+            if rules is not None and not rules.allows(activity):
+                continue
+            key = dedup_key(activity)
+            if seen is not None and not seen.add(key):
+                continue
+            postable = 'id' in activity and (ledger is None or activity['id'] not in ledger)
+            if rules is not None and postable and not rules.take_quota(club_id):
+                # Over quota this run, not handled: a retried feed may see it again
+                if seen is not None:
+                    seen.discard([key])
+                continue
+            activities.append(activity)
+    except ClubFeedError as e:
+        print(f"✗ {e}")
+        metrics.count('club_fetch_errors', club=club_id)
+        complete = False
+    metrics.observe('club_fetch_seconds', time.perf_counter() - started, club=club_id)
+    metrics.count('club_activities_fetched', fetched)
+    return ClubFeed(club_id, activities, head_keys, fetched, complete)
+
+def fetch_club_feeds(access_token, club_ids, watermarks=None, seen=None, max_workers=FETCH_WORKERS, cache=None,
+                     rules=None, ledger=None):
+    """Fetch new activities of each club concurrently, returning a ClubFeed per club in club_ids order.
+
+    If KudosRules are given, activities they reject are dropped as they
+    stream in, and if a DedupIndex is given so are activities already
+    seen - in another club or an earlier run.
+    """
+    if not club_ids:
+        return []
+    watermarks = watermarks or {}
+    workers = max(1, min(max_workers, len(club_ids)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(
+            lambda club_id: fetch_club_feed(access_token, club_id, watermarks.get(club_id), seen, cache=cache,
+                                            rules=rules, ledger=ledger),
+            club_ids
+        ))
+
+def give_kudos_to_activities(access_token, activities, ledger, limiter=None, prefix='', dry_run=False):
+    """Give kudos to every activity not yet in the ledger.
+
+    Returns a summary dict of counts, plus 'stop_status' - the 401/429 that
+    stopped posting early, or None if every activity was handled - and
+    'retry', the activities whose post failed in a way worth retrying on
+    the next run. With dry_run nothing is posted; the activities that would
+    be are listed and counted as 'dry_run'.
+    """
+    summary = {'given': 0, 'already': 0, 'skipped': 0, 'failed': 0, 'not_attempted': 0, 'dry_run': 0,
+               'stop_status': None, 'retry': []}
+    
+    # Give kudos to all activities - but we need actual activity IDs!
+    # The problem: club activities API doesn't return activity IDs
+    # Try giving kudos using the activity object directly
+    # If the API response actually contains an 'id', use it
+    to_post = []
+    for activity in activities:
+        if 'id' not in activity:
+            athlete_name = activity.get('athlete', {}).get('firstname', 'Unknown')
+            print(f"{prefix}⚠ No ID for {athlete_name}'s activity - cannot give kudos")
+            summary['failed'] += 1
+        elif activity['id'] in ledger:
+            summary['skipped'] += 1
+        else:
+            to_post.append(activity)
+    
+    if dry_run:
+        for activity in to_post:
+            athlete_name = activity.get('athlete', {}).get('firstname', 'Unknown')
+            print(f"{prefix}Would give kudos to {athlete_name} (ID: {activity['id']})")
+        summary['dry_run'] = len(to_post)
+        return summary
+    
+    posted = 0
+    for activity, status in dispatch_kudos(access_token, to_post, limiter=limiter):
+        posted += 1
+        athlete_name = activity.get('athlete', {}).get('firstname', 'Unknown')
+        activity_id = activity['id']
+        if status in KUDOS_GIVEN or status == KUDOS_ALREADY_GIVEN:
+            ledger.add(activity_id)
+            if status == KUDOS_ALREADY_GIVEN:
+                summary['already'] += 1
+            else:
+                summary['given'] += 1
+                print(f"{prefix}✓ Gave kudos to {athlete_name} (ID: {activity_id})")
+        else:
+            summary['failed'] += 1
+            if kudos_retryable(status):
+                summary['retry'].append(activity)
+            if status in KUDOS_STOP and summary['stop_status'] is None:
+                summary['stop_status'] = status
+                reason = "access token rejected" if status == 401 else "rate limited"
+                print(f"{prefix}✗ Kudos stopped: {reason} (HTTP {status})")
+    summary['not_attempted'] = len(to_post) - posted
+    for outcome in ('given', 'already', 'skipped', 'failed', 'not_attempted'):
+        metrics.count('kudos', summary[outcome], outcome=outcome)
+    return summary
+
+def print_summary(summary, total, title="Summary"):
+    print(f"\n=== {title} ===")
+    print(f"Kudos given: {summary['given']}")
+    print(f"Already given (409): {summary['already']}")
+    print(f"Skipped (in ledger): {summary['skipped']}")
+    if summary['dry_run']:
+        print(f"Would give kudos (dry run): {summary['dry_run']}")
+    print(f"Failed: {summary['failed']}")
+    if summary['not_attempted']:
+        print(f"Not attempted (stopped early): {summary['not_attempted']}")
+    print(f"Total processed: {total}")
+
+def poll_clubs(access_token, club_ids, watermarks, seen, ledger, cache=None, rules=None, dry_run=False):
+    """Fetch new club activities and give kudos once.
+
+    Watermarks and dedup entries are only kept if posting wasn't stopped
+    early (or a dry run), so the next poll sees the same activities again.
+    Returns the kudos summary and the number of unique new activities.
+    """
+    # Collect new activities from clubs (only those above each club's watermark),
+    # dropping duplicates across clubs and earlier runs as they stream in
+    new_watermarks = {}
+    unique_activities = []
+    sources = {}
+    total_fetched = 0
+    if rules is not None:
+        rules.begin_run()
+    with metrics.phase('fetch_clubs'):
+        feeds = fetch_club_feeds(access_token, club_ids, watermarks, seen, cache=cache, rules=rules, ledger=ledger)
+    for feed in feeds:
+        total_fetched += feed.fetched
+        unique_activities.extend(feed.activities)
+        sources.update((activity.get('id'), feed.club_id) for activity in feed.activities)
+        if not feed.complete:
+            # Pages past the failed one were never seen: keep the watermark and
+            # let the next poll see this club's activities again
+            seen.discard(dedup_key(activity) for activity in feed.activities)
+            print(f"⚠ Club {feed.club_id}: Feed incomplete after {feed.fetched} activities, watermark kept")
+        elif feed.fetched:
+            new_watermarks[feed.club_id] = advance_watermark(watermarks.get(feed.club_id), feed.head_keys)
+            print(f"✓ Club {feed.club_id}: Found {feed.fetched} new activities ({len(feed.activities)} unique)")
+        else:
+            print(f"X Club {feed.club_id}: No new activities")
+    
+    print(f"\nTotal activities fetched: {total_fetched}")
+    print(f"Unique activities: {len(unique_activities)}")
+    if cache is not None:
+        print(f"Club feeds: {cache.summary()}")
+    if rules is not None:
+        print(f"Kudos rules: {rules.summary()}")
+    
+    with metrics.phase('kudos'):
+        summary = give_kudos_to_activities(access_token, unique_activities, ledger, dry_run=dry_run)
+    
+    # Everything fetched this run has now been handled, unless we stopped
+    # early - then the next run must see the same activities again. Posts
+    # that failed stay unseen and keep their club's watermark, so they are
+    # retried too
+    if summary['stop_status'] is None and not dry_run:
+        seen.discard(dedup_key(activity) for activity in summary['retry'])
+        retry_clubs = {sources[activity['id']] for activity in summary['retry']}
+        watermarks.update((club_id, keys) for club_id, keys in new_watermarks.items() if club_id not in retry_clubs)
+        save_watermarks(watermarks)
+        seen.commit()
+    else:
+        seen.rollback()
+    return summary, len(unique_activities)
 
-def main():
-    print(f"Starting Strava Kudos Bot at {datetime.now()}")
+def main(rules=None, dry_run=False):
+    metrics.start('kudos_bot')
+    print(f"Starting Strava Kudos Bot at {datetime.now()}" + (" (dry run)" if dry_run else ""))
     print(f"Monitoring {len(CLUB_IDS)} clubs...\n")
     
     # Get access token
     try:
-        access_token = get_access_token()
+        with metrics.phase('token'):
+            access_token = get_access_token()
         print("✓ Access token obtained")
     except Exception as e:
         print(f"✗ Error getting access token: {e}")
         return
     
-    # Collect all activities from clubs
-    all_activities = []
-    for club_id in CLUB_IDS:
-        try:
-            activities = get_club_activities(access_token, club_id)
-            if activities:
-                all_activities.extend(activities)
-                print(f"✓ Club {club_id}: Found {len(activities)} activities")
-            else:
-                print(f"X Club {club_id}: No activities or error")
-        except Exception as e:
-            print(f"X Club {club_id}: Error {e}")
-    
-    print(f"\nTotal activities fetched: {len(all_activities)}")
-    
-    # Remove duplicates - use composite key since club activities may not have 'id'
-    seen = set()
-    unique_activities = []
-    for activity in all_activities:
-        # Create unique key from available fields
-        athlete = activity.get('athlete', {})
-        key = (
-            athlete.get('firstname', ''),
-            athlete.get('lastname', ''),
-            activity.get('name', ''),
-            activity.get('distance', 0),
-            activity.get('moving_time', 0)
-        )
-        if key not in seen:
-            seen.add(key)
-            unique_activities.append(activity)
+    with DedupIndex() as seen, KudosLedger() as ledger, ResponseCache() as cache:
+        summary, total = poll_clubs(access_token, CLUB_IDS, load_watermarks(), seen, ledger, cache, rules, dry_run)
+    print_summary(summary, total)
+
+def next_poll_interval(interval, new_activities):
+    """Poll busy feeds more often and quiet ones less"""
+    if new_activities:
+        return max(POLL_MIN_INTERVAL, interval / 2)
+    return min(POLL_MAX_INTERVAL, interval * 1.5)
+
+def run_daemon(rules=None, dry_run=False):
+    """Poll the club feeds until SIGTERM/SIGINT, keeping connections, token and state warm"""
+    stop = threading.Event()
     
-    print(f"Unique activities: {len(unique_activities)}")
+    def request_stop(signum, frame):
+        print(f"\nReceived signal {signum}, finishing the current poll and shutting down...")
+        stop.set()
     
-    # Give kudos to all activities - but we need actual activity IDs!
-    # The problem: club activities API doesn't return activity IDs
-    # Solution: Just try all activities without deduplication
-    kudos_given = 0
-    kudos_failed = 0
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    metrics.start('kudos_daemon')
     
-    # Try giving kudos using the activity object directly
-    # If the API response actually contains an 'id', use it
-    for activity in unique_activities:
-        athlete_name = activity.get('athlete', {}).get('firstname', 'Unknown')
-        
-        # Check if activity has an id field
-        if 'id' in activity:
-            activity_id = activity['id']
-            if give_kudos(access_token, activity_id):
-                kudos_given += 1
-                print(f"✓ Gave kudos to {athlete_name} (ID: {activity_id})")
-            else:
-                kudos_failed += 1
-        else:
-            print(f"⚠ No ID for {athlete_name}'s activity - cannot give kudos")
-            kudos_failed += 1
+    print(f"Starting Strava Kudos Bot daemon at {datetime.now()}" + (" (dry run)" if dry_run else ""))
+    print(f"Monitoring {len(CLUB_IDS)} clubs, polling every {POLL_MIN_INTERVAL}-{POLL_MAX_INTERVAL}s\n")
     
-    print(f"\n=== Summary ===")
-    print(f"Kudos given: {kudos_given}")
-    print(f"Failed: {kudos_failed}")
-    print(f"Total processed: {len(unique_activities)}")
+    interval = POLL_MIN_INTERVAL
+    watermarks = load_watermarks()
+    with DedupIndex() as seen, KudosLedger() as ledger, ResponseCache() as cache:
+        while not stop.is_set():
+            new_activities = 0
+            stop_status = None
+            try:
+                # Cached until shortly before it expires
+                access_token = get_access_token()
+                print(f"--- Poll at {datetime.now():%Y-%m-%d %H:%M:%S} ---")
+                # Retention is enforced every poll, not only at startup
+                seen.evict()
+                ledger.evict()
+                summary, new_activities = poll_clubs(access_token, CLUB_IDS, watermarks, seen, ledger, cache,
+                                                     rules, dry_run)
+                stop_status = summary['stop_status']
+                ledger.commit()
+                cache.save()
+            except Exception as e:
+                print(f"✗ Poll failed: {e}")
+                # Activities fetched by the failed poll must be seen again
+                seen.rollback()
+            interval = next_poll_interval(interval, new_activities)
+            if stop_status == 401:
+                forget_access_token()
+            elif stop_status == 429:
+                # Don't come back before the rate window resets
+                interval = max(interval, strava_api.rate_limiter.seconds_until_reset())
+            print(f"Next poll in {interval:.0f}s\n")
+            stop.wait(interval)
+    print("Daemon stopped")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Give kudos to activities in Strava club feeds")
+    parser.add_argument('--daemon', action='store_true', help="keep running and poll the club feeds on an adaptive interval")
+    parser.add_argument('--accounts', metavar='PATH', default=os.getenv('STRAVA_ACCOUNTS_FILE'),
+                        help="run for every account in a JSON config file (see accounts.example.json)")
+    parser.add_argument('--rules', metavar='PATH', default=KUDOS_RULES_FILE,
+                        help="only give kudos to activities matching the rules in a JSON file (see kudos_rules.example.json)")
+    parser.add_argument('--dry-run', action='store_true', help="list the activities that would get kudos without posting any")
+    args = parser.parse_args()
+    if args.accounts and args.daemon:
+        # Accounts runs are one pass each; a daemon would need per-account polling state
+        parser.error("--daemon can't be combined with --accounts (or STRAVA_ACCOUNTS_FILE)")
+    rules = load_rules(args.rules) if args.rules else None
+    if args.accounts:
+        from kudos_accounts import run_accounts_file
+        run_accounts_file(args.accounts, rules, args.dry_run)
+    elif args.daemon:
+        run_daemon(rules, args.dry_run)
+    else:
+        main(rules, args.dry_run)
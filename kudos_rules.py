@@ -0,0 +1,141 @@
+"""Kudos targeting rules, compiled once and checked as club activities stream in.
+
+Rules come from a JSON file (see kudos_rules.example.json); every field is
+optional and an empty file gives kudos to everything, as without rules:
+
+    {"types": ["Run", "TrailRun"],       only these activity types
+     "min_distance_km": 2,               at least this far ...
+     "min_moving_time_min": 10,          ... and this long
+     "allow_athletes": ["Anna J."],      only these athletes, as named in club feeds
+     "deny_athletes": ["Jón J."],        never these
+     "max_age_hours": 48,                skip older activities (only those with a start_date)
+     "club_quotas": {"1153900": 20},     at most this many per club per run ...
+     "default_club_quota": 50}           ... and for clubs not listed
+
+Each configured rule becomes one check, cheapest first, and an activity is
+dropped at the first one it fails, so it never reaches the kudos posts.
+Drops are counted per rule: each is one kudos request saved.
+"""
+import json
+import os
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+import metrics
+from run_aggregates import parse_start_date
+
+KUDOS_RULES_FILE = os.getenv('STRAVA_KUDOS_RULES_FILE')
+
+RULE_FIELDS = ('types', 'min_distance_km', 'min_moving_time_min', 'allow_athletes', 'deny_athletes',
+               'max_age_hours', 'club_quotas', 'default_club_quota')
+
+def athlete_name(activity):
+    """'Firstname L.' as club feeds show it, normalized for matching"""
+    athlete = activity.get('athlete') or {}
+    name = f"{athlete.get('firstname', '')} {athlete.get('lastname', '')}"
+    return ' '.join(name.split()).casefold()
+
+class KudosRules:
+    """A compiled rule set.
+
+    allows() and take_quota() are thread-safe for concurrent club fetches.
+    Quotas and the age cutoff are per run: call begin_run() before each poll.
+    """
+
+    def __init__(self, types=None, min_distance_km=None, min_moving_time_min=None, allow_athletes=None,
+                 deny_athletes=None, max_age_hours=None, club_quotas=None, default_club_quota=None):
+        self.max_age = timedelta(hours=max_age_hours) if max_age_hours is not None else None
+        self.club_quotas = {str(club_id): quota for club_id, quota in (club_quotas or {}).items()}
+        self.default_club_quota = default_club_quota
+        self.checks = self._compile(types, min_distance_km, min_moving_time_min, allow_athletes, deny_athletes)
+        self.lock = threading.Lock()
+        self.begin_run()
+
+    def _compile(self, types, min_distance_km, min_moving_time_min, allow_athletes, deny_athletes):
+        """(rule name, predicate) pairs for the configured rules, cheapest first"""
+        checks = []
+        if types:
+            type_set = frozenset(types)
+            checks.append(('type', lambda a: a.get('type') in type_set))
+        if min_distance_km:
+            min_distance = min_distance_km * 1000
+            checks.append(('min_distance', lambda a: (a.get('distance') or 0) >= min_distance))
+        if min_moving_time_min:
+            min_moving_time = min_moving_time_min * 60
+            checks.append(('min_moving_time', lambda a: (a.get('moving_time') or 0) >= min_moving_time))
+        if deny_athletes:
+            denied = frozenset(' '.join(name.split()).casefold() for name in deny_athletes)
+            checks.append(('deny_athletes', lambda a: athlete_name(a) not in denied))
+        if allow_athletes:
+            allowed = frozenset(' '.join(name.split()).casefold() for name in allow_athletes)
+            checks.append(('allow_athletes', lambda a: athlete_name(a) in allowed))
+        if self.max_age is not None:
+            # Club feeds usually carry no start_date; undated activities pass
+            checks.append(('max_age', lambda a: a.get('start_date') is None
+                           or parse_start_date(a['start_date']) >= self.cutoff))
+        return tuple(checks)
+
+    @classmethod
+    def from_config(cls, config):
+        unknown = set(config) - set(RULE_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown kudos rule(s): {', '.join(sorted(unknown))}")
+        return cls(**config)
+
+    def begin_run(self, now=None):
+        """Reset the per-club quotas and counters and move the age cutoff to now"""
+        now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+        with self.lock:
+            self.quota_used = Counter()
+            self.filtered = Counter()
+            self.passed = 0
+        self.cutoff = now - self.max_age if self.max_age is not None else None
+
+    def quota(self, club_id):
+        return self.club_quotas.get(str(club_id), self.default_club_quota)
+
+    def reject_reason(self, activity):
+        """Name of the first rule activity fails, ignoring quotas, or None"""
+        for name, check in self.checks:
+            if not check(activity):
+                return name
+        return None
+
+    def allows(self, activity):
+        """True if activity passes every rule; club quotas are taken separately by take_quota()"""
+        reason = self.reject_reason(activity)
+        with self.lock:
+            if reason is None:
+                self.passed += 1
+                return True
+            self.filtered[reason] += 1
+        metrics.count('kudos_filtered', rule=reason)
+        return False
+
+    def take_quota(self, club_id):
+        """Take a slot from club_id's quota for an allowed activity about to get kudos.
+
+        Returns False, counting the activity as filtered rather than passed,
+        once the quota is used up.
+        """
+        quota = self.quota(club_id)
+        with self.lock:
+            if quota is None or self.quota_used[club_id] < quota:
+                self.quota_used[club_id] += 1
+                return True
+            self.passed -= 1
+            self.filtered['club_quota'] += 1
+        metrics.count('kudos_filtered', rule='club_quota')
+        return False
+
+    def summary(self):
+        if not self.filtered:
+            return f"{self.passed} activities passed, none filtered"
+        rules = ', '.join(f"{name} {count}" for name, count in self.filtered.most_common())
+        return (f"{self.passed} activities passed, {sum(self.filtered.values())} filtered "
+                f"(kudos requests saved - {rules})")
+
+def load_rules(path):
+    """Compile the rules in a JSON file"""
+    with open(path, 'r') as f:
+        return KudosRules.from_config(json.load(f))
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from strava_api import STATE_DIR
+
+WATERMARK_FILE = os.path.join(STATE_DIR, 'club_watermarks.json')
+LEDGER_FILE = os.path.join(STATE_DIR, 'kudos_ledger.db')
+DEDUP_FILE = os.path.join(STATE_DIR, 'seen_activities.db')
+
+# Days an activity stays in the kudos ledger; club feeds never reach further back
+LEDGER_RETENTION_DAYS = int(os.getenv('STRAVA_LEDGER_RETENTION_DAYS', '30'))
+# Days a seen activity is remembered for deduplication
+DEDUP_RETENTION_DAYS = int(os.getenv('STRAVA_DEDUP_RETENTION_DAYS', '7'))
+
+# Number of newest activity keys remembered per club, so the watermark
+# still matches if the single newest activity gets deleted or edited
+WATERMARK_SIZE = 5
+
+def _write_json(path, data):
+    """Write JSON atomically so an interrupted run never leaves a torn file"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def load_watermarks(path=WATERMARK_FILE):
+    """Load per-club watermarks as {club_id: [activity_key, ...]}, newest first"""
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return {club_id: [tuple(key) for key in keys] for club_id, keys in data.items()}
+
+def save_watermarks(watermarks, path=WATERMARK_FILE):
+    _write_json(path, {club_id: [list(key) for key in keys] for club_id, keys in watermarks.items()})
+
+def advance_watermark(old_keys, new_keys, size=WATERMARK_SIZE):
+    """Put the newly seen keys (newest first) in front of the old watermark"""
+    merged = []
+    for key in list(new_keys) + list(old_keys or []):
+        if key not in merged:
+            merged.append(key)
+        if len(merged) == size:
+            break
+    return merged
+
+class KudosLedger:
+    """Activity IDs we already gave kudos to, persisted in SQLite for a retention window"""
+
+    def __init__(self, path=LEDGER_FILE, retention_days=LEDGER_RETENTION_DAYS):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS kudos ('
+            'activity_id INTEGER PRIMARY KEY, given_at INTEGER NOT NULL) WITHOUT ROWID'
+        )
+        self.retention_days = retention_days
+        # Keep the IDs in memory so lookups never touch the disk
+        self.activity_ids = {row[0] for row in self.conn.execute('SELECT activity_id FROM kudos')}
+        self.evict()
+
+    def __contains__(self, activity_id):
+        return int(activity_id) in self.activity_ids
+
+    def __len__(self):
+        return len(self.activity_ids)
+
+    def add(self, activity_id):
+        activity_id = int(activity_id)
+        self.activity_ids.add(activity_id)
+        self.conn.execute(
+            'INSERT OR REPLACE INTO kudos (activity_id, given_at) VALUES (?, ?)',
+            (activity_id, int(time.time()))
+        )
+
+    def evict(self):
+        """Drop activities given kudos before the retention window, on disk and in memory.
+
+        Returns the number dropped; long-running processes call this every poll.
+        """
+        cutoff = int(time.time()) - self.retention_days * 86400
+        expired = [row[0] for row in self.conn.execute('SELECT activity_id FROM kudos WHERE given_at < ?', (cutoff,))]
+        if expired:
+            self.conn.execute('DELETE FROM kudos WHERE given_at < ?', (cutoff,))
+            self.conn.commit()
+            self.activity_ids.difference_update(expired)
+        return len(expired)
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def key_digest(key):
+    """Fixed-size 64-bit digest of a dedup key, as a signed SQLite integer"""
+    digest = hashlib.blake2b(repr(key).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+class DedupIndex:
+    """Digests of activities already seen, persisted for a retention window.
+
+    Keys are reduced to 8-byte digests, so memory per entry stays fixed no
+    matter how many overlapping clubs are monitored. add() is thread-safe
+    for concurrent club fetches; new entries only reach the disk on
+    commit(), so a run that stops early is retried in full next time.
+    """
+
+    def __init__(self, path=DEDUP_FILE, retention_days=DEDUP_RETENTION_DAYS):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS seen ('
+            'digest INTEGER PRIMARY KEY, seen_at INTEGER NOT NULL) WITHOUT ROWID'
+        )
+        self.retention_days = retention_days
+        self.digests = {row[0] for row in self.conn.execute('SELECT digest FROM seen')}
+        self.new_digests = []
+        self.lock = threading.Lock()
+        self.evict()
+
+    def __contains__(self, key):
+        return key_digest(key) in self.digests
+
+    def __len__(self):
+        return len(self.digests)
+
+    def add(self, key):
+        """Record key, returning True if it had not been seen before"""
+        digest = key_digest(key)
+        with self.lock:
+            if digest in self.digests:
+                return False
+            self.digests.add(digest)
+            self.new_digests.append(digest)
+            return True
+
+    def evict(self):
+        """Forget entries seen before the retention window, on disk and in memory.
+
+        Returns the number dropped; long-running processes call this every poll.
+        """
+        cutoff = int(time.time()) - self.retention_days * 86400
+        with self.lock:
+            expired = [row[0] for row in self.conn.execute('SELECT digest FROM seen WHERE seen_at < ?', (cutoff,))]
+            if expired:
+                with self.conn:
+                    self.conn.execute('DELETE FROM seen WHERE seen_at < ?', (cutoff,))
+                self.digests.difference_update(expired)
+        return len(expired)
+
+    def discard(self, keys):
+        """Forget keys added since the last commit, so they count as unseen again"""
+        digests = {key_digest(key) for key in keys}
+        with self.lock:
+            digests.intersection_update(self.new_digests)
+            self.digests.difference_update(digests)
+            self.new_digests = [digest for digest in self.new_digests if digest not in digests]
+
+    def rollback(self):
+        """Forget the entries added since the last commit"""
+        with self.lock:
+            self.digests.difference_update(self.new_digests)
+            self.new_digests = []
+
+    def commit(self):
+        now = int(time.time())
+        with self.lock:
+            with self.conn:
+                self.conn.executemany(
+                    'INSERT OR REPLACE INTO seen (digest, seen_at) VALUES (?, ?)',
+                    [(digest, now) for digest in self.new_digests]
+                )
+            self.new_digests = []
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
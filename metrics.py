@@ -0,0 +1,122 @@
+"""Lightweight timing and counter instrumentation shared by all scripts.
+
+Enabled by setting STRAVA_METRICS_DIR: each script then writes
+<dir>/<job>.json on exit, plus a Prometheus text exposition <dir>/<job>.prom
+when STRAVA_METRICS_PROMETHEUS=1. When disabled every call returns straight
+away, so the instrumentation can stay in hot paths.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_DIR = os.getenv('STRAVA_METRICS_DIR')
+PROMETHEUS = os.getenv('STRAVA_METRICS_PROMETHEUS') == '1'
+
+enabled = bool(METRICS_DIR)
+
+_lock = threading.Lock()
+_job = None
+_timers = {}
+_counters = {}
+_gauges = {}
+
+def _key(name, labels):
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{k}="{v}"' for k, v in sorted(labels.items())) + '}'
+
+def start(job):
+    """Name this process's metrics output and write it on exit"""
+    global _job
+    if not enabled or _job is not None:
+        return
+    _job = job
+    atexit.register(write)
+
+def count(name, value=1, **labels):
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def gauge(name, value, **labels):
+    if not enabled:
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+def observe(name, seconds, **labels):
+    """Record one timing sample (count, sum and max are kept)"""
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        timer = _timers.get(key)
+        if timer is None:
+            _timers[key] = [1, seconds, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+@contextmanager
+def _timed(name, labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+@contextmanager
+def _untimed():
+    yield
+
+def phase(name):
+    """Context manager timing one phase of a script"""
+    if not enabled:
+        return _untimed()
+    return _timed('phase_seconds', {'phase': name})
+
+def snapshot():
+    with _lock:
+        return {
+            'job': _job,
+            'timers': {key: {'count': c, 'sum': round(s, 6), 'max': round(m, 6)}
+                       for key, (c, s, m) in _timers.items()},
+            'counters': dict(_counters),
+            'gauges': dict(_gauges),
+        }
+
+def prometheus_text(data):
+    """Render a snapshot in the Prometheus text exposition format"""
+    lines = []
+
+    def emit(key, suffix, value):
+        name, brace, labels = key.partition('{')
+        lines.append(f"strava_{name}{suffix}{brace}{labels} {value}")
+
+    for key, timer in sorted(data['timers'].items()):
+        emit(key, '_count', timer['count'])
+        emit(key, '_sum', timer['sum'])
+        emit(key, '_max', timer['max'])
+    for key, value in sorted(data['counters'].items()):
+        emit(key, '_total', value)
+    for key, value in sorted(data['gauges'].items()):
+        emit(key, '', value)
+    return '\n'.join(lines) + '\n'
+
+def write():
+    if not enabled:
+        return
+    data = snapshot()
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    base = os.path.join(METRICS_DIR, data['job'] or 'metrics')
+    with open(f"{base}.json", 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    if PROMETHEUS:
+        with open(f"{base}.prom", 'w') as f:
+            f.write(prometheus_text(data))
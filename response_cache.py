@@ -0,0 +1,151 @@
+"""Conditional GETs and a response cache for feeds that are polled repeatedly.
+
+Responses are cached with their ETag / Last-Modified validators, which are
+sent back on the next request so the API can answer 304 Not Modified
+without a body. Where it answers 200 anyway, a digest of the body is
+compared with the cached one, and an unchanged body reuses the decoded
+result instead of being parsed again.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode
+import metrics
+from strava_api import STATE_DIR, strava_request
+
+RESPONSE_CACHE_FILE = os.path.join(STATE_DIR, 'response_cache.db')
+
+# Cached responses kept, least recently used dropped first
+RESPONSE_CACHE_SIZE = int(os.getenv('STRAVA_RESPONSE_CACHE_SIZE', '256'))
+
+def body_digest(body):
+    return hashlib.blake2b(body, digest_size=16).digest()
+
+class CachedResponse:
+    __slots__ = ('etag', 'last_modified', 'digest', 'body', 'decoded')
+
+    def __init__(self, etag, last_modified, digest, body, decoded=None):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = digest
+        self.body = body
+        self.decoded = decoded
+
+class ResponseCache:
+    """GET responses by URL, persisted between runs.
+
+    get() is thread-safe for concurrent club fetches. Entries are held in
+    memory, decoded bodies included, and written to disk on save()/close().
+    """
+
+    def __init__(self, path=RESPONSE_CACHE_FILE, max_entries=RESPONSE_CACHE_SIZE):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, digest BLOB NOT NULL, body BLOB NOT NULL)'
+        )
+        self.max_entries = max_entries
+        self.entries = OrderedDict(
+            (key, CachedResponse(etag, last_modified, digest, body))
+            for key, etag, last_modified, digest, body in self.conn.execute(
+                'SELECT key, etag, last_modified, digest, body FROM responses')
+        )
+        self.dirty = set()
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'not_modified': 0, 'unchanged': 0, 'bytes_saved': 0}
+
+    @staticmethod
+    def _key(url, params):
+        return f"{url}?{urlencode(sorted(params.items()))}" if params else url
+
+    def get(self, url, decode, params=None, headers=None, limiter=None):
+        """GET url and return (status, decoded body).
+
+        decode turns the raw body into the value returned and cached. A 304
+        or an unchanged body returns the cached value, with status 200. Any
+        other non-200 status returns None as the value.
+        """
+        key = self._key(url, params)
+        with self.lock:
+            entry = self.entries.get(key)
+        headers = dict(headers or {})
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        response = strava_request('GET', url, limiter=limiter, headers=headers, params=params)
+        self._count('requests')
+
+        if response.status_code == 304 and entry is not None:
+            self._count('not_modified')
+            self._count('bytes_saved', len(entry.body))
+            return 200, self._decoded(entry, decode)
+        if response.status_code != 200:
+            return response.status_code, None
+
+        body = response.content
+        digest = body_digest(body)
+        if entry is not None and entry.digest == digest:
+            self._count('unchanged')
+            value = self._decoded(entry, decode)
+        else:
+            value = decode(body)
+        fresh = CachedResponse(response.headers.get('ETag'), response.headers.get('Last-Modified'), digest, body, value)
+        with self.lock:
+            self.entries[key] = fresh
+            self.entries.move_to_end(key)
+            self.dirty.add(key)
+            while len(self.entries) > self.max_entries:
+                self.dirty.discard(self.entries.popitem(last=False)[0])
+        return 200, value
+
+    @staticmethod
+    def _decoded(entry, decode):
+        if entry.decoded is None:
+            entry.decoded = decode(entry.body)
+        return entry.decoded
+
+    def _count(self, stat, value=1):
+        with self.lock:
+            self.stats[stat] += value
+        metrics.count(f'response_cache_{stat}', value)
+
+    def hit_rate(self):
+        """Share of requests answered from the cache (304 or unchanged body)"""
+        if not self.stats['requests']:
+            return 0.0
+        return (self.stats['not_modified'] + self.stats['unchanged']) / self.stats['requests']
+
+    def summary(self):
+        hits = self.stats['not_modified'] + self.stats['unchanged']
+        return (f"{hits}/{self.stats['requests']} cache hits ({self.hit_rate():.0%}: "
+                f"{self.stats['not_modified']} not modified, {self.stats['unchanged']} unchanged), "
+                f"{self.stats['bytes_saved'] / 1024:.0f} KB not downloaded")
+
+    def save(self):
+        with self.lock:
+            rows = [(key, e.etag, e.last_modified, e.digest, e.body)
+                    for key, e in self.entries.items() if key in self.dirty]
+            with self.conn:
+                self.conn.executemany(
+                    'INSERT OR REPLACE INTO responses (key, etag, last_modified, digest, body) '
+                    'VALUES (?, ?, ?, ?, ?)', rows
+                )
+                # Keep the file to the entries still in memory
+                placeholders = ','.join('?' * len(self.entries))
+                self.conn.execute(f'DELETE FROM responses WHERE key NOT IN ({placeholders})', list(self.entries))
+            self.dirty.clear()
+
+    def close(self):
+        self.save()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
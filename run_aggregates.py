@@ -0,0 +1,340 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:
+    ZoneInfo = None
+
+START_DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+def _is_api_date(value):
+    """True for the API's 'YYYY-MM-DDTHH:MM:SSZ' layout"""
+    return (len(value) == 20 and value[4] == '-' and value[7] == '-' and value[10] == 'T'
+            and value[13] == ':' and value[16] == ':' and value[19] == 'Z')
+
+def parse_start_date(value):
+    """Naive UTC datetime of an activity start_date.
+
+    The API's fixed layout is sliced directly, which is several times faster
+    than strptime; anything else (offsets, fractional seconds) goes through
+    the full parsers.
+    """
+    if _is_api_date(value):
+        try:
+            return datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                            int(value[11:13]), int(value[14:16]), int(value[17:19]))
+        except ValueError:
+            pass
+    try:
+        return datetime.strptime(value, START_DATE_FORMAT)
+    except ValueError:
+        dt = datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+        if dt.tzinfo is not None:
+            dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+        return dt
+
+# 'YYYY-MM' prefix -> (year, month); one shared key per month seen
+_month_keys = {}
+# (year, month) -> 'YYYY-MM', the label used in tables and running_data.json
+_month_labels = {}
+
+# '(GMT+01:00) Europe/Oslo' - the form of the API's timezone field
+_TIMEZONE_FIELD = re.compile(r'^\(GMT([+-])(\d\d):(\d\d)\)\s*(\S*)$')
+# timezone field -> tzinfo, looked up once per distinct zone
+_zones = {}
+
+def _zone(field):
+    zone = _zones.get(field)
+    if zone is None:
+        match = _TIMEZONE_FIELD.match(field)
+        if not match:
+            zone = timezone.utc
+        else:
+            sign, hours, minutes, name = match.groups()
+            zone = None
+            if ZoneInfo is not None and name:
+                try:
+                    zone = ZoneInfo(name)
+                except (ValueError, LookupError, OSError):
+                    pass
+            if zone is None:
+                # No tz database: the field's own (standard time) offset
+                offset = timedelta(hours=int(hours), minutes=int(minutes))
+                zone = timezone(-offset if sign == '-' else offset)
+        _zones[field] = zone
+    return zone
+
+def local_start_date(run):
+    """The run's local wall-clock start in the API layout.
+
+    start_date_local when present, else start_date converted through the
+    timezone field, else start_date itself (UTC).
+    """
+    local = run.get('start_date_local')
+    if local:
+        return local
+    field = run.get('timezone')
+    if not field:
+        return run['start_date']
+    utc = parse_start_date(run['start_date']).replace(tzinfo=timezone.utc)
+    return utc.astimezone(_zone(field)).strftime(START_DATE_FORMAT)
+
+def bucket_date(run):
+    """A start date in the run's local start month.
+
+    Offsets are under a day, so a UTC start from the 2nd to the 27th is
+    already in the right month and only runs near a month boundary pay for
+    a timezone conversion.
+    """
+    local = run.get('start_date_local')
+    if local:
+        return local
+    start_date = run['start_date']
+    if '02' <= start_date[8:10] <= '27' and _is_api_date(start_date):
+        return start_date
+    return local_start_date(run)
+
+def run_month(run):
+    """(year, month) bucket of a run, in the athlete's local time"""
+    start_date = bucket_date(run)
+    if not _is_api_date(start_date):
+        dt = parse_start_date(start_date)
+        return (dt.year, dt.month)
+    key = _month_keys.get(start_date[:7])
+    if key is None:
+        dt = parse_start_date(start_date)
+        key = _month_keys[start_date[:7]] = (dt.year, dt.month)
+    return key
+
+def run_day(run):
+    """'YYYY-MM-DD' local start date of a run"""
+    return local_start_date(run)[:10]
+
+def month_label(key):
+    """'YYYY-MM' label of a (year, month) key, formatted once per month"""
+    label = _month_labels.get(key)
+    if label is None:
+        label = _month_labels[key] = f"{key[0]}-{key[1]:02d}"
+    return label
+
+def _summary(run):
+    """The fields of a run kept for the best-performance records"""
+    return {
+        'id': run.get('id'),
+        'name': run.get('name', 'N/A'),
+        'start_date': run['start_date'],
+        'distance': run['distance'],
+        'moving_time': run['moving_time'],
+    }
+
+def _pace(run):
+    """Pace in min/km"""
+    return (run['moving_time'] / 60) / (run['distance'] / 1000)
+
+# Ranking keys for the records: lowest wins, ties go to the earliest run
+def _longest_rank(run):
+    return (-run['distance'], run['start_date'], run.get('id') or 0)
+
+def _fastest_rank(run):
+    return (_pace(run), run['start_date'], run.get('id') or 0)
+
+def _new_month():
+    return {
+        'count': 0,
+        'distance_dm': 0,
+        'time_s': 0,
+        'elevation_dm': 0,
+        'hr_sum_dbpm': 0,
+        'hr_count': 0,
+        'longest': None,
+        'fastest': None,
+    }
+
+class RunAggregates:
+    """Monthly and overall running aggregates that can be updated run by run.
+
+    Runs are bucketed by their local start month, and their count, distance
+    and time are also kept per local day for the training-load series. Sums
+    are kept in integer units (decimetres, seconds, tenths of a bpm) so
+    folding runs in and out in any order gives exactly the same result as a
+    full recompute. Each month also keeps its longest and fastest run.
+    """
+
+    # 2: months bucketed by local rather than UTC start; 3: daily totals
+    VERSION = 3
+
+    def __init__(self):
+        self.months = {}
+        # 'YYYY-MM-DD' -> [count, distance_dm, time_s]
+        self.days = {}
+        # Months whose record run was removed and must be recomputed
+        self.stale_months = set()
+
+    @classmethod
+    def from_activities(cls, activities):
+        aggregates = cls()
+        for activity in activities:
+            aggregates.add(activity)
+        return aggregates
+
+    def add(self, run):
+        if run.get('type') != 'Run':
+            return
+        key = run_month(run)
+        month = self.months.get(key)
+        if month is None:
+            month = self.months[key] = _new_month()
+        distance_dm = round(run['distance'] * 10)
+        time_s = round(run['moving_time'])
+        month['count'] += 1
+        month['distance_dm'] += distance_dm
+        month['time_s'] += time_s
+        month['elevation_dm'] += round(run.get('total_elevation_gain', 0) * 10)
+        avg_hr = run.get('average_heartrate')
+        if avg_hr:
+            month['hr_sum_dbpm'] += round(avg_hr * 10)
+            month['hr_count'] += 1
+        day_key = run_day(run)
+        day = self.days.get(day_key)
+        if day is None:
+            day = self.days[day_key] = [0, 0, 0]
+        day[0] += 1
+        day[1] += distance_dm
+        day[2] += time_s
+        if key not in self.stale_months:
+            self._update_records(month, run)
+
+    def remove(self, run):
+        if run.get('type') != 'Run':
+            return
+        key = run_month(run)
+        month = self.months[key]
+        distance_dm = round(run['distance'] * 10)
+        time_s = round(run['moving_time'])
+        month['count'] -= 1
+        month['distance_dm'] -= distance_dm
+        month['time_s'] -= time_s
+        month['elevation_dm'] -= round(run.get('total_elevation_gain', 0) * 10)
+        avg_hr = run.get('average_heartrate')
+        if avg_hr:
+            month['hr_sum_dbpm'] -= round(avg_hr * 10)
+            month['hr_count'] -= 1
+        day_key = run_day(run)
+        day = self.days[day_key]
+        day[0] -= 1
+        day[1] -= distance_dm
+        day[2] -= time_s
+        if day[0] == 0:
+            del self.days[day_key]
+        record_ids = {r['id'] for r in (month['longest'], month['fastest']) if r}
+        if month['count'] == 0:
+            del self.months[key]
+            self.stale_months.discard(key)
+        elif run.get('id') in record_ids:
+            self.stale_months.add(key)
+
+    def apply(self, changes, load_month):
+        """Fold (old, new) activity changes in as deltas.
+
+        load_month(key) must return the current activities of a month; it is
+        only called for months whose longest or fastest run was removed.
+        """
+        for old, new in changes:
+            if old is not None:
+                self.remove(old)
+            if new is not None:
+                self.add(new)
+        for key in self.stale_months:
+            month = self.months[key]
+            month['longest'] = month['fastest'] = None
+            for run in load_month(key):
+                if run.get('type') == 'Run':
+                    self._update_records(month, run)
+        self.stale_months.clear()
+
+    @staticmethod
+    def _update_records(month, run):
+        if month['longest'] is None or _longest_rank(run) < _longest_rank(month['longest']):
+            month['longest'] = _summary(run)
+        # Fastest pace only counts runs over 1 km
+        if run['distance'] > 1000:
+            if month['fastest'] is None or _fastest_rank(run) < _fastest_rank(month['fastest']):
+                month['fastest'] = _summary(run)
+
+    # Monthly tables keyed by (year, month), in the units printed and exported
+
+    def monthly_count(self):
+        return {key: m['count'] for key, m in self.months.items()}
+
+    def monthly_distance(self):
+        return {key: m['distance_dm'] / 10000 for key, m in self.months.items()}
+
+    def monthly_time(self):
+        return {key: m['time_s'] / 3600 for key, m in self.months.items()}
+
+    def monthly_elevation(self):
+        return {key: m['elevation_dm'] / 10 for key, m in self.months.items()}
+
+    def monthly_pace(self):
+        return {key: (m['time_s'] / 60) / (m['distance_dm'] / 10000)
+                for key, m in self.months.items() if m['distance_dm'] > 0}
+
+    def monthly_avg_hr(self):
+        return {key: m['hr_sum_dbpm'] / 10 / m['hr_count']
+                for key, m in self.months.items() if m['hr_count'] > 0}
+
+    # Overall totals
+
+    @property
+    def total_runs(self):
+        return sum(m['count'] for m in self.months.values())
+
+    @property
+    def total_distance(self):
+        """km"""
+        return sum(m['distance_dm'] for m in self.months.values()) / 10000
+
+    @property
+    def total_time(self):
+        """hours"""
+        return sum(m['time_s'] for m in self.months.values()) / 3600
+
+    @property
+    def total_elevation(self):
+        """m"""
+        return sum(m['elevation_dm'] for m in self.months.values()) / 10
+
+    @property
+    def longest_run(self):
+        runs = [m['longest'] for m in self.months.values() if m['longest']]
+        return min(runs, key=_longest_rank) if runs else None
+
+    @property
+    def fastest_run(self):
+        runs = [m['fastest'] for m in self.months.values() if m['fastest']]
+        return min(runs, key=_fastest_rank) if runs else None
+
+    @property
+    def fastest_pace(self):
+        run = self.fastest_run
+        return _pace(run) if run else float('inf')
+
+    # Persistence
+
+    def to_state(self):
+        return {
+            'version': self.VERSION,
+            'months': [[year, month, stats] for (year, month), stats in sorted(self.months.items())],
+            'days': [[day] + totals for day, totals in sorted(self.days.items())],
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Restore saved aggregates, or None if the state is from another version"""
+        if not state or state.get('version') != cls.VERSION:
+            return None
+        aggregates = cls()
+        aggregates.months = {(year, month): stats for year, month, stats in state['months']}
+        aggregates.days = {day: totals for day, *totals in state['days']}
+        return aggregates
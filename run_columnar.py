@@ -0,0 +1,138 @@
+"""Vectorized aggregation engine for large, multi-year or multi-athlete histories.
+
+Loads runs into typed NumPy columns and computes the monthly buckets, sums
+and record runs as group-bys. The result is a RunAggregates, so printing
+and export are shared with the row-by-row engine and match it exactly.
+NumPy is optional; it is only needed when this engine is selected.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from activity_record import ActivityBatch
+from run_aggregates import RunAggregates, _new_month, _summary, local_start_date
+
+# The ActivityBatch columns the engine reads
+BATCH_FIELDS = ('id', 'start_date', 'start_date_local', 'distance', 'moving_time', 'total_elevation_gain',
+                'average_heartrate')
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("The columnar engine needs NumPy: pip install numpy")
+
+def runs_to_columns(activities):
+    """Typed columns for the runs among activities, plus the runs themselves.
+
+    The numbers come from an ActivityBatch's arrays without a copy.
+    """
+    _require_numpy()
+    runs = [a for a in activities if a.get('type') == 'Run']
+    batch = ActivityBatch(runs, fields=BATCH_FIELDS)
+
+    def numbers(name):
+        return np.frombuffer(batch.columns[name], dtype=np.float64)
+
+    local_days = [(local or local_start_date(run))[:10] for local, run in zip(batch.columns['start_date_local'], runs)]
+    columns = {
+        # Strip the trailing 'Z' - NumPy parses naive ISO timestamps as UTC
+        'start': np.array([start_date[:19] for start_date in batch.columns['start_date']], dtype='datetime64[s]'),
+        # Local start day; RunAggregates buckets days and months by it
+        'day': np.array(local_days, dtype='datetime64[D]'),
+        'distance': numbers('distance'),
+        'moving_time': numbers('moving_time'),
+        # A missing elevation or heart rate is NaN in the batch and counts as 0 here
+        'elevation': np.nan_to_num(numbers('total_elevation_gain')),
+        'hr': np.nan_to_num(numbers('average_heartrate')),
+        'id': np.frombuffer(batch.columns['id'], dtype=np.int64),
+    }
+    return columns, runs
+
+def _group_sum(inverse, values, n_groups):
+    out = np.zeros(n_groups, dtype=np.int64)
+    np.add.at(out, inverse, values)
+    return out
+
+def _calendar_groups(values):
+    """The distinct values of a datetime64 column, ascending, and each row's group.
+
+    Days and months span a small range, so rows are binned by their offset
+    from the earliest one rather than sorted as np.unique would.
+    """
+    offsets = values.astype(np.int64)
+    first = offsets.min()
+    offsets -= first
+    present = np.flatnonzero(np.bincount(offsets))
+    group = np.zeros(int(offsets.max()) + 1, dtype=np.int64)
+    group[present] = np.arange(len(present))
+    return (present + first).astype(values.dtype), group[offsets]
+
+def _best_per_group(inverse, values, n_groups, start, ids):
+    """(group, row) of the row with the smallest value in each group,
+    ties to the earliest start then the lowest id, as RunAggregates ranks runs"""
+    best = np.full(n_groups, np.inf)
+    np.minimum.at(best, inverse, values)
+    # Usually one candidate per group, so only the ties get sorted
+    candidates = np.flatnonzero(values == best[inverse])
+    order = candidates[np.lexsort((ids[candidates], start[candidates], inverse[candidates]))]
+    starts = np.flatnonzero(np.r_[True, np.diff(inverse[order]) != 0])
+    return inverse[order[starts]], order[starts]
+
+def aggregate_columns(columns, runs):
+    """Build RunAggregates from runs_to_columns output with vectorized group-bys"""
+    aggregates = RunAggregates()
+    if not runs:
+        return aggregates
+
+    months, inverse = _calendar_groups(columns['day'].astype('datetime64[M]'))
+    n = len(months)
+    # Same integer units as RunAggregates.add (np.rint rounds half to even like round())
+    count = np.bincount(inverse, minlength=n)
+    run_distance_dm = np.rint(columns['distance'] * 10).astype(np.int64)
+    run_time_s = np.rint(columns['moving_time']).astype(np.int64)
+    distance_dm = _group_sum(inverse, run_distance_dm, n)
+    time_s = _group_sum(inverse, run_time_s, n)
+    elevation_dm = _group_sum(inverse, np.rint(columns['elevation'] * 10).astype(np.int64), n)
+    has_hr = columns['hr'] != 0
+    hr_sum = _group_sum(inverse, np.where(has_hr, np.rint(columns['hr'] * 10), 0).astype(np.int64), n)
+    hr_count = np.bincount(inverse, weights=has_hr, minlength=n).astype(np.int64)
+
+    # Record runs: best value first, ties to the earliest start then lowest id
+    start = columns['start'].astype(np.int64)
+    longest_groups, longest_rows = _best_per_group(inverse, -columns['distance'], n, start, columns['id'])
+
+    eligible = np.flatnonzero(columns['distance'] > 1000)
+    pace = (columns['moving_time'][eligible] / 60) / (columns['distance'][eligible] / 1000)
+    fastest_groups, fastest_rows = _best_per_group(inverse[eligible], pace, n, start[eligible], columns['id'][eligible])
+    fastest_rows = eligible[fastest_rows]
+
+    years = months.astype('datetime64[Y]').astype(int) + 1970
+    month_numbers = months.astype(int) % 12 + 1
+    stats = []
+    for year, month_number, values in zip(years.tolist(), month_numbers.tolist(), zip(
+            count.tolist(), distance_dm.tolist(), time_s.tolist(), elevation_dm.tolist(), hr_sum.tolist(),
+            hr_count.tolist())):
+        month = _new_month()
+        month.update(zip(('count', 'distance_dm', 'time_s', 'elevation_dm', 'hr_sum_dbpm', 'hr_count'), values))
+        stats.append(month)
+        aggregates.months[(year, month_number)] = month
+
+    days, day_inverse = _calendar_groups(columns['day'])
+    day_count = np.bincount(day_inverse, minlength=len(days))
+    day_distance_dm = _group_sum(day_inverse, run_distance_dm, len(days))
+    day_time_s = _group_sum(day_inverse, run_time_s, len(days))
+    aggregates.days = {
+        day: [c, d, t]
+        for day, c, d, t in zip(days.astype(str).tolist(), day_count.tolist(), day_distance_dm.tolist(),
+                                day_time_s.tolist())
+    }
+
+    for group, row in zip(longest_groups.tolist(), longest_rows.tolist()):
+        stats[group]['longest'] = _summary(runs[row])
+    for group, row in zip(fastest_groups.tolist(), fastest_rows.tolist()):
+        stats[group]['fastest'] = _summary(runs[row])
+    return aggregates
+
+def aggregate_activities(activities):
+    """Columnar equivalent of RunAggregates.from_activities"""
+    return aggregate_columns(*runs_to_columns(activities))
@@ -1,51 +1,83 @@
 import os
-import requests
-from datetime import datetime
-from collections import defaultdict
+import argparse
+from array import array
+from calendar import timegm
+from datetime import timedelta
 import json
+import activity_record
+import metrics
+import strava_api
+from strava_api import API_URL, strava_request
+from activity_store import ActivityStore
+from activity_streams import StreamCache, fetch_missing_streams
+from best_efforts import BEST_EFFORT_DISTANCES, compute_efforts, format_duration, personal_records
+from run_aggregates import START_DATE_FORMAT, RunAggregates, local_start_date, month_label, parse_start_date, run_month
+from strava_export import iter_export_activities
+from training_load import ROLLING_WINDOWS, training_load
 
 # Strava API credentials
 CLIENT_ID = os.getenv('STRAVA_CLIENT_ID')
 CLIENT_SECRET = os.getenv('STRAVA_CLIENT_SECRET')
 REFRESH_TOKEN = os.getenv('STRAVA_REFRESH_TOKEN')
 
+# Incremental syncs re-read this many days before the newest cached
+# activity, so recent edits (renames, corrected distances) are picked up
+SYNC_LOOKBACK_DAYS = int(os.getenv('STRAVA_SYNC_LOOKBACK_DAYS', '3'))
+
+# Aggregation engine for full recomputes: 'python' (row by row) or
+# 'columnar' (vectorized, needs NumPy - worth it for very large histories)
+ENGINES = ('python', 'columnar')
+DEFAULT_ENGINE = os.getenv('RUNNING_ENGINE', 'python')
+
+DATA_FILE = 'running_data.json'
+
 def get_access_token():
-    url = 'https://www.strava.com/oauth/token'
-    payload = {
-        'client_id': CLIENT_ID,
-        'client_secret': CLIENT_SECRET,
-        'refresh_token': REFRESH_TOKEN,
-        'grant_type': 'refresh_token'
-    }
-    response = requests.post(url, data=payload)
-    return response.json()['access_token']
+    return strava_api.get_access_token(CLIENT_ID, CLIENT_SECRET, REFRESH_TOKEN)
 
-def get_athlete_activities(access_token, per_page=200):
-    """Fetch all athlete activities"""
-    url = 'https://www.strava.com/api/v3/athlete/activities'
+def iter_athlete_activities(access_token, per_page=200, after=None):
+    """Stream athlete activities page by page, optionally only those starting after the `after` epoch"""
+    url = f'{API_URL}/athlete/activities'
     headers = {'Authorization': f'Bearer {access_token}'}
-    
-    activities = []
     page = 1
     
     while True:
         params = {'per_page': per_page, 'page': page}
-        response = requests.get(url, headers=headers, params=params)
+        if after is not None:
+            params['after'] = after
+        response = strava_request('GET', url, headers=headers, params=params)
         
+        # Fail loudly rather than analyze a truncated history
         if response.status_code != 200:
             print(f"Error fetching activities: {response.status_code}")
-            break
+            response.raise_for_status()
         
-        page_activities = response.json()
+        page_activities = activity_record.loads(response.content)
         
         if not page_activities:
             break
         
-        activities.extend(page_activities)
         print(f"Fetched page {page} ({len(page_activities)} activities)")
+        metrics.count('activity_pages')
+        yield from page_activities
         page += 1
-    
-    return activities
+
+def get_athlete_activities(access_token, per_page=200, after=None):
+    """Fetch all athlete activities, or only those starting after the `after` epoch"""
+    return list(iter_athlete_activities(access_token, per_page, after))
+
+def sync_activities(access_token, store, full=False):
+    """Bring the local activity store up to date.
+
+    Returns the number of activities fetched and the store's (old, new)
+    changes - None after a full refetch, which streams straight into the
+    store and leaves derived state to be rebuilt.
+    """
+    latest = store.latest_start_date()
+    if full or latest is None:
+        return store.replace_all(iter_athlete_activities(access_token)), None
+    latest_epoch = timegm(parse_start_date(latest).timetuple())
+    activities = get_athlete_activities(access_token, after=latest_epoch - SYNC_LOOKBACK_DAYS * 86400)
+    return len(activities), store.upsert(activities)
 
 def print_table(data, title):
     """Print data in year x month table format"""
@@ -88,164 +120,365 @@ def print_table(data, title):
     
     print("=" * 150 + "\n")
 
-def analyze_running_activities(activities):
+def build_running_aggregates(activities, engine=DEFAULT_ENGINE):
+    """Aggregate a full list of activities with the chosen engine"""
+    if engine == 'columnar':
+        from run_columnar import aggregate_activities
+        return aggregate_activities(activities)
+    return RunAggregates.from_activities(activities)
+
+def analyze_running_activities(activities, engine=DEFAULT_ENGINE):
     """Analyze running activities"""
-    
-    # Filter for runs only
-    runs = [act for act in activities if act.get('type') == 'Run']
-    
-    if not runs:
-        print("No running activities found.")
+    report_running_aggregates(build_running_aggregates(activities, engine))
+
+def update_running_aggregates(store, changes, base_revision, engine=DEFAULT_ENGINE):
+    """Fold synced changes into the aggregates saved with the store.
+
+    base_revision is the store revision before the changes were applied.
+    Falls back to a full recompute, streamed from the store, when changes is
+    None or the saved state is missing or from another revision.
+    """
+    state = store.get_meta('run_aggregates')
+    state = json.loads(state) if state else None
+    aggregates = RunAggregates.from_state(state)
+    if changes is None or aggregates is None or state.get('revision') != base_revision:
+        print("Rebuilding running aggregates from the activity store")
+        aggregates = build_running_aggregates(store.iter_activities(), engine)
+    else:
+        aggregates.apply(changes, lambda key: month_activities(store, key))
+    state = aggregates.to_state()
+    state['revision'] = store.revision()
+    store.set_meta('run_aggregates', json.dumps(state, separators=(',', ':')))
+    return aggregates
+
+def month_range(key, pad_days=0):
+    """[start, end) start_date bounds of a (year, month) bucket, widened by pad_days each side"""
+    year, month = key
+    next_key = (year + 1, 1) if month == 12 else (year, month + 1)
+    start = f"{month_label(key)}-01T00:00:00Z"
+    end = f"{month_label(next_key)}-01T00:00:00Z"
+    if pad_days:
+        pad = timedelta(days=pad_days)
+        start = (parse_start_date(start) - pad).strftime(START_DATE_FORMAT)
+        end = (parse_start_date(end) + pad).strftime(START_DATE_FORMAT)
+    return start, end
+
+def month_activities(store, key):
+    """Cached activities in a local-time month bucket.
+
+    The store is indexed by UTC start_date and local time is at most 14
+    hours off, so a month padded by a day covers the bucket.
+    """
+    return [a for a in store.activities_between(*month_range(key, pad_days=1)) if run_month(a) == key]
+
+def print_training_load(training):
+    """Print the latest rolling volumes, ATL/CTL and streaks"""
+    if not training:
         return
+    current = training['current']
+    streaks = training['streaks']
+    print("="*80)
+    print("TRAINING LOAD")
+    print("="*80)
+    print("Rolling distance: " + ", ".join(
+        f"{window} days {current[f'distance_{window}d_km']:.1f} km" for window in ROLLING_WINDOWS))
+    print(f"Acute load (ATL): {current['atl']:.2f} km/day")
+    print(f"Chronic load (CTL): {current['ctl']:.2f} km/day")
+    print(f"Form (TSB): {current['tsb']:+.2f}")
+    print(f"Current streak: {streaks['current_days']} days")
+    if streaks['longest_days']:
+        print(f"Longest streak: {streaks['longest_days']} days ({streaks['longest_start']} to {streaks['longest_end']})")
+    print("="*80 + "\n")
+
+# Fields of a run's chart point, read from the store as columns
+RUN_POINT_FIELDS = ('start_date', 'start_date_local', 'timezone', 'distance', 'moving_time')
+
+def store_run_ids(store, min_distance=0):
+    """IDs of the store's runs of at least min_distance metres, newest first"""
+    return [activity_id for activity_id, distance in store.iter_columns(('id', 'distance'), 'Run', newest_first=True)
+            if (distance or 0) >= min_distance]
+
+def store_run_points(store):
+    """run_point of each of the store's runs, read as columns rather than decoded activities"""
+    for start_date, start_date_local, zone, distance, moving_time in store.iter_columns(RUN_POINT_FIELDS, 'Run'):
+        if distance and moving_time:
+            local = start_date_local or local_start_date({'start_date': start_date, 'timezone': zone})
+            yield local, distance, moving_time
+
+def run_point(run):
+    """(local start, distance m, moving time s) of a run, None if it has no distance or time"""
+    distance = run.get('distance')
+    moving_time = run.get('moving_time')
+    if not distance or not moving_time:
+        return None
+    return local_start_date(run), distance, moving_time
+
+def tap_run_points(activities, runs):
+    """Pass activities through, adding each run's run_point to the RunColumns runs"""
+    for activity in activities:
+        if activity.get('type') == 'Run':
+            runs.add(run_point(activity))
+        yield activity
+
+class RunColumns:
+    """Per-run columns in compact form: the date as 19 ASCII bytes, distance and pace as doubles.
+
+    About 35 bytes a run, so a streamed export's series stays small until
+    series() formats it.
+    """
+    DATE_WIDTH = len('YYYY-MM-DD HH:MM:SS')
+
+    def __init__(self):
+        self.dates = bytearray()
+        self.distances = array('d')
+        self.paces = array('d')
+
+    def __len__(self):
+        return len(self.distances)
+
+    def add(self, point):
+        """Add a run_point tuple; None is skipped"""
+        if point:
+            start, distance, moving_time = point
+            self.dates += f"{start[:10]} {start[11:19]}".encode('ascii')
+            self.distances.append(round(distance / 1000, 2))
+            self.paces.append(round(moving_time / 60 / (distance / 1000), 2))
+
+    def date(self, i):
+        return self.dates[i * self.DATE_WIDTH:(i + 1) * self.DATE_WIDTH].decode('ascii')
+
+    def series(self):
+        """The columns oldest first, in the running_data.json 'runs' shape; only sorted if out of order"""
+        dates = [self.date(i) for i in range(len(self))]
+        distances = self.distances.tolist()
+        paces = self.paces.tolist()
+        if any(dates[i] > dates[i + 1] for i in range(len(dates) - 1)):
+            order = sorted(range(len(dates)), key=lambda i: (dates[i], distances[i], paces[i]))
+            dates = [dates[i] for i in order]
+            distances = [distances[i] for i in order]
+            paces = [paces[i] for i in order]
+        return {'date': dates, 'distance_km': distances, 'pace_min_per_km': paces}
+
+def run_series(points):
+    """Per-run columns, oldest first, in the running_data.json 'runs' shape.
+
+    points (run_point tuples, None skipped) are packed into RunColumns as
+    they stream in.
+    """
+    runs = RunColumns()
+    for point in points:
+        runs.add(point)
+    return runs.series()
+
+def fetch_run_streams(access_token, store, cache):
+    """Fetch streams for runs that have none cached; returns the IDs of runs long enough for efforts"""
+    # Newest first, so recent runs get their streams before the backfill
+    run_ids = store_run_ids(store, min(BEST_EFFORT_DISTANCES.values()))
+    with metrics.phase('streams'):
+        fetched, missing = fetch_missing_streams(access_token, cache, run_ids)
+    print(f"✓ Fetched streams for {fetched} runs" + (f", {missing} left for later runs" if missing else "") + "\n")
+    return run_ids
+
+def rank_best_efforts(cache, store, run_ids):
+    """Compute best efforts not yet saved in the cache and rank them into PR tables.
+
+    Efforts are streamed from the cache and only the ranked runs are loaded
+    from the store, so memory doesn't grow with the history.
+    """
+    run_ids = set(run_ids)
+    with metrics.phase('best_efforts'):
+        # Computed once per activity, and again only when the distances change
+        stale = [activity_id for activity_id, efforts in cache.iter_efforts(run_ids)
+                 if set(efforts or ()) != set(BEST_EFFORT_DISTANCES)]
+        computed = cache.set_efforts(compute_efforts(cache.iter_streams(stale)))
+        records = personal_records(cache.iter_efforts(run_ids), store.activities_by_id)
+    metrics.count('best_efforts_computed', computed)
+    return records
+
+def update_best_efforts(access_token, store):
+    """Fetch missing run streams, compute new best efforts and rank them into PR tables"""
+    with StreamCache() as cache:
+        run_ids = fetch_run_streams(access_token, store, cache)
+        return rank_best_efforts(cache, store, run_ids)
+
+def print_best_efforts(best_efforts):
+    print("\n" + "="*80)
+    print("PERSONAL RECORDS")
+    print("="*80)
+    for label, efforts in best_efforts.items():
+        print(f"{label}:")
+        for rank, effort in enumerate(efforts, 1):
+            hr = f", {effort['avg_hr_bpm']:.0f} bpm" if effort['avg_hr_bpm'] else ""
+            print(f"  {rank}. {format_duration(effort['seconds']):>8} ({effort['pace_min_per_km']:.2f} min/km{hr}) "
+                  f"on {effort['date']} - {effort['name'] or 'N/A'}")
+    print("="*80 + "\n")
+
+def report_running_aggregates(aggregates, best_efforts=None, quiet=False, json_path=DATA_FILE, indent=2, runs=None):
+    """Print and export monthly and overall running statistics.
+
+    quiet skips printing the statistics tables. The running_data.json-shaped
+    data is returned, and also written to json_path unless that is None;
+    indent=None writes it compact. runs (run_series) is exported as is.
+    """
+    if not aggregates.months:
+        print("No running activities found.")
+        return None
     
     # Monthly aggregations
-    monthly_count = defaultdict(int)
-    monthly_distance = defaultdict(float)
-    monthly_time = defaultdict(float)
-    monthly_elevation = defaultdict(float)
-    monthly_pace = defaultdict(float)
-    monthly_hr_sum = defaultdict(float)
-    monthly_hr_count = defaultdict(int)
+    monthly_count = aggregates.monthly_count()
+    monthly_distance = aggregates.monthly_distance()
+    monthly_time = aggregates.monthly_time()
+    monthly_elevation = aggregates.monthly_elevation()
+    monthly_pace = aggregates.monthly_pace()
+    monthly_avg_hr = aggregates.monthly_avg_hr()
     
     # Overall stats
-    total_distance = 0
-    total_time = 0
-    total_elevation = 0
-    longest_run = None
-    fastest_pace = float('inf')
-    fastest_run = None
-    
-    for run in runs:
-        # Parse date (format: "2024-01-15T10:30:00Z")
-        date_str = run['start_date']
-        dt = datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%SZ")
-        year = dt.year
-        month = dt.month
-        key = (year, month)
-        
-        # Distance (meters to km)
-        distance_km = run['distance'] / 1000
-        monthly_distance[key] += distance_km
-        total_distance += distance_km
-        
-        # Time (seconds to hours)
-        time_hours = run['moving_time'] / 3600
-        monthly_time[key] += time_hours
-        total_time += time_hours
-        
-        # Elevation
-        elevation = run.get('total_elevation_gain', 0)
-        monthly_elevation[key] += elevation
-        total_elevation += elevation
-        
-        # Count
-        monthly_count[key] += 1
-        
-        # Heart rate (if available)
-        avg_hr = run.get('average_heartrate')
-        if avg_hr:
-            monthly_hr_sum[key] += avg_hr
-            monthly_hr_count[key] += 1
-        
-        # Track longest run
-        if longest_run is None or distance_km > longest_run['distance'] / 1000:
-            longest_run = run
-        
-        # Track fastest pace (only for runs > 1km)
-        if distance_km > 1:
-            pace = (run['moving_time'] / 60) / distance_km  # min per km
-            if pace < fastest_pace:
-                fastest_pace = pace
-                fastest_run = run
-    
-    # Calculate monthly average pace
-    for key in monthly_distance:
-        if monthly_distance[key] > 0:
-            monthly_pace[key] = (monthly_time[key] * 60) / monthly_distance[key]
-    
-    # Calculate monthly average heart rate
-    monthly_avg_hr = {}
-    for key in monthly_hr_sum:
-        if monthly_hr_count[key] > 0:
-            monthly_avg_hr[key] = monthly_hr_sum[key] / monthly_hr_count[key]
-    
-    # Print overall stats
-    print("\n" + "="*80)
-    print("OVERALL RUNNING STATISTICS")
-    print("="*80)
-    print(f"Total runs: {len(runs):,}")
-    print(f"Total distance: {total_distance:,.1f} km")
-    print(f"Total time: {total_time:,.1f} hours")
-    print(f"Total elevation gain: {total_elevation:,.0f} m")
-    print(f"Average distance per run: {total_distance / len(runs):.1f} km")
-    print(f"Average pace: {(total_time * 60) / total_distance:.2f} min/km")
-    print("="*80 + "\n")
+    total_runs = aggregates.total_runs
+    total_distance = aggregates.total_distance
+    total_time = aggregates.total_time
+    total_elevation = aggregates.total_elevation
+    longest_run = aggregates.longest_run
+    fastest_run = aggregates.fastest_run
+    fastest_pace = aggregates.fastest_pace
     
-    # Print monthly tables
-    print_table(monthly_count, "MONTHLY RUN COUNT (Number of Runs)")
-    print_table(monthly_distance, "MONTHLY DISTANCE (km)")
-    print_table(monthly_time, "MONTHLY TIME (hours)")
-    print_table(monthly_elevation, "MONTHLY ELEVATION GAIN (m)")
-    print_table(monthly_pace, "MONTHLY AVERAGE PACE (min/km)")
+    # Rolling training load through today
+    training = training_load(aggregates.days)
     
-    if monthly_avg_hr:
-        print_table(monthly_avg_hr, "MONTHLY AVERAGE HEART RATE (bpm)")
-    else:
-        print("\nMONTHLY AVERAGE HEART RATE (bpm)")
-        print("No heart rate data available\n")
+    if not quiet:
+        # Print overall stats
+        print("\n" + "="*80)
+        print("OVERALL RUNNING STATISTICS")
+        print("="*80)
+        print(f"Total runs: {total_runs:,}")
+        print(f"Total distance: {total_distance:,.1f} km")
+        print(f"Total time: {total_time:,.1f} hours")
+        print(f"Total elevation gain: {total_elevation:,.0f} m")
+        print(f"Average distance per run: {total_distance / total_runs:.1f} km")
+        print(f"Average pace: {(total_time * 60) / total_distance:.2f} min/km")
+        print("="*80 + "\n")
     
-    # Best performances
-    print("\n" + "="*80)
-    print("BEST PERFORMANCES")
-    print("="*80)
-    if longest_run:
-        print(f"Longest run: {longest_run['distance']/1000:.1f} km on {longest_run['start_date'][:10]}")
-        print(f"  Name: {longest_run.get('name', 'N/A')}")
-    if fastest_run:
-        print(f"Fastest pace: {fastest_pace:.2f} min/km on {fastest_run['start_date'][:10]}")
-        print(f"  Name: {fastest_run.get('name', 'N/A')}")
-        print(f"  Distance: {fastest_run['distance']/1000:.1f} km")
-    print("="*80 + "\n")
+        # Print monthly tables
+        print_table(monthly_count, "MONTHLY RUN COUNT (Number of Runs)")
+        print_table(monthly_distance, "MONTHLY DISTANCE (km)")
+        print_table(monthly_time, "MONTHLY TIME (hours)")
+        print_table(monthly_elevation, "MONTHLY ELEVATION GAIN (m)")
+        print_table(monthly_pace, "MONTHLY AVERAGE PACE (min/km)")
+    
+        if monthly_avg_hr:
+            print_table(monthly_avg_hr, "MONTHLY AVERAGE HEART RATE (bpm)")
+        else:
+            print("\nMONTHLY AVERAGE HEART RATE (bpm)")
+            print("No heart rate data available\n")
     
-    # Export to JSON
+        # Best performances
+        print("\n" + "="*80)
+        print("BEST PERFORMANCES")
+        print("="*80)
+        if longest_run:
+            print(f"Longest run: {longest_run['distance']/1000:.1f} km on {longest_run['start_date'][:10]}")
+            print(f"  Name: {longest_run.get('name', 'N/A')}")
+        if fastest_run:
+            print(f"Fastest pace: {fastest_pace:.2f} min/km on {fastest_run['start_date'][:10]}")
+            print(f"  Name: {fastest_run.get('name', 'N/A')}")
+            print(f"  Distance: {fastest_run['distance']/1000:.1f} km")
+        print("="*80 + "\n")
+    
+        if best_efforts:
+            print_best_efforts(best_efforts)
+    
+        print_training_load(training)
+    
+    # Export to JSON; every table's months are a subset of the count table's
+    months = [(key, month_label(key)) for key in sorted(monthly_count)]
     export_data = {
         'monthly': {
-            'count': {f"{y}-{m:02d}": monthly_count[(y, m)] for y, m in sorted(monthly_count.keys())},
-            'distance_km': {f"{y}-{m:02d}": round(monthly_distance[(y, m)], 2) for y, m in sorted(monthly_distance.keys())},
-            'time_hours': {f"{y}-{m:02d}": round(monthly_time[(y, m)], 2) for y, m in sorted(monthly_time.keys())},
-            'elevation_m': {f"{y}-{m:02d}": round(monthly_elevation[(y, m)], 1) for y, m in sorted(monthly_elevation.keys())},
-            'pace_min_per_km': {f"{y}-{m:02d}": round(monthly_pace[(y, m)], 2) for y, m in sorted(monthly_pace.keys()) if (y, m) in monthly_pace},
-            'avg_hr_bpm': {f"{y}-{m:02d}": round(monthly_avg_hr[(y, m)], 1) for y, m in sorted(monthly_avg_hr.keys())}
+            'count': {label: monthly_count[key] for key, label in months},
+            'distance_km': {label: round(monthly_distance[key], 2) for key, label in months if key in monthly_distance},
+            'time_hours': {label: round(monthly_time[key], 2) for key, label in months if key in monthly_time},
+            'elevation_m': {label: round(monthly_elevation[key], 1) for key, label in months if key in monthly_elevation},
+            'pace_min_per_km': {label: round(monthly_pace[key], 2) for key, label in months if key in monthly_pace},
+            'avg_hr_bpm': {label: round(monthly_avg_hr[key], 1) for key, label in months if key in monthly_avg_hr}
         },
         'overall': {
-            'total_runs': len(runs),
+            'total_runs': total_runs,
             'total_distance_km': round(total_distance, 2),
             'total_time_hours': round(total_time, 2),
             'total_elevation_m': round(total_elevation, 1),
-            'avg_distance_per_run': round(total_distance / len(runs), 2),
+            'avg_distance_per_run': round(total_distance / total_runs, 2),
             'avg_pace_min_per_km': round((total_time * 60) / total_distance, 2)
         }
     }
+    if training:
+        export_data['training'] = training
+    if best_efforts:
+        export_data['best_efforts'] = best_efforts
+    if runs:
+        export_data['runs'] = runs
     
     # Write JSON file
-    with open('running_data.json', 'w') as f:
-        json.dump(export_data, f, indent=2)
-    print("✓ Data exported to running_data.json\n")
+    if json_path:
+        with open(json_path, 'w') as f:
+            if indent is None:
+                json.dump(export_data, f, separators=(',', ':'))
+            else:
+                json.dump(export_data, f, indent=indent)
+        print(f"✓ Data exported to {json_path}\n")
+    return export_data
+
+def sync_store(access_token, store, full_sync=False):
+    """Sync new activities into the store; returns (changes, store revision before the sync)"""
+    print("Fetching full activity history..." if full_sync else "Fetching new activities...")
+    base_revision = store.revision()
+    with metrics.phase('sync'):
+        fetched, changes = sync_activities(access_token, store, full=full_sync)
+    metrics.count('activities_synced', fetched)
+    changed = 'all' if changes is None else len(changes)
+    print(f"✓ Fetched {fetched} activities ({changed} new or changed), {len(store)} total cached\n")
+    return changes, base_revision
+
+def analyze_export(path, engine=DEFAULT_ENGINE):
+    """Analyze a Strava bulk-export file, streaming it; only the compact per-run series grows with it"""
+    print(f"Reading activities from {path}...")
+    runs = RunColumns()
+    with metrics.phase('aggregate'):
+        aggregates = build_running_aggregates(tap_run_points(iter_export_activities(path), runs), engine)
+    with metrics.phase('report'):
+        report_running_aggregates(aggregates, runs=runs.series())
 
-def main():
+def main(full_sync=False, engine=DEFAULT_ENGINE, export_path=None, streams=True):
+    metrics.start('running_analysis')
     print("Starting Running Analysis...\n")
     
+    if export_path:
+        analyze_export(export_path, engine)
+        return
+    
     # Get access token
-    access_token = get_access_token()
+    with metrics.phase('token'):
+        access_token = get_access_token()
     print("✓ Access token obtained\n")
     
-    # Fetch all activities
-    print("Fetching activities...")
-    activities = get_athlete_activities(access_token)
-    print(f"✓ Fetched {len(activities)} total activities\n")
+    # Sync new activities into the local store
+    with ActivityStore() as store:
+        changes, base_revision = sync_store(access_token, store, full_sync)
+        
+        # Fold the changes into the saved running aggregates
+        with metrics.phase('aggregate'):
+            aggregates = update_running_aggregates(store, changes, base_revision, engine)
+        
+        # Best efforts from per-run streams
+        best_efforts = update_best_efforts(access_token, store) if streams else None
+        runs = run_series(store_run_points(store))
     
     # Analyze running activities
-    analyze_running_activities(activities)
+    with metrics.phase('report'):
+        report_running_aggregates(aggregates, best_efforts, runs=runs)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Analyze Strava running activities")
+    parser.add_argument('--full', action='store_true', help="refetch the whole history instead of syncing new activities")
+    parser.add_argument('--engine', choices=ENGINES, default=DEFAULT_ENGINE, help="aggregation engine used for full recomputes")
+    parser.add_argument('--export', metavar='PATH', help="analyze a bulk-export activities.csv / JSON file instead of the API")
+    parser.add_argument('--no-streams', action='store_true', help="skip fetching run streams and computing best efforts")
+    args = parser.parse_args()
+    main(full_sync=args.full, engine=args.engine, export_path=args.export, streams=not args.no_streams)
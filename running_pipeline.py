@@ -0,0 +1,99 @@
+"""Fetch, analyze and render the running dashboard in one process.
+
+Does what running_analysis.py followed by generate_dashboard.py does, but
+hands the report data straight to the renderer instead of writing and
+re-reading running_data.json, and prints how long each phase took.
+"""
+import time
+
+# Taken before the other imports so the startup phase includes them
+STARTED = time.perf_counter()
+
+import argparse
+from contextlib import ExitStack, contextmanager
+import metrics
+import generate_dashboard as dashboard
+import running_analysis as analysis
+from activity_store import ActivityStore
+from activity_streams import StreamCache
+
+@contextmanager
+def timed(timings, name):
+    """Time one pipeline phase into timings and the phase_seconds metric"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(timings, name, time.perf_counter() - started)
+
+def record(timings, name, seconds):
+    timings[name] = timings.get(name, 0.0) + seconds
+    metrics.observe('phase_seconds', seconds, phase=name)
+
+def print_timings(timings):
+    phases = ', '.join(f"{name} {seconds:.2f}s" for name, seconds in timings.items())
+    print(f"Phase timings: {phases} (total {sum(timings.values()):.2f}s)")
+
+def run_pipeline(full_sync=False, engine=analysis.DEFAULT_ENGINE, export_path=None, streams=True,
+                 quiet=False, json_path=None, output=dashboard.OUTPUT_FILE, timings=None):
+    """Sync, aggregate and render the dashboard; returns the phase timings.
+
+    quiet skips the console statistics tables; json_path, if given, also
+    gets the report data as compact JSON.
+    """
+    timings = {} if timings is None else timings
+    best_efforts = None
+    if export_path:
+        with timed(timings, 'analyze'):
+            print(f"Reading activities from {export_path}...")
+            runs = analysis.RunColumns()
+            activities = analysis.tap_run_points(analysis.iter_export_activities(export_path), runs)
+            aggregates = analysis.build_running_aggregates(activities, engine)
+            data = analysis.report_running_aggregates(aggregates, quiet=quiet, json_path=json_path, indent=None,
+                                                      runs=runs.series())
+    else:
+        with ExitStack() as stack:
+            store = stack.enter_context(ActivityStore())
+            cache = stack.enter_context(StreamCache()) if streams else None
+            with timed(timings, 'fetch'):
+                with metrics.phase('token'):
+                    access_token = analysis.get_access_token()
+                print("✓ Access token obtained\n")
+                changes, base_revision = analysis.sync_store(access_token, store, full_sync)
+                if streams:
+                    run_ids = analysis.fetch_run_streams(access_token, store, cache)
+            with timed(timings, 'analyze'):
+                with metrics.phase('aggregate'):
+                    aggregates = analysis.update_running_aggregates(store, changes, base_revision, engine)
+                if streams:
+                    best_efforts = analysis.rank_best_efforts(cache, store, run_ids)
+                series = analysis.run_series(analysis.store_run_points(store))
+                data = analysis.report_running_aggregates(aggregates, best_efforts, quiet, json_path, indent=None,
+                                                          runs=series)
+
+    if data is not None:
+        with timed(timings, 'render'):
+            files = {}
+            dashboard.write_dashboard(dashboard.render_dashboard(data, files=files), output, files)
+        print(f"✓ Dashboard generated: {output}")
+    return timings
+
+def main(args):
+    metrics.start('running_pipeline')
+    timings = {}
+    record(timings, 'startup', time.perf_counter() - STARTED)
+    print("Starting Running Pipeline...\n")
+    run_pipeline(full_sync=args.full, engine=args.engine, export_path=args.export, streams=not args.no_streams,
+                 quiet=args.quiet, json_path=args.json, output=args.output, timings=timings)
+    print_timings(timings)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync, analyze and render the running dashboard in one process")
+    parser.add_argument('--full', action='store_true', help="refetch the whole history instead of syncing new activities")
+    parser.add_argument('--engine', choices=analysis.ENGINES, default=analysis.DEFAULT_ENGINE, help="aggregation engine used for full recomputes")
+    parser.add_argument('--export', metavar='PATH', help="analyze a bulk-export activities.csv / JSON file instead of the API")
+    parser.add_argument('--no-streams', action='store_true', help="skip fetching run streams and computing best efforts")
+    parser.add_argument('--quiet', action='store_true', help="skip printing the statistics tables")
+    parser.add_argument('--json', metavar='PATH', help="also write the report data to PATH as compact JSON")
+    parser.add_argument('--output', metavar='PATH', default=dashboard.OUTPUT_FILE, help="dashboard HTML file to write")
+    main(parser.parse_args())
@@ -0,0 +1,336 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+import requests
+from requests.adapters import HTTPAdapter
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+# Strava endpoints (overridable so the scripts can run against a local stub)
+API_URL = os.getenv('STRAVA_API_URL', 'https://www.strava.com/api/v3')
+OAUTH_URL = os.getenv('STRAVA_OAUTH_URL', 'https://www.strava.com/oauth/token')
+
+# Directory holding state carried between runs (cached by the workflows)
+STATE_DIR = os.getenv('STRAVA_STATE_DIR', '.strava_state')
+
+# Cached OAuth tokens: kept out of STATE_DIR, which the workflows save to the Actions cache
+TOKEN_CACHE_FILE = os.getenv('STRAVA_TOKEN_CACHE_FILE', '.strava_tokens.json')
+# Refresh access tokens this many seconds before they expire
+TOKEN_EXPIRY_MARGIN = 300
+
+# Max keep-alive connections kept open per host
+POOL_SIZE = int(os.getenv('STRAVA_POOL_SIZE', '16'))
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Return the process-wide keep-alive session shared by all API calls"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=POOL_SIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+_token_lock = threading.Lock()
+_token_locks = {}
+_tokens = {}
+
+class TokenError(Exception):
+    """Raised when the OAuth refresh endpoint does not return a token"""
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock shared with other processes using the same state dir"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(f"{path}.lock", 'a') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _token_key(client_id, refresh_token):
+    # The configured refresh token is part of the key, so re-authorizing
+    # (a new secret) invalidates whatever was cached for the old one
+    return hashlib.sha256(f"{client_id}:{refresh_token}".encode()).hexdigest()[:16]
+
+def _key_lock(key):
+    """The in-process lock for one token, so refreshes of different tokens run concurrently"""
+    with _token_lock:
+        return _token_locks.setdefault(key, threading.Lock())
+
+def _read_token_cache(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _write_token_cache(path, cache):
+    tmp_path = f"{path}.tmp"
+    with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, path)
+
+def _token_is_fresh(token):
+    return bool(token) and token['expires_at'] - TOKEN_EXPIRY_MARGIN > time.time()
+
+def get_access_token(client_id, client_secret, refresh_token, cache_path=TOKEN_CACHE_FILE):
+    """Return a valid access token, refreshing it only when it is about to expire.
+
+    The access token, its expires_at and the rotated refresh token Strava
+    returns are cached in memory and in a locked file, so concurrent threads
+    and processes share one token instead of each calling the refresh endpoint.
+    """
+    key = _token_key(client_id, refresh_token)
+    with _key_lock(key):
+        token = _tokens.get(key)
+        if _token_is_fresh(token):
+            return token['access_token']
+        # Held across the refresh so other processes wait for this token
+        # instead of refreshing it too; the cache file is replaced
+        # atomically, so it can be read without the shared lock
+        with _file_lock(f"{cache_path}.{key}"):
+            token = _read_token_cache(cache_path).get(key)
+            if not _token_is_fresh(token):
+                payload = {
+                    'client_id': client_id,
+                    'client_secret': client_secret,
+                    'refresh_token': token['refresh_token'] if token else refresh_token,
+                    'grant_type': 'refresh_token'
+                }
+                with metrics.phase('token_refresh'):
+                    response = get_session().post(OAUTH_URL, data=payload)
+                metrics.count('token_refreshes')
+                try:
+                    data = response.json()
+                except ValueError:
+                    data = {}
+                if response.status_code != 200 or 'access_token' not in data:
+                    raise TokenError(f"Token refresh failed ({response.status_code}): {data.get('message', response.text[:200])}")
+                token = {
+                    'access_token': data['access_token'],
+                    'expires_at': data['expires_at'],
+                    'refresh_token': data.get('refresh_token', payload['refresh_token']),
+                }
+                with _file_lock(cache_path):
+                    cache = _read_token_cache(cache_path)
+                    cache[key] = token
+                    _write_token_cache(cache_path, cache)
+        _tokens[key] = token
+        return token['access_token']
+
+def forget_access_token(client_id, refresh_token, cache_path=TOKEN_CACHE_FILE):
+    """Drop a cached access token the API rejected, keeping the rotated refresh token"""
+    key = _token_key(client_id, refresh_token)
+    with _key_lock(key):
+        _tokens.pop(key, None)
+        with _file_lock(cache_path):
+            cache = _read_token_cache(cache_path)
+            if key in cache:
+                cache[key]['expires_at'] = 0
+                _write_token_cache(cache_path, cache)
+
+# Request priorities: lower values are served first when budget is scarce
+PRIORITY_FETCH = 0
+PRIORITY_KUDOS = 1
+
+# Default Strava limits, replaced by X-RateLimit-Limit once a response arrives
+SHORT_LIMIT = int(os.getenv('STRAVA_RATE_LIMIT_15MIN', '200'))
+DAILY_LIMIT = int(os.getenv('STRAVA_RATE_LIMIT_DAILY', '2000'))
+SHORT_WINDOW = 15 * 60
+DAILY_WINDOW = 24 * 60 * 60
+
+# Requests allowed back-to-back before pacing kicks in
+RATE_BURST = int(os.getenv('STRAVA_RATE_BURST', '50'))
+# Longest we'll block for budget before giving up on a request
+RATE_MAX_WAIT = float(os.getenv('STRAVA_RATE_MAX_WAIT', '900'))
+MAX_RETRIES = int(os.getenv('STRAVA_MAX_RETRIES', '5'))
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+
+class RateLimitExceeded(Exception):
+    """Raised when the rate budget cannot be met within RATE_MAX_WAIT"""
+
+class RateLimiter:
+    """Paces Strava API calls within the 15-minute and daily budgets.
+
+    Usage is counted locally and reconciled with the X-RateLimit-Usage and
+    X-RateLimit-Limit headers. Within a window, a token bucket spreads the
+    remaining budget over the time left, and waiting fetches are always
+    served before waiting kudos posts.
+    """
+
+    def __init__(self, short_limit=SHORT_LIMIT, daily_limit=DAILY_LIMIT, burst=RATE_BURST,
+                 max_wait=RATE_MAX_WAIT, clock=time.time):
+        self.short_limit = short_limit
+        self.daily_limit = daily_limit
+        self.burst = burst
+        self.max_wait = max_wait
+        self.clock = clock
+        self.cond = threading.Condition()
+        self.waiting = [0, 0]
+        now = clock()
+        self.short_window = self._window_start(now, SHORT_WINDOW)
+        self.daily_window = self._window_start(now, DAILY_WINDOW)
+        self.short_usage = 0
+        self.daily_usage = 0
+        self.tokens = float(burst)
+        self.refilled_at = now
+
+    @staticmethod
+    def _window_start(now, length):
+        # Strava windows reset on natural quarter hours and at midnight UTC
+        return now - now % length
+
+    def _roll_windows(self, now):
+        if now - self.short_window >= SHORT_WINDOW:
+            self.short_window = self._window_start(now, SHORT_WINDOW)
+            self.short_usage = 0
+        if now - self.daily_window >= DAILY_WINDOW:
+            self.daily_window = self._window_start(now, DAILY_WINDOW)
+            self.daily_usage = 0
+
+    def _delay(self, now):
+        """Seconds until the next request may be sent, 0 if one may go now"""
+        if self.daily_usage >= self.daily_limit:
+            return self.daily_window + DAILY_WINDOW - now
+        seconds_left = self.short_window + SHORT_WINDOW - now
+        if self.short_usage >= self.short_limit:
+            return seconds_left
+        remaining = min(self.short_limit - self.short_usage, self.daily_limit - self.daily_usage)
+        rate = remaining / max(seconds_left, 1.0)
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * rate)
+        self.refilled_at = now
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / rate
+
+    def acquire(self, priority=PRIORITY_FETCH):
+        """Block until a request of the given priority may be sent"""
+        with self.cond:
+            self.waiting[priority] += 1
+            try:
+                while True:
+                    now = self.clock()
+                    self._roll_windows(now)
+                    if any(self.waiting[:priority]):
+                        self.cond.wait(0.1)
+                        continue
+                    delay = self._delay(now)
+                    if delay <= 0:
+                        self.tokens -= 1
+                        self.short_usage += 1
+                        self.daily_usage += 1
+                        return
+                    if delay > self.max_wait:
+                        raise RateLimitExceeded(f"Rate budget exhausted for another {delay:.0f}s")
+                    self.cond.wait(delay)
+            finally:
+                self.waiting[priority] -= 1
+                self.cond.notify_all()
+
+    def update(self, headers):
+        """Reconcile budgets with the rate-limit headers of a response"""
+        limit = headers.get('X-RateLimit-Limit')
+        usage = headers.get('X-RateLimit-Usage')
+        with self.cond:
+            try:
+                if limit:
+                    self.short_limit, self.daily_limit = (int(v) for v in limit.split(','))
+                if usage:
+                    short_usage, daily_usage = (int(v) for v in usage.split(','))
+                    self.short_usage = max(self.short_usage, short_usage)
+                    self.daily_usage = max(self.daily_usage, daily_usage)
+            except ValueError:
+                pass
+            self.cond.notify_all()
+
+    def seconds_until_reset(self):
+        with self.cond:
+            now = self.clock()
+            if self.daily_usage >= self.daily_limit:
+                return self.daily_window + DAILY_WINDOW - now
+            return self.short_window + SHORT_WINDOW - now
+
+rate_limiter = RateLimiter()
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(client_id=None):
+    """The rate limiter for an application; Strava budgets are per client ID"""
+    if client_id is None:
+        return rate_limiter
+    with _rate_limiters_lock:
+        if client_id not in _rate_limiters:
+            _rate_limiters[client_id] = RateLimiter()
+        return _rate_limiters[client_id]
+
+_ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+def _endpoint(url):
+    """Metrics label for a URL: its API path with numeric IDs folded to {id}"""
+    path = url[len(API_URL):] if url.startswith(API_URL) else url
+    return _ID_SEGMENT.sub('/{id}', path.split('?', 1)[0])
+
+def _record_request(method, url, response, seconds, limiter):
+    endpoint = _endpoint(url)
+    metrics.observe('http_request_seconds', seconds, method=method, endpoint=endpoint)
+    metrics.count('http_requests', method=method, endpoint=endpoint, status=response.status_code)
+    metrics.count('http_response_bytes', len(response.content), endpoint=endpoint)
+    if response.status_code == 429:
+        metrics.count('http_429')
+    metrics.gauge('rate_limit_headroom', limiter.short_limit - limiter.short_usage, window='15min')
+    metrics.gauge('rate_limit_headroom', limiter.daily_limit - limiter.daily_usage, window='daily')
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+def strava_request(method, url, priority=PRIORITY_FETCH, max_retries=MAX_RETRIES, limiter=None, retry_429=True,
+                   **kwargs):
+    """Send an API request through the shared session and a rate limiter.
+
+    Uses the process-wide limiter unless another one is given. Retries 429
+    and 5xx responses with jittered backoff; a 429 also waits for the rate
+    window to reset, unless retry_429 is False - then it is returned at
+    once. Returns the last response once retries run out.
+    """
+    limiter = limiter or rate_limiter
+    attempt = 0
+    while True:
+        limiter.acquire(priority)
+        started = time.perf_counter()
+        response = get_session().request(method, url, **kwargs)
+        limiter.update(response.headers)
+        if metrics.enabled:
+            _record_request(method, url, response, time.perf_counter() - started, limiter)
+        if response.status_code != 429 and response.status_code < 500:
+            return response
+        if attempt >= max_retries or (response.status_code == 429 and not retry_429):
+            return response
+        delay = backoff_delay(attempt)
+        if response.status_code == 429:
+            delay = max(delay, limiter.seconds_until_reset())
+        if delay > RATE_MAX_WAIT:
+            raise RateLimitExceeded(f"Rate limited for another {delay:.0f}s")
+        metrics.count('http_retries')
+        time.sleep(delay)
+        attempt += 1
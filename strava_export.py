@@ -0,0 +1,103 @@
+"""Constant-memory readers for Strava bulk-export files.
+
+Activities are yielded one at a time as Activity records, the same as the
+API's, so they can be folded straight into RunAggregates.
+"""
+import csv
+import json
+from datetime import datetime
+from activity_record import Activity, activity_hook, loads
+
+READ_CHUNK_SIZE = 1 << 16
+
+# activities.csv header -> (API field, converter)
+CSV_FIELDS = {
+    'Activity ID': ('id', int),
+    'Activity Name': ('name', str),
+    'Activity Type': ('type', str),
+    'Moving Time': ('moving_time', lambda v: int(float(v))),
+    'Elevation Gain': ('total_elevation_gain', float),
+    'Average Heart Rate': ('average_heartrate', float),
+}
+
+def iter_export_activities(path):
+    """Stream activities from an activities.csv, JSON array or JSON Lines export"""
+    if path.endswith('.csv'):
+        return iter_csv_activities(path)
+    if path.endswith('.jsonl'):
+        return iter_jsonl_activities(path)
+    return iter_json_activities(path)
+
+def _parse_export_date(value):
+    """'Jan 15, 2024, 10:30:00 AM' (UTC) -> '2024-01-15T10:30:00Z'"""
+    return datetime.strptime(value, "%b %d, %Y, %I:%M:%S %p").strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def iter_csv_activities(path):
+    """Stream activities from a bulk-export activities.csv.
+
+    The export lists some headers twice: the first 'Distance' is in km, the
+    second in metres, so the last occurrence of a header wins and a lone
+    'Distance' column is scaled from km.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        columns = {name: i for i, name in enumerate(header)}
+        distance_in_km = header.count('Distance') == 1
+        for row in reader:
+            activity = {}
+            for name, (field, convert) in CSV_FIELDS.items():
+                i = columns.get(name)
+                if i is not None and i < len(row) and row[i]:
+                    activity[field] = convert(row[i])
+            distance = row[columns['Distance']] if 'Distance' in columns else ''
+            activity['distance'] = float(distance or 0) * (1000 if distance_in_km else 1)
+            activity['start_date'] = _parse_export_date(row[columns['Activity Date']])
+            activity.setdefault('moving_time', int(float(row[columns['Elapsed Time']] or 0)))
+            activity.setdefault('total_elevation_gain', 0.0)
+            yield Activity.from_json(activity)
+
+def iter_jsonl_activities(path):
+    """Stream activities from a JSON Lines file, one activity per line"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield loads(line)
+
+def iter_json_activities(path):
+    """Stream the elements of a top-level JSON array without loading the whole file"""
+    decoder = json.JSONDecoder(object_hook=activity_hook)
+    with open(path, encoding='utf-8') as f:
+        buffer = ''
+        pos = 0
+        eof = False
+        started = False
+        while True:
+            if not started:
+                while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+                    pos += 1
+                if pos < len(buffer):
+                    if buffer[pos] != '[':
+                        raise ValueError(f"{path}: expected a JSON array of activities")
+                    started = True
+            # Skip whitespace and array punctuation between elements
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,[]':
+                pos += 1
+            if pos < len(buffer) and started:
+                try:
+                    activity, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    # A value ending the buffer may be cut short - read on to be sure
+                    if end < len(buffer) or eof:
+                        yield activity
+                        pos = end
+                        continue
+            if eof:
+                return
+            chunk = f.read(READ_CHUNK_SIZE)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
@@ -0,0 +1,45 @@
+import os
+import random
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from run_aggregates import local_start_date
+
+ZONES = ['(GMT-05:00) America/Bogota', '(GMT+00:00) Europe/London', '(GMT+01:00) Europe/Oslo']
+
+@pytest.fixture
+def make_activities():
+    """make_activities(n, seed) -> n API-shaped activities over a few months.
+
+    Starts fall on the hour and distances on whole 100 m, so equal distances
+    and paces (record-run ties) are common; some runs have no
+    start_date_local, heart rate or elevation.
+    """
+    def make(n, seed=0):
+        rng = random.Random(seed)
+        activities = []
+        for i in range(n):
+            distance = rng.randrange(5, 40) * 100.0
+            activity = {
+                'id': 1000 + i,
+                'name': f'Activity {i}',
+                'type': rng.choice(['Run', 'Run', 'Run', 'Ride']),
+                'start_date': f"2024-{rng.randrange(1, 5):02d}-{rng.choice([1, 15, 28, 29, 30, 31]):02d}"
+                              f"T{rng.choice([0, 7, 23]):02d}:00:00Z",
+                'timezone': rng.choice(ZONES),
+                'distance': distance,
+                'moving_time': int(distance / 1000 * rng.choice([240, 300, 360])),
+            }
+            if activity['start_date'][5:10] in ('02-30', '02-31', '04-31'):
+                activity['start_date'] = activity['start_date'][:8] + '28' + activity['start_date'][10:]
+            if rng.random() < 0.5:
+                activity['start_date_local'] = local_start_date(activity)
+            if rng.random() < 0.7:
+                activity['average_heartrate'] = rng.choice([140.0, 150.5, 162.0])
+            if rng.random() < 0.8:
+                activity['total_elevation_gain'] = rng.choice([0.0, 12.5, 80.0])
+            activities.append(activity)
+        return activities
+    return make
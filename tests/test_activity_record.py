@@ -0,0 +1,27 @@
+"""Activity records and ActivityBatch columns."""
+import json
+from activity_record import Activity, ActivityBatch, loads
+
+def api_activity(activity_id, **fields):
+    return dict({'id': activity_id, 'name': 'Run', 'type': 'Run', 'start_date': '2024-03-01T07:00:00Z',
+                 'distance': 5000.0, 'moving_time': 1500, 'athlete': {'firstname': 'A', 'lastname': 'B.'}}, **fields)
+
+def test_batch_round_trips_records_and_dicts():
+    activities = [api_activity(1, average_heartrate=150.0), api_activity(2, total_elevation_gain=12.5)]
+    records = loads(json.dumps(activities))
+    for items in (activities, records, [activities[0], records[1]]):
+        batch = ActivityBatch(items)
+        assert len(batch) == 2
+        assert list(batch) == records
+
+def test_batch_missing_values():
+    batch = ActivityBatch([api_activity(None, average_heartrate=150.0), api_activity(2)])
+    assert list(batch.columns['id']) == [0, 2]
+    hr = batch.columns['average_heartrate']
+    assert hr[0] == 150.0 and hr[1] != hr[1]
+    assert batch[0].id is None and batch[1].average_heartrate is None
+
+def test_batch_fields_limit_columns():
+    batch = ActivityBatch([Activity.from_json(api_activity(1))], fields=('distance',))
+    assert set(batch.columns) == {'id', 'distance'}
+    assert batch[0].to_json() == {'id': 1, 'distance': 5000.0}
@@ -0,0 +1,159 @@
+"""Kudos dispatching and summaries, with the network replaced by canned statuses."""
+import json
+from functools import partial
+import pytest
+import kudos_bot
+import strava_api
+from kudos_rules import KudosRules
+from kudos_state import DedupIndex, KudosLedger
+
+def activity(activity_id):
+    return {'id': activity_id, 'name': f'Run {activity_id}', 'distance': 5000.0, 'moving_time': 1800,
+            'athlete': {'firstname': f'Runner{activity_id}', 'lastname': 'X.'}}
+
+@pytest.fixture
+def statuses(monkeypatch):
+    """Map activity id -> status post_kudos returns (201 if unlisted); records the ids posted"""
+    canned = {}
+    canned['posted'] = posted = []
+
+    def post_kudos(access_token, activity_id, limiter=None):
+        posted.append(activity_id)
+        return canned.get(activity_id, 201)
+
+    monkeypatch.setattr(kudos_bot, 'post_kudos', post_kudos)
+    return canned
+
+@pytest.fixture
+def ledger(tmp_path):
+    with KudosLedger(str(tmp_path / 'ledger.db')) as ledger:
+        yield ledger
+
+def test_dispatch_yields_every_status(statuses):
+    statuses.update({2: 409, 3: 503})
+    results = dict((a['id'], status) for a, status in kudos_bot.dispatch_kudos('token', map(activity, range(1, 6)), 3))
+    assert results == {1: 201, 2: 409, 3: 503, 4: 201, 5: 201}
+
+@pytest.mark.parametrize('stop_status', [401, 429])
+def test_dispatch_stops_after_stop_status(statuses, stop_status):
+    statuses[3] = stop_status
+    results = list(kudos_bot.dispatch_kudos('token', map(activity, range(1, 11)), max_in_flight=1))
+    assert [(a['id'], status) for a, status in results] == [(1, 201), (2, 201), (3, stop_status)]
+    assert statuses['posted'] == [1, 2, 3]
+
+def test_summary_counts_and_ledger(statuses, ledger):
+    statuses.update({2: 409, 3: 404, 4: 503, 5: None})
+    ledger.add(6)
+    no_id = {'athlete': {'firstname': 'Anon'}}
+    summary = kudos_bot.give_kudos_to_activities('token', [activity(i) for i in range(1, 7)] + [no_id], ledger)
+    assert {k: summary[k] for k in ('given', 'already', 'skipped', 'failed', 'not_attempted')} == \
+        {'given': 1, 'already': 1, 'skipped': 1, 'failed': 4, 'not_attempted': 0}
+    assert summary['stop_status'] is None
+    # 409 means the kudos is there: recorded like a 201; failures are not
+    assert 1 in ledger and 2 in ledger
+    assert not any(i in ledger for i in (3, 4, 5))
+    # A 404 won't get better; a 503 or a connection error might
+    assert sorted(a['id'] for a in summary['retry']) == [4, 5]
+    assert 6 not in statuses['posted']
+
+@pytest.mark.parametrize('stop_status', [401, 429])
+def test_summary_not_attempted_after_stop(statuses, ledger, monkeypatch, stop_status):
+    # One post in flight, so exactly the posts before the stop status are made
+    monkeypatch.setattr(kudos_bot, 'dispatch_kudos', partial(kudos_bot.dispatch_kudos, max_in_flight=1))
+    statuses[4] = stop_status
+    summary = kudos_bot.give_kudos_to_activities('token', [activity(i) for i in range(1, 11)], ledger)
+    assert summary['stop_status'] == stop_status
+    assert (summary['given'], summary['failed'], summary['not_attempted']) == (3, 1, 6)
+    assert [i for i in range(1, 11) if i in ledger] == [1, 2, 3]
+
+def test_dry_run_posts_nothing(statuses, ledger):
+    summary = kudos_bot.give_kudos_to_activities('token', [activity(i) for i in range(1, 4)], ledger, dry_run=True)
+    assert summary['dry_run'] == 3
+    assert statuses['posted'] == []
+    assert len(ledger) == 0
+
+class Response:
+    def __init__(self, status_code, content=b''):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {}
+
+class Session:
+    """Answers requests with the given responses, in order, recording what was sent"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.sent = []
+
+    def request(self, method, url, **kwargs):
+        self.sent.append((method, url))
+        return self.responses.pop(0)
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(strava_api, 'backoff_delay', lambda attempt: 0)
+    monkeypatch.setattr(strava_api.rate_limiter, 'seconds_until_reset', lambda: 0)
+
+def test_post_kudos_retries_server_errors(monkeypatch, no_backoff):
+    session = Session([Response(503), Response(502), Response(201)])
+    monkeypatch.setattr(strava_api, 'get_session', lambda: session)
+    assert kudos_bot.post_kudos('token', 1) == 201
+    assert len(session.sent) == 3
+
+def test_post_kudos_does_not_retry_429(monkeypatch, no_backoff):
+    session = Session([Response(429), Response(201)])
+    monkeypatch.setattr(strava_api, 'get_session', lambda: session)
+    assert kudos_bot.post_kudos('token', 1) == 429
+    assert len(session.sent) == 1
+
+def test_failed_post_is_retried_next_poll(statuses, ledger, tmp_path, monkeypatch):
+    feed = [activity(i) for i in range(1, 6)]
+
+    def fake_request(method, url, **kwargs):
+        return Response(200, json.dumps(feed).encode())
+
+    monkeypatch.setattr(kudos_bot, 'strava_request', fake_request)
+    monkeypatch.setattr(kudos_bot, 'save_watermarks', lambda watermarks: None)
+    watermarks = {}
+    with DedupIndex(str(tmp_path / 'seen.db')) as seen:
+        statuses[3] = 503
+        summary, _ = kudos_bot.poll_clubs('token', ['1'], watermarks, seen, ledger)
+        assert summary['given'] == 4
+        assert watermarks == {}
+        del statuses[3]
+        summary, _ = kudos_bot.poll_clubs('token', ['1'], watermarks, seen, ledger)
+    assert (summary['given'], summary['skipped']) == (1, 0)
+    assert sorted(statuses['posted']) == [1, 2, 3, 3, 4, 5]
+    assert watermarks['1'][0] == kudos_bot.activity_key(feed[0])
+
+def test_club_quota_only_counts_postable_activities(ledger, tmp_path, monkeypatch):
+    feeds = {1: [activity(i) for i in (1, 2, 3)], 2: [activity(i) for i in (1, 2, 3, 4, 5, 6)]}
+    monkeypatch.setattr(kudos_bot, 'iter_club_activities', lambda token, club_id, *args, **kwargs: iter(feeds[club_id]))
+    rules = KudosRules(default_club_quota=2)
+    rules.begin_run()
+    ledger.add(4)
+    with DedupIndex(str(tmp_path / 'dedup.db')) as seen:
+        first = kudos_bot.fetch_club_feed('token', 1, seen=seen, rules=rules, ledger=ledger)
+        second = kudos_bot.fetch_club_feed('token', 2, seen=seen, rules=rules, ledger=ledger)
+    assert [a['id'] for a in first.activities] == [1, 2]
+    # 1 and 2 are duplicates and 4 already has kudos: none of them use club 2's quota,
+    # and 3, over club 1's quota, is still new to club 2
+    assert [a['id'] for a in second.activities] == [3, 4, 5]
+    assert rules.filtered['club_quota'] == 2
+
+def test_club_without_watermark_reads_one_page(monkeypatch):
+    feed = [activity(i) for i in range(10, 0, -1)]
+    pages = []
+
+    def get_club_activities(access_token, club_id, page=1, per_page=4, limiter=None, cache=None):
+        pages.append(page)
+        return feed[(page - 1) * per_page:page * per_page]
+
+    monkeypatch.setattr(kudos_bot, 'get_club_activities', get_club_activities)
+    first = list(kudos_bot.iter_club_activities('token', 1, per_page=4))
+    assert pages == [1] and [a['id'] for a in first] == [10, 9, 8, 7]
+    # With a watermark, paging continues until it is reached
+    pages.clear()
+    watermark = [kudos_bot.activity_key(activity(3))]
+    assert [a['id'] for a in kudos_bot.iter_club_activities('token', 1, watermark, per_page=4)] == [10, 9, 8, 7, 6, 5, 4]
+    assert pages == [1, 2]
@@ -0,0 +1,53 @@
+"""Retention and rollback of the kudos ledger and dedup index."""
+import pytest
+import kudos_state
+from kudos_state import DedupIndex, KudosLedger
+
+DAY = 86400
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable time.time() for kudos_state"""
+    now = [1_700_000_000]
+    monkeypatch.setattr(kudos_state.time, 'time', lambda: now[0])
+    return now
+
+def test_ledger_evicts_on_disk_and_in_memory(tmp_path, clock):
+    path = str(tmp_path / 'ledger.db')
+    with KudosLedger(path, retention_days=30) as ledger:
+        ledger.add(1)
+        clock[0] += 20 * DAY
+        ledger.add(2)
+        ledger.commit()
+        clock[0] += 15 * DAY
+        assert ledger.evict() == 1
+        assert 1 not in ledger and 2 in ledger
+    with KudosLedger(path, retention_days=30) as ledger:
+        assert 1 not in ledger and 2 in ledger
+
+def test_dedup_evicts_committed_entries_only(tmp_path, clock):
+    path = str(tmp_path / 'seen.db')
+    with DedupIndex(path, retention_days=7) as seen:
+        assert seen.add(('id', 1))
+        seen.commit()
+        clock[0] += 8 * DAY
+        assert seen.add(('id', 2))
+        assert seen.evict() == 1
+        assert ('id', 1) not in seen and ('id', 2) in seen
+        assert seen.add(('id', 1))
+
+def test_dedup_rollback_and_discard(tmp_path, clock):
+    with DedupIndex(str(tmp_path / 'seen.db')) as seen:
+        seen.add(('id', 1))
+        seen.commit()
+        for i in (2, 3, 4):
+            seen.add(('id', i))
+        # Committed entries are not discarded
+        seen.discard([('id', 1), ('id', 2)])
+        assert ('id', 1) in seen and ('id', 2) not in seen
+        seen.rollback()
+        assert ('id', 3) not in seen and ('id', 4) not in seen
+        seen.add(('id', 5))
+        seen.commit()
+    with DedupIndex(str(tmp_path / 'seen.db')) as seen:
+        assert [('id', i) in seen for i in range(1, 6)] == [True, False, False, False, True]
@@ -0,0 +1,68 @@
+"""RunAggregates: record ranking, and runs as exports and the API give them."""
+import json
+import pytest
+import running_analysis
+from activity_record import Activity
+from run_aggregates import RunAggregates, run_month
+
+def run(start_date, distance, moving_time, **fields):
+    return dict(type='Run', start_date=start_date, distance=distance, moving_time=moving_time, **fields)
+
+def without_ids():
+    # Same length and start, so the record ranking falls through to the id
+    return [run('2024-03-01T07:00:00Z', 5000.0, 1500), run('2024-03-01T07:00:00Z', 5000.0, 1500, name='Second')]
+
+@pytest.mark.parametrize('wrap', [dict, Activity.from_json], ids=['dicts', 'records'])
+def test_runs_without_id(wrap):
+    aggregates = RunAggregates.from_activities(wrap(a) for a in without_ids())
+    month = aggregates.months[(2024, 3)]
+    assert month['count'] == 2
+    assert month['longest']['id'] is None and month['longest']['name'] == 'N/A'
+
+def test_export_without_ids(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'activities.json').write_text(json.dumps(without_ids()))
+    (tmp_path / 'activities.csv').write_text(
+        'Activity Date,Activity Name,Activity Type,Elapsed Time,Distance\n'
+        '"Mar 1, 2024, 7:00:00 AM",Morning Run,Run,1500,5.0\n'
+        '"Mar 1, 2024, 7:00:00 AM",Morning Run,Run,1500,5.0\n')
+    for name in ('activities.json', 'activities.csv'):
+        running_analysis.analyze_export(str(tmp_path / name))
+        data = json.loads((tmp_path / running_analysis.DATA_FILE).read_text())
+        assert data['overall']['total_runs'] == 2
+
+def test_apply_matches_full_recompute(make_activities):
+    activities = make_activities(600)
+    aggregates = RunAggregates.from_activities(activities)
+    current = {a['id']: a for a in activities}
+    # The longest run of March goes, but March keeps other runs
+    march = [a for a in activities if a['type'] == 'Run' and run_month(a) == (2024, 3)]
+    longest = aggregates.months[(2024, 3)]['longest']
+    changes = [(current[longest['id']], None)]
+    assert len(march) > 1
+    # Runs removed or edited, and some moved to another month or type
+    for old in activities[:60]:
+        if old['id'] == longest['id']:
+            continue
+        if old['id'] % 3 == 0:
+            changes.append((old, None))
+        elif old['id'] % 3 == 1:
+            changes.append((old, dict(old, distance=old['distance'] + 500, start_date='2024-05-10T12:00:00Z',
+                                      start_date_local='2024-05-10T12:00:00Z')))
+        else:
+            changes.append((old, dict(old, type='Run', moving_time=old['moving_time'] - 60)))
+    # And new runs, some of them tying March's remaining records
+    changes += [(None, dict(new, id=new['id'] + 10000)) for new in make_activities(80, seed=1)]
+    for old, new in changes:
+        if new is None:
+            del current[old['id']]
+        else:
+            current[new['id']] = new
+    aggregates.apply(changes, lambda key: [a for a in current.values() if run_month(a) == key])
+    assert aggregates.to_state() == RunAggregates.from_activities(current.values()).to_state()
+
+def test_apply_removes_a_month_with_its_last_run():
+    runs = [run('2024-03-01T07:00:00Z', 5000.0, 1500, id=1), run('2024-04-01T07:00:00Z', 6000.0, 1800, id=2)]
+    aggregates = RunAggregates.from_activities(runs)
+    aggregates.apply([(runs[0], None)], lambda key: [])
+    assert aggregates.to_state() == RunAggregates.from_activities(runs[1:]).to_state()
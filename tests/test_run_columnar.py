@@ -0,0 +1,41 @@
+"""The columnar engine against the row-by-row one."""
+import pytest
+from activity_record import loads, dumps
+from run_aggregates import RunAggregates
+
+pytest.importorskip('numpy')
+from run_columnar import aggregate_activities
+
+def assert_engines_agree(activities):
+    assert aggregate_activities(activities).to_state() == RunAggregates.from_activities(activities).to_state()
+
+@pytest.mark.parametrize('as_records', [False, True], ids=['dicts', 'records'])
+def test_matches_python_engine(make_activities, as_records):
+    activities = make_activities(2000)
+    assert any('start_date_local' not in a for a in activities)
+    assert_engines_agree(loads(dumps(activities)) if as_records else activities)
+
+def test_ties_go_to_earliest_start_then_lowest_id():
+    def run(activity_id, start_date, distance, moving_time):
+        activity = {'type': 'Run', 'start_date': start_date, 'distance': distance, 'moving_time': moving_time}
+        if activity_id is not None:
+            activity['id'] = activity_id
+        return activity
+    activities = [
+        # Same distance and pace: the earlier start wins, then the lower id
+        run(3, '2024-03-02T07:00:00Z', 5000.0, 1500),
+        run(2, '2024-03-01T07:00:00Z', 5000.0, 1500),
+        run(1, '2024-03-01T07:00:00Z', 5000.0, 1500),
+        # No id ranks as 0; no start_date_local buckets by the timezone
+        dict(run(None, '2024-03-01T07:00:00Z', 5000.0, 1500), timezone='(GMT+01:00) Europe/Oslo'),
+        # March in UTC, April in local time
+        dict(run(4, '2024-03-31T23:30:00Z', 5000.0, 1500), timezone='(GMT+02:00) Europe/Oslo'),
+    ]
+    assert_engines_agree(activities)
+    months = aggregate_activities(activities).months
+    assert months[(2024, 3)]['longest']['id'] is None
+    assert months[(2024, 4)]['count'] == 1
+
+def test_no_runs():
+    assert_engines_agree([{'id': 1, 'type': 'Ride', 'start_date': '2024-03-01T07:00:00Z', 'distance': 1.0,
+                           'moving_time': 1}])
@@ -0,0 +1,20 @@
+"""Bulk-export readers."""
+import json
+import pytest
+from strava_export import iter_export_activities
+
+def write(path, text):
+    path.write_text(text)
+    return str(path)
+
+def test_json_array_streams_every_activity(tmp_path, monkeypatch):
+    monkeypatch.setattr('strava_export.READ_CHUNK_SIZE', 7)
+    activities = [{'id': i, 'type': 'Run', 'distance': 5000.0 + i, 'moving_time': 1500} for i in range(20)]
+    path = write(tmp_path / 'activities.json', '\n  ' + json.dumps(activities, indent=1))
+    assert [a['id'] for a in iter_export_activities(path)] == list(range(20))
+
+@pytest.mark.parametrize('text', ['{"activities": [{"id": 1, "distance": 1.0, "moving_time": 1}]}', '  "runs"', '1'])
+def test_json_export_must_be_an_array(tmp_path, text):
+    path = write(tmp_path / 'activities.json', text)
+    with pytest.raises(ValueError):
+        list(iter_export_activities(path))
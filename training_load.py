@@ -0,0 +1,103 @@
+"""Rolling training-load analytics over a dense daily series.
+
+The daily running totals kept by RunAggregates are laid out once as one
+value per calendar day, and every rolling metric is then a single pass:
+window sums come from prefix sums, acute/chronic load from exponentially
+weighted averages and streaks from a running counter. Load is running
+distance in km per day.
+"""
+from datetime import date, timedelta
+
+ROLLING_WINDOWS = (7, 28, 42)
+# Time constants (days) of the acute (ATL) and chronic (CTL) training load
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 42
+
+def daily_series(days, end=None):
+    """Dense per-day run counts and distances (dm) from the first run day to end.
+
+    days maps 'YYYY-MM-DD' to [count, distance_dm, time_s]; end defaults to
+    the last run day. Returns (first day, counts, distances).
+    """
+    if not days:
+        return None, [], []
+    ordinals = {date.fromisoformat(day).toordinal(): totals for day, totals in days.items()}
+    first = min(ordinals)
+    last = max(max(ordinals), end.toordinal() if end else 0)
+    counts = [0] * (last - first + 1)
+    distances = [0] * (last - first + 1)
+    for ordinal, (count, distance_dm, _) in ordinals.items():
+        if ordinal <= last:
+            counts[ordinal - first] = count
+            distances[ordinal - first] = distance_dm
+    return date.fromordinal(first), counts, distances
+
+def prefix_sums(values):
+    sums = [0] * (len(values) + 1)
+    total = 0
+    for i, value in enumerate(values):
+        total += value
+        sums[i + 1] = total
+    return sums
+
+def rolling_sums(values, window, sums=None):
+    """Sum of each day's trailing window (the day included), via prefix sums"""
+    if sums is None:
+        sums = prefix_sums(values)
+    return [sums[i + 1] - sums[max(0, i + 1 - window)] for i in range(len(values))]
+
+def exponential_load(values, time_constant):
+    """Exponentially weighted daily load, as in the Banister ATL/CTL model"""
+    load = 0.0
+    out = []
+    for value in values:
+        load += (value - load) / time_constant
+        out.append(load)
+    return out
+
+def weekly_totals(first, values):
+    """Totals per Monday-starting week, keyed by the Monday's date"""
+    offset = first.weekday()
+    weeks = [0] * ((len(values) + offset + 6) // 7)
+    for i, value in enumerate(values):
+        weeks[(i + offset) // 7] += value
+    monday = first - timedelta(days=offset)
+    return {(monday + timedelta(weeks=week)).isoformat(): total for week, total in enumerate(weeks)}
+
+def streaks(first, counts):
+    """Longest run of consecutive run days and the one ending on the series' last day"""
+    longest = (0, None)
+    current = 0
+    for i, count in enumerate(counts):
+        current = current + 1 if count else 0
+        if current > longest[0]:
+            longest = (current, i)
+    longest_days, longest_end = longest
+    result = {'current_days': current, 'longest_days': longest_days, 'longest_start': None, 'longest_end': None}
+    if longest_days:
+        result['longest_start'] = (first + timedelta(days=longest_end - longest_days + 1)).isoformat()
+        result['longest_end'] = (first + timedelta(days=longest_end)).isoformat()
+    return result
+
+def training_load(days, today=None):
+    """Rolling training-load metrics through today, in the running_data.json 'training' shape"""
+    first, counts, distances = daily_series(days, today or date.today())
+    if first is None:
+        return None
+    km = [d / 10000 for d in distances]
+    sums = prefix_sums(distances)
+    atl = exponential_load(km, ACUTE_DAYS)
+    ctl = exponential_load(km, CHRONIC_DAYS)
+    training = {
+        'start': first.isoformat(),
+        'distance_km': [round(v, 2) for v in km],
+    }
+    for window in ROLLING_WINDOWS:
+        training[f'distance_{window}d_km'] = [round(v / 10000, 2) for v in rolling_sums(distances, window, sums)]
+    training['atl'] = [round(v, 2) for v in atl]
+    training['ctl'] = [round(v, 2) for v in ctl]
+    training['tsb'] = [round(c - a, 2) for a, c in zip(atl, ctl)]
+    training['weekly_km'] = {week: round(total / 10000, 2) for week, total in weekly_totals(first, distances).items()}
+    training['streaks'] = streaks(first, counts)
+    training['current'] = {key: training[key][-1] for key in training if isinstance(training[key], list)}
+    return training